@@ -0,0 +1,12 @@
+import os
+
+from celery import Celery
+
+# Default Django settings for the 'celery' worker / beat programs
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ble_attendance.settings')
+
+app = Celery('ble_attendance')
+
+# All CELERY_* keys in settings.py configure the app (broker, beat schedule, eager mode)
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -1,6 +1,7 @@
 from pathlib import Path
 from datetime import timedelta
 import os
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -79,6 +80,15 @@ DATABASES = {
     }
 }
 
+# Local profiling / benchmark runs: DB_ENGINE=sqlite uses a file database instead of MySQL
+if os.environ.get('DB_ENGINE') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3')),
+        }
+    }
+
 AUTH_USER_MODEL = 'core.User'
 
 # Password validation
@@ -152,4 +162,66 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Shared secret that every ESP32 node must send in the X-ESP32-API-KEY header.
 # Set a strong random value in your .env file. Example:
 #   ESP32_SECRET_KEY=a3f9d2c8e1b7...
-ESP32_SECRET_KEY = os.environ.get('ESP32_SECRET_KEY', 'changeme-esp32-secret')
\ No newline at end of file
+ESP32_SECRET_KEY = os.environ.get('ESP32_SECRET_KEY', 'changeme-esp32-secret')
+
+# ==========================================
+# ⚡ CACHE & BACKGROUND WORKERS (Celery)
+# ==========================================
+# Set REDIS_URL in production so web workers, Celery workers and beat share one cache.
+# Without it each process keeps its own in-memory cache.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', REDIS_URL or 'redis://127.0.0.1:6379/0')
+CELERY_TIMEZONE = TIME_ZONE
+# Dev / tests run tasks inline so no broker is needed; production runs real workers
+CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', str(DEBUG)) == 'True'
+
+CELERY_BEAT_SCHEDULE = {
+    'lecture-lifecycle': {
+        'task': 'core.tasks.sync_lecture_lifecycle',
+        'schedule': 60.0,  # Every minute
+    },
+    'daily-fines': {
+        'task': 'core.tasks.calculate_daily_fines',
+        'schedule': crontab(hour=0, minute=0),
+    },
+    'resume-stalled-jobs': {
+        'task': 'core.tasks.resume_stalled_jobs',
+        'schedule': 300.0,  # Every 5 minutes
+    },
+    'push-outbox': {
+        'task': 'core.tasks.flush_pending_pushes',
+        'schedule': 60.0,  # Safety net; writers schedule their own flush (core/push.py)
+    },
+}
+
+# ==========================================
+# 🔥 PUSH NOTIFICATIONS (Firebase Cloud Messaging HTTP v1)
+# ==========================================
+# Without FCM_PROJECT_ID pushes are only logged (development). FCM_ENDPOINT can
+# point at a local stub (`python manage.py fcm_stub_server`) for load tests.
+FCM_PROJECT_ID = os.environ.get('FCM_PROJECT_ID', '')
+FCM_CREDENTIALS_FILE = os.environ.get('FCM_CREDENTIALS_FILE', '')  # Service-account JSON
+FCM_ENDPOINT = os.environ.get('FCM_ENDPOINT', 'https://fcm.googleapis.com')
+FCM_CONCURRENCY = int(os.environ.get('FCM_CONCURRENCY', '16'))  # Parallel connections per batch
+FCM_COALESCE_WINDOW = int(os.environ.get('FCM_COALESCE_WINDOW', '30'))  # Seconds; alerts within it become one push per user
+
+# ==========================================
+# 📅 TIMETABLE-DRIVEN LECTURE LIFECYCLE
+# ==========================================
+LECTURE_AUTO_OPEN = os.environ.get('LECTURE_AUTO_OPEN', 'True') == 'True'  # Open a Lecture at each slot start
+LECTURE_AUTO_CLOSE_GRACE = timedelta(minutes=int(os.environ.get('LECTURE_AUTO_CLOSE_GRACE_MINUTES', '10')))
+LECTURE_MAX_DURATION = timedelta(hours=3)  # Extra classes (no slot) are swept after this
+
+# ==========================================
+# 📂 BULK STUDENT IMPORT
+# ==========================================
+# Initial passwords are hashed at full strength in a thread pool (PBKDF2 releases the GIL)
+IMPORT_HASH_WORKERS = int(os.environ.get('IMPORT_HASH_WORKERS', '0'))  # 0 = one thread per CPU
@@ -4,7 +4,7 @@ from django.utils.html import format_html
 from .models import (
     User, Department, Batch, Semester, Classroom, Course,
     StudentProfile, StaffProfile, ParentProfile, TimeTable, Lecture, Attendance,
-    LeaveRequest, AppRelease
+    LeaveRequest, AppRelease, BackgroundJob, FineRun
 )
 
 @admin.action(description='🔓 RESET DEVICE LOCK')
@@ -49,4 +49,14 @@ admin.site.register(LeaveRequest)
 class AppReleaseAdmin(admin.ModelAdmin):
     list_display = ('version_name', 'version_code', 'is_active', 'created_at')
     list_filter = ('is_active',)
-    search_fields = ('version_name', 'release_notes')
\ No newline at end of file
+    search_fields = ('version_name', 'release_notes')
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'job_type', 'status', 'processed', 'total', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('job_type', 'status')
+    readonly_fields = ('checkpoint', 'heartbeat_at', 'started_at', 'finished_at')
+
+@admin.register(FineRun)
+class FineRunAdmin(admin.ModelAdmin):
+    list_display = ('run_date', 'penalties_created', 'created_at')
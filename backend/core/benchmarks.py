@@ -0,0 +1,389 @@
+"""
+In-process benchmark scenarios for the hot request paths.
+
+Each scenario is registered with @benchmark and receives a BenchmarkContext.
+It returns a zero-argument callable that performs one operation. The runner
+(`manage.py run_benchmarks`) times the callable and rolls back every
+iteration, so the seeded database is unchanged after a run.
+"""
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.utils import timezone
+
+from .models import User, StudentProfile, Classroom, Lecture, Attendance, TimeTable, GradeRecord, Department
+
+BENCHMARKS = {}
+
+
+def benchmark(name, max_iterations=None):
+    """Registers a scenario; max_iterations caps inherently slow ones (e.g. password hashing)."""
+    def register(setup):
+        setup.max_iterations = max_iterations
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+class BenchmarkContext:
+    """Shared fixtures resolved once per run from the seeded data."""
+
+    def __init__(self):
+        self.now = timezone.localtime(timezone.now())
+        self._clients = {}
+
+    def client_for(self, user):
+        if user.pk not in self._clients:
+            client = Client()
+            client.force_login(user)
+            self._clients[user.pk] = client
+        return self._clients[user.pk]
+
+    def busiest_teacher(self):
+        """The teacher with the most slots today (falls back to the whole week on weekends)."""
+        slots = TimeTable.objects.filter(day_of_week=self.now.weekday())
+        if not slots.exists():
+            slots = TimeTable.objects.all()
+        busiest = slots.values('teacher_id').annotate(n=Count('id')).order_by('-n', 'teacher_id').first()
+        if not busiest:
+            raise LookupError("No timetable slots found.")
+        return User.objects.get(pk=busiest['teacher_id'])
+
+    def student(self):
+        profile = StudentProfile.objects.select_related('user').filter(grades__isnull=False).order_by('id').first()
+        if not profile:
+            raise LookupError("No students with grades found.")
+        return profile
+
+    def active_lecture(self, teacher=None):
+        """Opens a live lecture from the teacher's first slot (rolled back with the scenario)."""
+        teacher = teacher or self.busiest_teacher()
+        slot = TimeTable.objects.filter(teacher=teacher).select_related('classroom').order_by('day_of_week', 'start_time').first()
+        Lecture.objects.filter(classroom=slot.classroom, is_active=True).update(is_active=False)
+        return Lecture.objects.create(course_id=slot.course_id, classroom=slot.classroom, teacher=teacher, is_active=True)
+
+    def superuser(self):
+        return User.objects.create(username='__bench_admin__', role=User.Role.SUPER_ADMIN)
+
+
+def _expect(response, status=200):
+    if response.status_code != status:
+        raise AssertionError(f"Expected HTTP {status}, got {response.status_code}")
+    return response
+
+
+# =========================================
+# SCENARIOS
+# =========================================
+@benchmark('hardware_sync')
+def bench_hardware_sync(ctx):
+    lecture = ctx.active_lecture()
+    gateway = lecture.classroom.esp_device_id
+    detected = list(
+        StudentProfile.objects.filter(department=lecture.course.department, current_semester=lecture.course.semester)
+        .values_list('user__device_fingerprint', flat=True)[:80]
+    )
+    client = Client()
+
+    def run():
+        _expect(client.post(
+            '/api/hardware/sync/', {'gateway_id': gateway, 'detected_students': detected},
+            content_type='application/json', HTTP_X_ESP32_API_KEY=settings.ESP32_SECRET_KEY,
+        ))
+    return run
+
+
+@benchmark('api_live_monitor')
+def bench_api_live_monitor(ctx):
+    teacher = ctx.busiest_teacher()
+    lecture = ctx.active_lecture(teacher)
+    client = ctx.client_for(teacher)
+    return lambda: _expect(client.get(f'/api/teacher/lecture/{lecture.id}/live/'))
+
+
+@benchmark('live_lecture_status')
+def bench_live_lecture_status(ctx):
+    teacher = ctx.busiest_teacher()
+    lecture = ctx.active_lecture(teacher)
+    client = ctx.client_for(teacher)
+    return lambda: _expect(client.get(f'/api/lecture/{lecture.id}/live-status/'))
+
+
+@benchmark('live_monitor')
+def bench_live_monitor(ctx):
+    teacher = ctx.busiest_teacher()
+    ctx.active_lecture(teacher)
+    client = ctx.client_for(teacher)
+    return lambda: _expect(client.get('/api/dashboard/teacher/live/'))
+
+
+@benchmark('attendance_history')
+def bench_attendance_history(ctx):
+    client = ctx.client_for(ctx.student().user)
+    return lambda: _expect(client.get('/api/attendance/history/'))
+
+
+@benchmark('student_analytics')
+def bench_student_analytics(ctx):
+    client = ctx.client_for(ctx.student().user)
+    return lambda: _expect(client.get('/api/dashboard/student/analytics/'))
+
+
+@benchmark('teacher_dashboard')
+def bench_teacher_dashboard(ctx):
+    client = ctx.client_for(ctx.busiest_teacher())
+    return lambda: _expect(client.get('/api/dashboard/teacher/'))
+
+
+@benchmark('calculate_daily_fines')
+def bench_calculate_daily_fines(ctx):
+    from .tasks import calculate_daily_fines
+    return lambda: calculate_daily_fines()
+
+
+@benchmark('bulk_upload_students', max_iterations=3)
+def bench_bulk_upload_students(ctx, rows=200):
+    # The upload view only queues a BackgroundJob (which never commits here), so time the import engine itself
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from .imports import import_students
+    dept = Department.objects.order_by('id').first()
+    header = "RollNo,FirstName,LastName,DeptCode,BatchYear,Division\n"
+    body = "".join(f"BENCH{i:05d},Bench,Student{i},{dept.code},{ctx.now.year},A\n" for i in range(rows))
+    payload = (header + body).encode('utf-8')
+
+    def run():
+        result = import_students(SimpleUploadedFile('students.csv', payload))
+        if result['created'] != rows:
+            raise AssertionError(f"Expected {rows} students, created {result['created']}")
+    return run
+
+
+@benchmark('import_marks', max_iterations=5)
+def bench_import_marks(ctx, students=500):
+    # Upserts one exam's marks twice (insert, then overwrite) on the configured backend, so the
+    # vendor-specific bulk_create(update_conflicts) path is what gets timed
+    from .models import Exam, Course
+    from .grading import ingest_marks
+    exam = Exam.objects.order_by('id').first()
+    course = Course.objects.filter(semester_id=exam.semester_id).order_by('id').first()
+    rolls = list(StudentProfile.objects.order_by('id').values_list('roll_no', flat=True)[:students])
+    rows = [(n, roll, course.code, n % exam.max_marks, False) for n, roll in enumerate(rolls, start=2)]
+
+    def run():
+        ingest_marks(exam, rows)
+        result = ingest_marks(exam, [(n, roll, code, (marks + 1) % exam.max_marks, absent) for n, roll, code, marks, absent in rows])
+        if result['errors'] or result['updated'] != len(rows):
+            raise AssertionError(f"Expected {len(rows)} updates, got {result['updated']} ({len(result['errors'])} errors)")
+    return run
+
+
+@benchmark('payment_webhook_burst', max_iterations=5)
+def bench_payment_webhook_burst(ctx, invoices=100, retries=3, workers=8):
+    # One burst = every invoice confirmed `retries` times plus a rival payment each, all in flight at once
+    # from `workers` threads like a gateway retry storm. The threads run on their own connections, outside
+    # the runner's rollback, so each run restores the invoices and the dues ledger itself.
+    from collections import defaultdict
+    from concurrent.futures import ThreadPoolExecutor
+    from decimal import Decimal
+    from django.db import connections
+    from rest_framework.test import APIClient
+    from .dues import dues_changed
+    from .models import FeeInvoice, PaymentTransaction
+    def on_own_connection(func):
+        def wrapped(*args):
+            try:
+                return func(*args)
+            finally:
+                connections.close_all()
+        return wrapped
+
+    # Even this read stays off the runner's connection: on SQLite an open read transaction blocks every writer
+    with ThreadPoolExecutor(1) as pool:
+        targets = pool.submit(on_own_connection(
+            lambda: list(FeeInvoice.objects.filter(is_paid=False).order_by('id').values_list('id', flat=True)[:invoices])
+        )).result()
+        gateway = pool.submit(on_own_connection(lambda: User.objects.order_by('id').first())).result()
+    deliveries = [
+        {'invoice_id': invoice_id, 'transaction_id': f"bench_txn_{invoice_id}_{attempt}" if attempt == retries else f"bench_txn_{invoice_id}"}
+        for attempt in range(retries + 1) for invoice_id in targets
+    ]
+
+    @on_own_connection
+    def deliver(payload):
+        client = APIClient()
+        client.force_authenticate(gateway)  # No session row: the runner's transaction would hide it from the threads
+        return client.post('/api/finance/webhook/success/', payload, format='json').status_code
+
+    @on_own_connection
+    def restore():
+        with transaction.atomic():
+            recorded = PaymentTransaction.objects.filter(transaction_id__startswith='bench_txn_').delete()[0]
+            owed = defaultdict(lambda: (Decimal('0.00'), 0))
+            for student_id, amount in FeeInvoice.objects.filter(id__in=targets, is_paid=True).values_list('student_id', 'amount'):
+                total, count = owed[student_id]
+                owed[student_id] = (total + amount, count + 1)
+            FeeInvoice.objects.filter(id__in=targets).update(is_paid=False)
+            dues_changed(owed)
+        return recorded
+
+    def run():
+        with ThreadPoolExecutor(workers) as pool:
+            statuses = list(pool.map(deliver, deliveries))
+            recorded = pool.submit(restore).result()
+        if any(status != 200 for status in statuses):
+            raise AssertionError(f"Unexpected responses: {sorted(set(statuses))}")
+        if recorded != len(targets):
+            raise AssertionError(f"Expected {len(targets)} payments, recorded {recorded}")
+    return run
+
+
+@benchmark('library_desk_batch', max_iterations=10)
+def bench_library_desk_batch(ctx, books=200):
+    # A queue of students each scanning a stack of books out, then the whole stack coming back
+    rolls = list(StudentProfile.objects.order_by('id').values_list('roll_no', flat=True)[:books // 5])
+    scans = [{'student': rolls[i % len(rolls)], 'book_uid': f"BENCH-{i:05d}", 'book_title': f"Bench Title {i}"} for i in range(books)]
+    client = ctx.client_for(ctx.superuser())
+
+    def run():
+        issued = _expect(client.post('/api/library/checkout/', {'scans': scans}, content_type='application/json')).json()
+        returned = _expect(client.post('/api/library/checkin/', {'book_uids': [s['book_uid'] for s in scans]}, content_type='application/json')).json()
+        if issued['issued'] != books or returned['returned'] != books:
+            raise AssertionError(f"Expected {books} issued/returned, got {issued['issued']}/{returned['returned']}")
+    return run
+
+
+@benchmark('librarian_dashboard')
+def bench_librarian_dashboard(ctx):
+    librarian = User.objects.create(username='__bench_librarian__', role=User.Role.LIBRARIAN)
+    client = ctx.client_for(librarian)
+    return lambda: _expect(client.get('/api/dashboard/librarian/'))
+
+
+@benchmark('fcm_batch_dispatch')
+def bench_fcm_batch_dispatch(ctx, messages=500):
+    # One full multicast batch against the local FCM stub (5% dead tokens); messages/s = ops/s x batch size
+    import threading
+    from django.conf import settings
+    from .fcm_stub import make_server
+    from .push import FCMClient, deliver
+    stub = make_server()
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    client = FCMClient(f"http://127.0.0.1:{stub.server_address[1]}", 'bench', concurrency=settings.FCM_CONCURRENCY)
+    batch = [
+        {'user_id': i, 'token': f"invalid-{i}" if i % 20 == 0 else f"token-{i}", 'title': "Attendance Alert", 'body': f"Bench push {i}"}
+        for i in range(messages)
+    ]
+
+    def run():
+        result = deliver(batch, client=client)
+        if result['sent'] + result['pruned'] != messages:
+            raise AssertionError(f"Expected {messages} outcomes, got {result}")
+    return run
+
+
+@benchmark('generate_transcript')
+def bench_generate_transcript(ctx):
+    profile = ctx.student()
+    client = ctx.client_for(ctx.superuser())
+    return lambda: _expect(client.get(f'/api/student/{profile.id}/transcript/'))
+
+
+# =========================================
+# RUNNER
+# =========================================
+class QueryCounter:
+    """connection.execute_wrapper hook that counts executed statements."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(sorted_samples, q):
+    """Nearest-rank percentile over an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, round(q * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def run_benchmark(name, iterations=20, warmup=2):
+    """
+    Runs one scenario and returns its stats. Everything — setup and every
+    iteration — happens inside a transaction that is rolled back.
+    """
+    setup = BENCHMARKS[name]
+    if setup.max_iterations:
+        iterations = min(iterations, setup.max_iterations)
+        warmup = min(warmup, 1)
+
+    with transaction.atomic():
+        ctx = BenchmarkContext()
+        operation = setup(ctx)
+
+        def once():
+            with transaction.atomic():
+                operation()
+                transaction.set_rollback(True)
+
+        for _ in range(warmup):
+            once()
+        # The test client resets connection.queries per request, so count at the cursor instead
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            once()
+
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            once()
+            samples.append((time.perf_counter() - started) * 1000)
+        transaction.set_rollback(True)
+
+    samples.sort()
+    total_seconds = sum(samples) / 1000
+    return {
+        'iterations': iterations,
+        'ops_per_sec': round(iterations / total_seconds, 2) if total_seconds else 0.0,
+        'mean_ms': round(sum(samples) / len(samples), 3),
+        'min_ms': round(samples[0], 3),
+        'p50_ms': round(percentile(samples, 0.50), 3),
+        'p90_ms': round(percentile(samples, 0.90), 3),
+        'p99_ms': round(percentile(samples, 0.99), 3),
+        'max_ms': round(samples[-1], 3),
+        'queries': queries.count,
+    }
+
+
+def compare(current, baseline, threshold):
+    """
+    Returns {name: relative p50 change} for scenarios present in both runs,
+    and the subset whose p50 latency grew by more than `threshold` (0.15 = 15%).
+    """
+    changes, regressions = {}, {}
+    for name, stats in current.items():
+        base = baseline.get(name)
+        if not base or not base.get('p50_ms'):
+            continue
+        change = (stats['p50_ms'] - base['p50_ms']) / base['p50_ms']
+        changes[name] = change
+        if change > threshold:
+            regressions[name] = change
+    return changes, regressions
+
+
+def dataset_summary():
+    return {
+        'db_vendor': connection.vendor,
+        'students': StudentProfile.objects.count(),
+        'classrooms': Classroom.objects.count(),
+        'lectures': Lecture.objects.count(),
+        'attendance': Attendance.objects.count(),
+        'grade_records': GradeRecord.objects.count(),
+    }
@@ -0,0 +1,212 @@
+"""
+Outstanding-dues ledger.
+
+Each StudentProfile carries its unpaid total and invoice count, so "has a
+financial hold?", "top defaulters" and "outstanding by department" are
+indexed reads instead of SUMs over FeeInvoice. dues_changed() is the single
+write hook, and it moves the ledger by deltas rather than by values computed
+from an earlier read: an UPDATE of F() + delta reads the row it writes under
+its lock, so concurrent writers (the payment webhook, invoicing chunks,
+penalty runs, reconciliation) compose instead of overwriting each other.
+Single-row saves go through the FeeInvoice signals; bulk writers call it
+themselves. recompute_dues() rebuilds from the invoices after edits that
+bypassed the hook.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import FeeInvoice, StudentProfile
+
+DUES_CHUNK_SIZE = 2000
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 200
+
+# (label, min days overdue, max days overdue); None = open-ended
+AGEING_BUCKETS = (
+    ('Not yet due', None, 0),
+    ('1-30 days', 1, 30),
+    ('31-60 days', 31, 60),
+    ('61-90 days', 61, 90),
+    ('90+ days', 91, None),
+)
+
+
+def recompute_dues(students=None, chunk_size=DUES_CHUNK_SIZE):
+    """
+    Rebuilds outstanding_dues and unpaid_invoices for a StudentProfile
+    queryset (default: everyone) from their invoices, one transaction per
+    chunk. Each chunk locks its profiles in id order before aggregating, so a
+    concurrent delta either committed first and is counted, or waits and
+    lands on top of the rebuilt value. Call it outside other transactions:
+    under REPEATABLE READ the aggregate must not read a snapshot taken before
+    the lock. Writes only the profiles whose values changed; returns the
+    number updated.
+    """
+    students = StudentProfile.objects.all() if students is None else students
+    ids = list(students.order_by('id').values_list('id', flat=True))
+    updated = 0
+    for i in range(0, len(ids), chunk_size):
+        with transaction.atomic():
+            current = list(
+                StudentProfile.objects.select_for_update().filter(id__in=ids[i:i + chunk_size]).order_by('id')
+                .values_list('id', 'outstanding_dues', 'unpaid_invoices')
+            )
+            totals = dict(
+                (sid, (total, count)) for sid, total, count in
+                FeeInvoice.objects.filter(student_id__in=ids[i:i + chunk_size], is_paid=False)
+                .values('student_id').annotate(total=Sum('amount'), count=Count('id'))
+                .values_list('student_id', 'total', 'count')
+            )
+
+            changed = defaultdict(list)
+            for sid, old_total, old_count in current:
+                new = totals.get(sid, (Decimal('0.00'), 0))
+                if new != (old_total, old_count):
+                    changed[new].append(sid)
+            for (total, count), changed_ids in changed.items():
+                StudentProfile.objects.filter(id__in=changed_ids).update(outstanding_dues=total, unpaid_invoices=count)
+            updated += sum(map(len, changed.values()))
+    return updated
+
+
+def dues_changed(deltas, chunk_size=DUES_CHUNK_SIZE):
+    """
+    Call inside the transaction that created, paid or deleted invoices, with
+    {student_id: (amount, invoices)} by which each student's unpaid total and
+    count moved. Applies one delta UPDATE per distinct change.
+    """
+    by_delta = defaultdict(list)
+    for student_id, delta in deltas.items():
+        if any(delta):
+            by_delta[delta].append(student_id)
+    for (amount, count), ids in by_delta.items():
+        ids.sort()
+        for i in range(0, len(ids), chunk_size):
+            StudentProfile.objects.filter(id__in=ids[i:i + chunk_size]).update(
+                outstanding_dues=F('outstanding_dues') + amount, unpaid_invoices=F('unpaid_invoices') + count,
+            )
+
+
+# =========================================
+# READS
+# =========================================
+def has_financial_hold(student):
+    return student.outstanding_dues > 0
+
+
+def _ageing_filter(today, low, high):
+    """Q for invoices between `low` and `high` days past due (inclusive)."""
+    q = Q()
+    if low is not None:
+        q &= Q(due_date__lte=today - timedelta(days=low))
+    if high is not None:
+        q &= Q(due_date__gte=today - timedelta(days=high))
+    return q
+
+
+def finance_summary(today=None):
+    """
+    Campus-wide dues picture from grouped aggregates: totals, outstanding by
+    department (ledger), by fee type and by ageing bucket (unpaid invoices).
+    """
+    today = today or timezone.localdate()
+    unpaid = FeeInvoice.objects.filter(is_paid=False)
+    totals = FeeInvoice.objects.aggregate(
+        collected=Sum('amount', filter=Q(is_paid=True)),
+        outstanding=Sum('amount', filter=Q(is_paid=False)),
+        unpaid_invoices=Count('id', filter=Q(is_paid=False)),
+    )
+    ageing = unpaid.aggregate(**{
+        f"amount_{i}": Sum('amount', filter=_ageing_filter(today, low, high))
+        for i, (_, low, high) in enumerate(AGEING_BUCKETS)
+    }, **{
+        f"count_{i}": Count('id', filter=_ageing_filter(today, low, high))
+        for i, (_, low, high) in enumerate(AGEING_BUCKETS)
+    })
+    return {
+        'collected': totals['collected'] or Decimal('0.00'),
+        'outstanding': totals['outstanding'] or Decimal('0.00'),
+        'unpaid_invoices': totals['unpaid_invoices'],
+        'defaulters': StudentProfile.objects.filter(outstanding_dues__gt=0).count(),
+        'by_department': outstanding_by_department(),
+        'by_fee_type': list(
+            unpaid.values('fee_type').annotate(outstanding=Sum('amount'), invoices=Count('id')).order_by('-outstanding')
+        ),
+        'ageing': [
+            {'bucket': label, 'outstanding': ageing[f"amount_{i}"] or Decimal('0.00'), 'invoices': ageing[f"count_{i}"]}
+            for i, (label, _, _) in enumerate(AGEING_BUCKETS)
+        ],
+    }
+
+
+# =========================================
+# KEYSET PAGINATION
+# =========================================
+# Cursors are "<sort value>_<id>" of the last row served; the next page is
+# everything strictly after that pair in the list's order. The redundant <=
+# bound keeps the predicate a single index range, so a page costs the same no
+# matter how deep the client has paged.
+
+def page_size(value, default=PAGE_SIZE):
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_cursor(cursor, parse_value):
+    """Returns (value, id) or None; raises ValueError on a malformed cursor."""
+    if not cursor:
+        return None
+    value, _, row_id = cursor.rpartition('_')
+    try:
+        value, row_id = parse_value(value), int(row_id)
+    except (InvalidOperation, TypeError):
+        raise ValueError("Malformed cursor.")
+    if isinstance(value, Decimal) and not value.is_finite():  # Decimal() accepts NaN and Infinity
+        raise ValueError("Malformed cursor.")
+    return value, row_id
+
+
+def defaulters_page(after=None, limit=PAGE_SIZE, department_id=None):
+    """
+    One page of students with dues, largest first, ties newest id first
+    (one index direction end to end). Returns
+    (students, next_cursor or None).
+    """
+    students = StudentProfile.objects.filter(outstanding_dues__gt=0)
+    if department_id:
+        students = students.filter(department_id=department_id)
+    position = parse_cursor(after, Decimal)
+    if position:
+        amount, last_id = position
+        students = students.filter(Q(outstanding_dues__lt=amount) | Q(id__lt=last_id), outstanding_dues__lte=amount)
+    page = list(students.select_related('user', 'department').order_by('-outstanding_dues', '-id')[:limit + 1])
+    cursor = f"{page[limit - 1].outstanding_dues}_{page[limit - 1].id}" if len(page) > limit else None
+    return page[:limit], cursor
+
+
+def unpaid_invoices_page(after=None, limit=PAGE_SIZE):
+    """One page of unpaid invoices, most recent due date first. Returns (invoices, next_cursor or None)."""
+    invoices = FeeInvoice.objects.filter(is_paid=False)
+    position = parse_cursor(after, date.fromisoformat)
+    if position:
+        due, last_id = position
+        invoices = invoices.filter(Q(due_date__lt=due) | Q(id__lt=last_id), due_date__lte=due)
+    page = list(invoices.select_related('student__user').order_by('-due_date', '-id')[:limit + 1])
+    cursor = f"{page[limit - 1].due_date.isoformat()}_{page[limit - 1].id}" if len(page) > limit else None
+    return page[:limit], cursor
+
+
+def outstanding_by_department():
+    """[{department_id, department__code, department__name, outstanding, defaulters}] largest first."""
+    return list(
+        StudentProfile.objects.values('department_id', 'department__code', 'department__name')
+        .annotate(outstanding=Sum('outstanding_dues'), defaulters=Count('id', filter=Q(outstanding_dues__gt=0)))
+        .order_by('-outstanding')
+    )
@@ -0,0 +1,87 @@
+"""
+Exam analytics: per-course and whole-exam distributions.
+
+One query pulls an exam's marks columns; statistics are computed with numpy
+per course group. Results are cached per exam and dropped by
+core.grading.grades_changed() when that exam's grades are written.
+"""
+import numpy as np
+from django.core.cache import cache
+
+from .models import Course, Exam, GradeRecord
+from .grading import EXAM_ANALYTICS_KEY, GRADE_BANDS
+
+ANALYTICS_TTL = 24 * 60 * 60
+HISTOGRAM_BINS = 10  # 0-10%, 10-20%, ... 90-100%
+GRADE_POINTS = [0] + [points for _, points in GRADE_BANDS]
+
+
+def _stats(marks, points, absent, exam):
+    """Distribution of one group; `marks` holds only the students who appeared."""
+    appeared = len(marks)
+    summary = {
+        'students': appeared + int(absent),
+        'appeared': appeared,
+        'absent': int(absent),
+        'mean': None, 'median': None, 'std': None, 'min': None, 'max': None,
+        'pass_rate': None,
+        'histogram': [0] * HISTOGRAM_BINS,
+        'grade_histogram': {str(gp): 0 for gp in GRADE_POINTS},
+    }
+    if not appeared:
+        return summary
+
+    percentages = marks * 100.0 / exam.max_marks
+    counts, _ = np.histogram(percentages, bins=HISTOGRAM_BINS, range=(0, 100))
+    grades = np.bincount(points, minlength=max(GRADE_POINTS) + 1)
+    summary.update({
+        'mean': round(float(marks.mean()), 2),
+        'median': round(float(np.median(marks)), 2),
+        'std': round(float(marks.std()), 2),
+        'min': round(float(marks.min()), 2),
+        'max': round(float(marks.max()), 2),
+        'pass_rate': round(float((marks >= exam.passing_marks).mean() * 100), 1),
+        'histogram': counts.tolist(),
+        'grade_histogram': {str(gp): int(grades[gp]) for gp in GRADE_POINTS},
+    })
+    return summary
+
+
+def build_exam_analytics(exam):
+    rows = list(GradeRecord.objects.filter(exam=exam).values_list('course_id', 'marks_obtained', 'is_absent', 'grade_point'))
+    course_ids = np.array([r[0] for r in rows], dtype=np.int64)
+    absent = np.array([r[2] or r[1] is None for r in rows], dtype=bool)
+    marks = np.array([0.0 if r[1] is None else float(r[1]) for r in rows], dtype=np.float64)
+    points = np.array([r[3] for r in rows], dtype=np.int64)
+
+    names = dict(Course.objects.filter(id__in=set(course_ids.tolist())).values_list('id', 'code'))
+    courses = []
+    for course_id in np.unique(course_ids):
+        group = course_ids == course_id
+        present = group & ~absent
+        courses.append({
+            'course_id': int(course_id),
+            'course_code': names.get(int(course_id)),
+            **_stats(marks[present], points[present], (group & absent).sum(), exam),
+        })
+
+    return {
+        'exam_id': exam.id,
+        'exam': exam.name,
+        'exam_type': exam.exam_type,
+        'max_marks': exam.max_marks,
+        'passing_marks': exam.passing_marks,
+        'histogram_bins': [f"{i * 100 // HISTOGRAM_BINS}-{(i + 1) * 100 // HISTOGRAM_BINS}%" for i in range(HISTOGRAM_BINS)],
+        'overall': _stats(marks[~absent], points[~absent], absent.sum(), exam),
+        'courses': sorted(courses, key=lambda c: c['course_code'] or ''),
+    }
+
+
+def exam_analytics(exam_id):
+    """Cached analytics for one exam; raises Exam.DoesNotExist."""
+    key = EXAM_ANALYTICS_KEY.format(exam_id)
+    analytics = cache.get(key)
+    if analytics is None:
+        analytics = build_exam_analytics(Exam.objects.get(id=exam_id))
+        cache.set(key, analytics, ANALYTICS_TTL)
+    return analytics
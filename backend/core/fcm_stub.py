@@ -0,0 +1,72 @@
+"""
+Local stand-in for the FCM HTTP v1 send endpoint, for load tests and benchmarks.
+
+Tokens starting with "invalid" get 404 UNREGISTERED; tokens starting with
+"flaky" get 503 UNAVAILABLE on their first delivery and succeed afterwards;
+everything else succeeds.
+"""
+import json
+import socket
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubFCMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real endpoint
+
+    def setup(self):
+        super().setup()
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # Headers and body go out as separate writes
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        token = payload.get('message', {}).get('token', '')
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            first_try = token not in server.seen
+            server.seen.add(token)
+
+        if token.startswith('invalid'):
+            self._reply(404, {'error': {'code': 404, 'status': 'NOT_FOUND', 'details': [{'errorCode': 'UNREGISTERED'}]}})
+        elif token.startswith('flaky') and first_try:
+            self._reply(503, {'error': {'code': 503, 'status': 'UNAVAILABLE'}}, {'Retry-After': '0'})
+        else:
+            self._reply(200, {'name': f"projects/stub/messages/{server.requests}"})
+
+    def _reply(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_server(host='127.0.0.1', port=0):
+    server = ThreadingHTTPServer((host, port), StubFCMHandler)
+    server.daemon_threads = True
+    server.lock, server.requests, server.connections, server.seen = threading.Lock(), 0, 0, set()
+    return server
+
+
+@contextmanager
+def running_stub():
+    """Serves the stub on a free local port in a background thread; yields the server (base URL in .url)."""
+    server = make_server()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
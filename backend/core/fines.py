@@ -0,0 +1,57 @@
+"""
+Nightly penalty engine.
+
+Late-payment penalties are one anti-join SELECT plus bulk_create, so the run
+time does not grow with the number of overdue rows. A FineRun ledger row per
+date, inserted in the same transaction, makes a second delivery of the same
+night's task a no-op. Library fines are not accrued here at all; they are
+derived from due dates on read (core/library.py).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import FeeInvoice, FineRun, StudentProfile
+from .dues import dues_changed
+
+PENALTY_AMOUNT = Decimal('500.00')
+PENALTY_GRACE_DAYS = 7  # Unpaid this long past the due date earns a penalty
+PENALTY_DUE_DAYS = 7
+PENALTY_BATCH_SIZE = 1000
+
+
+def students_due_penalty(today):
+    """Students with an invoice unpaid PENALTY_GRACE_DAYS past due and no penalty raised today."""
+    overdue = FeeInvoice.objects.filter(
+        student_id=OuterRef('pk'), is_paid=False, due_date__lte=today - timedelta(days=PENALTY_GRACE_DAYS),
+    ).exclude(fee_type='PENALTY')
+    penalised = FeeInvoice.objects.filter(
+        student_id=OuterRef('pk'), fee_type='PENALTY', amount=PENALTY_AMOUNT, created_at__date=today,
+    )
+    return StudentProfile.objects.filter(Exists(overdue)).exclude(Exists(penalised)).values_list('id', flat=True)
+
+
+def run_daily_fines(today=None):
+    """
+    Applies one night's penalties. Returns the FineRun, or None when this
+    date was already processed.
+    """
+    today = today or timezone.localdate()
+    with transaction.atomic():
+        run, created = FineRun.objects.get_or_create(run_date=today)
+        if not created:
+            return None
+
+        student_ids = list(students_due_penalty(today))
+        FeeInvoice.objects.bulk_create([
+            FeeInvoice(student_id=student_id, fee_type='PENALTY', amount=PENALTY_AMOUNT,
+                       due_date=today + timedelta(days=PENALTY_DUE_DAYS))
+            for student_id in student_ids
+        ], batch_size=PENALTY_BATCH_SIZE)
+        dues_changed({student_id: (PENALTY_AMOUNT, 1) for student_id in student_ids})  # bulk_create skips the ledger signal
+        run.penalties_created = len(student_ids)
+        run.save(update_fields=['penalties_created'])
+    return run
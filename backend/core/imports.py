@@ -0,0 +1,258 @@
+"""
+Bulk import engines for registrar and coordinator uploads.
+
+Every engine resolves foreign keys through dictionaries preloaded once per
+file, validates rows in memory and writes the valid ones with bulk_create()
+in chunks. bulk_create() bypasses model signals, so each engine calls the
+cache invalidation helpers itself.
+"""
+import csv
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .models import User, Department, Batch, Semester, StudentProfile, Course, Classroom, StaffProfile, TimeTable
+from .intervals import SlotIndex, slot_index
+from .schedule import bump_timetable_version
+
+IMPORT_CHUNK_SIZE = 1000
+
+DAY_NAMES = {
+    name: number for number, full in TimeTable.DAYS_OF_WEEK
+    for name in (full.lower(), full[:3].lower(), str(number))
+}
+
+
+class ImportFileError(ValueError):
+    """The upload as a whole is unreadable (wrong type, missing columns)."""
+
+
+def read_rows(upload, required_columns):
+    """
+    Yields (row_number, {column: value}) from a CSV or XLSX upload. Headers are
+    matched case-insensitively ignoring spaces and underscores; row numbers
+    count the header as row 1, like a spreadsheet.
+    """
+    name = upload.name.lower()
+    if name.endswith('.csv'):
+        rows = csv.reader(io.TextIOWrapper(upload.file, encoding='utf-8-sig'))
+    elif name.endswith('.xlsx'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportFileError("XLSX support requires openpyxl. Upload a .csv file instead.")
+        sheet = load_workbook(upload.file, read_only=True, data_only=True).active
+        rows = (['' if cell is None else str(cell) for cell in row] for row in sheet.iter_rows(values_only=True))
+    else:
+        raise ImportFileError("Please upload a .csv or .xlsx file.")
+
+    header = [h.strip().lower().replace(' ', '').replace('_', '') for h in next(rows, [])]
+    missing = [c for c in required_columns if c.lower() not in header]
+    if missing:
+        raise ImportFileError(f"Missing column(s): {', '.join(missing)}.")
+    positions = {c: header.index(c.lower()) for c in required_columns}
+
+    for number, row in enumerate(rows, start=2):
+        if not any(str(v).strip() for v in row):
+            continue
+        yield number, {c: (str(row[i]).strip() if i < len(row) else '') for c, i in positions.items()}
+
+
+def _parse_time(value):
+    for fmt in ('%H:%M', '%H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            pass
+    raise ValueError
+
+
+# =========================================
+# TIMETABLE IMPORT
+# =========================================
+TIMETABLE_COLUMNS = ('Day', 'StartTime', 'EndTime', 'CourseCode', 'RoomNumber', 'TeacherEmpId', 'Division')
+
+
+def import_timetable(upload, replace=False, dry_run=False, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Imports weekly slots from a file with TIMETABLE_COLUMNS. Courses, rooms and
+    teachers are resolved from dictionaries loaded in three queries; clashes
+    (room, teacher, division) are checked in memory against the stored
+    timetable — or an empty one when `replace` is set — and against earlier
+    rows of the same file. Valid rows are written in one transaction; with
+    `replace` nothing is written unless every row is valid.
+
+    Returns {'rows', 'created', 'errors': [(row_number, [messages])]}.
+    """
+    courses = {c['code'].upper(): c for c in Course.objects.values('id', 'code', 'department_id', 'semester_id')}
+    rooms = {r['room_number'].upper(): r['id'] for r in Classroom.objects.values('id', 'room_number')}
+    teachers = {e.upper(): uid for e, uid in StaffProfile.objects.values_list('employee_id', 'user_id')}
+    index = SlotIndex() if replace else slot_index()
+
+    errors, pending, total = [], [], 0
+    for number, row in read_rows(upload, TIMETABLE_COLUMNS):
+        total += 1
+        problems = []
+        day = DAY_NAMES.get(row['Day'].lower())
+        if day is None:
+            problems.append(f"Unknown day '{row['Day']}'.")
+        try:
+            start, end = _parse_time(row['StartTime']), _parse_time(row['EndTime'])
+        except ValueError:
+            start = end = None
+            problems.append("Times must be HH:MM.")
+        course = courses.get(row['CourseCode'].upper())
+        if not course:
+            problems.append(f"Course '{row['CourseCode']}' not found.")
+        room_id = rooms.get(row['RoomNumber'].upper())
+        if not room_id:
+            problems.append(f"Room '{row['RoomNumber']}' not found.")
+        teacher_id = teachers.get(row['TeacherEmpId'].upper())
+        if not teacher_id:
+            problems.append(f"Teacher '{row['TeacherEmpId']}' not found.")
+        division = (row['Division'] or 'A').upper()
+
+        if not problems:
+            problems = index.check(day, start, end, room_id, teacher_id, (course['department_id'], course['semester_id'], division))
+        if problems:
+            errors.append((number, problems))
+            continue
+
+        index.add(f"row {number}", day, start, end, room_id, teacher_id, (course['department_id'], course['semester_id'], division))
+        pending.append(TimeTable(
+            day_of_week=day, start_time=start, end_time=end, course_id=course['id'],
+            classroom_id=room_id, teacher_id=teacher_id, division=division,
+        ))
+
+    if replace and errors:
+        dry_run = True  # A partial replacement would silently drop slots; replace is all-or-nothing
+    if pending and not dry_run:
+        with transaction.atomic():
+            if replace:
+                TimeTable.objects.all().delete()
+            for i in range(0, len(pending), chunk_size):
+                TimeTable.objects.bulk_create(pending[i:i + chunk_size])
+        bump_timetable_version()
+
+    return {'rows': total, 'created': 0 if dry_run else len(pending), 'errors': errors}
+
+
+# =========================================
+# STUDENT IMPORT
+# =========================================
+STUDENT_COLUMNS = ('RollNo', 'FirstName', 'LastName', 'DeptCode', 'BatchYear', 'Division')
+
+
+def hash_workers():
+    """Threads for password hashing; hashlib's PBKDF2 releases the GIL, so they run on separate cores."""
+    return settings.IMPORT_HASH_WORKERS or os.cpu_count() or 1
+
+
+def _write_students(chunk, hashed, departments, batches, semester):
+    """Writes one chunk of validated rows (caller holds the transaction); returns the number created."""
+    users = [
+        User(username=row['RollNo'], password=password, first_name=row['FirstName'],
+             last_name=row['LastName'], role=User.Role.STUDENT)
+        for row, password in zip(chunk, hashed)
+    ]
+    User.objects.bulk_create(users)
+    if users[0].pk is None:  # Backends without RETURNING (MySQL) leave pks unset
+        ids = dict(User.objects.filter(username__in=[u.username for u in users]).values_list('username', 'id'))
+        for user in users:
+            user.pk = ids[user.username]
+    StudentProfile.objects.bulk_create([
+        StudentProfile(
+            user=user, roll_no=row['RollNo'], department_id=departments[row['DeptCode'].upper()],
+            batch_id=batches[(departments[row['DeptCode'].upper()], int(row['BatchYear']))],
+            division=row['Division'].upper(), current_semester=semester,
+        )
+        for row, user in zip(chunk, users)
+    ])
+    return len(users)
+
+
+def import_students(upload, chunk_size=IMPORT_CHUNK_SIZE, start_after_row=0, on_chunk=None):
+    """
+    Imports students from a file with STUDENT_COLUMNS; each student's initial
+    password is their roll number. Existing usernames, departments and batches
+    are preloaded, so validation issues no per-row queries. Passwords are
+    hashed at the hasher's full strength across hash_workers() threads,
+    outside the transaction, and each chunk is written in its own transaction.
+
+    Rows up to `start_after_row` are skipped (resuming an interrupted job);
+    `on_chunk(result, last_row)` runs inside every chunk's transaction, so a
+    checkpoint saved there commits together with the chunk.
+    Returns {'rows', 'created', 'skipped': [(row_number, roll_no)], 'errors': [(row_number, [messages])]}.
+    """
+    existing = set(User.objects.values_list('username', flat=True))
+    departments = {code.upper(): dept_id for code, dept_id in Department.objects.values_list('code', 'id')}
+    batches = {(dept_id, year): batch_id for batch_id, dept_id, year in Batch.objects.values_list('id', 'department_id', 'year')}
+    semester = Semester.objects.filter(is_active=True).first()
+
+    result = {'rows': 0, 'created': 0, 'skipped': [], 'errors': []}
+
+    def commit_chunk(chunk, last_row):
+        hashed = list(pool.map(make_password, [r['RollNo'] for r in chunk]))  # Outside the transaction: CPU-bound
+        with transaction.atomic():
+            if chunk:
+                result['created'] += _write_students(chunk, hashed, departments, batches, semester)
+            if on_chunk:
+                on_chunk(result, last_row)
+
+    with ThreadPoolExecutor(hash_workers(), thread_name_prefix='import-hash') as pool:
+        chunk, last_row = [], start_after_row
+        for number, row in read_rows(upload, STUDENT_COLUMNS):
+            if number <= start_after_row:
+                continue
+            result['rows'] += 1
+            last_row = number
+            roll = row['RollNo']
+            if roll in existing:
+                result['skipped'].append((number, roll))
+                continue
+
+            problems = []
+            if not roll:
+                problems.append("RollNo is empty.")
+            dept_id = departments.get(row['DeptCode'].upper())
+            if not dept_id:
+                problems.append(f"Dept '{row['DeptCode']}' not found.")
+            try:
+                year = int(row['BatchYear'])
+            except ValueError:
+                problems.append(f"BatchYear '{row['BatchYear']}' is not a year.")
+            if not row['Division']:
+                problems.append("Division is empty.")
+            if problems:
+                result['errors'].append((number, problems))
+                continue
+
+            if (dept_id, year) not in batches:
+                batches[(dept_id, year)] = Batch.objects.create(year=year, department_id=dept_id).id
+            existing.add(roll)  # Later duplicates of this roll in the same file are skipped
+            chunk.append(row)
+
+            if len(chunk) >= chunk_size:
+                commit_chunk(chunk, last_row)
+                chunk = []
+
+        commit_chunk(chunk, last_row)
+    return result
+
+
+def error_report_lines(errors):
+    """CSV lines (header first) for an import's row errors, for streaming responses."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['Row', 'Errors'])
+    yield buffer.getvalue()
+    for number, problems in errors:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([number, ' | '.join(problems)])
+        yield buffer.getvalue()
@@ -0,0 +1,86 @@
+"""
+Notification inbox reads.
+
+The unread badge is polled constantly, so each user's unread count lives in
+the cache and is adjusted in place: +n when rows are created (post_save
+signal, or notifications_created() from bulk writers) and -n by the single
+UPDATE that marks rows read. A miss is recounted from the (user, is_read,
+created_at) index, and the TTL bounds any drift. Listing is keyset-paged on
+(created_at, id), newest first.
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import NotificationInbox
+from .dues import parse_cursor, PAGE_SIZE
+
+UNREAD_KEY = 'inbox:unread:{}'
+UNREAD_TTL = 6 * 60 * 60
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def unread_count(user_id):
+    count = cache.get(UNREAD_KEY.format(user_id))
+    if count is None:
+        count = NotificationInbox.objects.filter(user_id=user_id, is_read=False).count()
+        cache.add(UNREAD_KEY.format(user_id), count, UNREAD_TTL)
+    return count
+
+
+def _adjust(user_id, delta):
+    key = UNREAD_KEY.format(user_id)
+    try:
+        if cache.incr(key, delta) < 0:
+            cache.delete(key)  # Drifted; recount on the next read
+    except ValueError:
+        pass  # Not cached; the next read counts from the table
+
+
+def notifications_created(user_ids):
+    """Call inside the transaction that created inbox rows for `user_ids` (one entry per row)."""
+    created = Counter(user_ids)
+    if created:
+        transaction.on_commit(lambda: [_adjust(user_id, n) for user_id, n in created.items()])
+
+
+def mark_read(user_id, ids=None):
+    """Marks the user's notifications read (all, or just `ids`) in one UPDATE; returns how many changed."""
+    unread = NotificationInbox.objects.filter(user_id=user_id, is_read=False)
+    if ids is not None:
+        unread = unread.filter(id__in=ids)
+    updated = unread.update(is_read=True)
+    if updated:
+        transaction.on_commit(lambda: _adjust(user_id, -updated))
+    return updated
+
+
+def _micros(moment):
+    """Cursor form of a timestamp: integer microseconds, URL-safe and exact."""
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value):
+    try:
+        return EPOCH + timedelta(microseconds=int(value))
+    except OverflowError:
+        raise ValueError("Malformed cursor.")
+
+
+def inbox_page(user_id, after=None, limit=PAGE_SIZE, unread_only=False):
+    """One page of the user's notifications, newest first. Returns (notifications, next_cursor or None)."""
+    notifications = NotificationInbox.objects.filter(user_id=user_id)
+    if unread_only:
+        notifications = notifications.filter(is_read=False)
+    position = parse_cursor(after, _from_micros)
+    if position:
+        created_at, last_id = position
+        notifications = notifications.filter(
+            Q(created_at__lt=created_at) | Q(id__lt=last_id), created_at__lte=created_at,
+        )
+    page = list(notifications.order_by('-created_at', '-id')[:limit + 1])
+    cursor = f"{_micros(page[limit - 1].created_at)}_{page[limit - 1].id}" if len(page) > limit else None
+    return page[:limit], cursor
@@ -0,0 +1,175 @@
+"""
+Interval index over weekly TimeTable slots.
+
+Slots are grouped per (resource, day) where a resource is a classroom, a
+teacher or a division (department + semester + division letter). Within a
+group a valid timetable never overlaps, so intervals are kept sorted by start
+and the ends are sorted too: a clash check is one bisect plus a short walk
+back over the overlapping neighbours — O(log n) per slot.
+
+The index is built from one query and cached under the timetable version
+(core/schedule.py), so any TimeTable write invalidates it.
+"""
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import time
+
+from django.core.cache import cache
+
+from .models import Classroom, TimeTable
+from .schedule import timetable_version
+
+DAY_START = time(8, 0)
+DAY_END = time(18, 0)
+
+RESOURCE_LABELS = {'room': 'Room', 'teacher': 'Teacher', 'division': 'Division'}
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def from_minutes(value):
+    return time(value // 60, value % 60)
+
+
+def slot_keys(day, classroom_id, teacher_id, division_key):
+    """The three resource groups a slot occupies."""
+    return (
+        ('room', classroom_id, day),
+        ('teacher', teacher_id, day),
+        ('division', division_key, day),
+    )
+
+
+class SlotIndex:
+    """Sorted, per-resource lists of (start, end, slot_id) in minutes."""
+
+    def __init__(self):
+        self._groups = defaultdict(list)
+        self._slots = {}  # slot_id -> (entry, keys), so edits only touch their own groups
+        self.legacy_clashes = []  # Overlaps already present in the stored timetable
+
+    @classmethod
+    def from_database(cls):
+        index = cls()
+        rows = TimeTable.objects.values_list(
+            'id', 'day_of_week', 'start_time', 'end_time', 'classroom_id', 'teacher_id',
+            'course__department_id', 'course__semester_id', 'division',
+        ).order_by('day_of_week', 'start_time')
+        for slot_id, day, start, end, room_id, teacher_id, dept_id, sem_id, division in rows:
+            index.add(slot_id, day, start, end, room_id, teacher_id, (dept_id, sem_id, division), record_clashes=True)
+        return index
+
+    def conflicts(self, key, start, end, ignore_id=None):
+        """Slot ids in group `key` overlapping [start, end) in minutes."""
+        group = self._groups.get(key)
+        if not group:
+            return []
+        found = []
+        i = bisect_left(group, (end,)) - 1
+        while i >= 0 and group[i][1] > start:
+            if group[i][2] != ignore_id:
+                found.append(group[i][2])
+            i -= 1
+        return found
+
+    def add(self, slot_id, day, start, end, classroom_id, teacher_id, division_key, record_clashes=False):
+        entry = (to_minutes(start), to_minutes(end), slot_id)
+        keys = slot_keys(day, classroom_id, teacher_id, division_key)
+        for key in keys:
+            if record_clashes:
+                self.legacy_clashes.extend((key[0], slot_id, other) for other in self.conflicts(key, entry[0], entry[1]))
+            insort(self._groups[key], entry)
+        self._slots[slot_id] = (entry, keys)
+
+    def remove(self, slot_id):
+        entry, keys = self._slots.pop(slot_id, (None, ()))
+        for key in keys:
+            group = self._groups[key]
+            i = bisect_left(group, entry)
+            if i < len(group) and group[i] == entry:
+                del group[i]
+
+    # =========================================
+    # VALIDATION
+    # =========================================
+    def check(self, day, start, end, classroom_id, teacher_id, division_key, ignore_id=None):
+        """Returns human-readable clash messages for one candidate slot."""
+        if end <= start:
+            return ["End time must be after start time."]
+        errors = []
+        lo, hi = to_minutes(start), to_minutes(end)
+        for key in slot_keys(day, classroom_id, teacher_id, division_key):
+            clashes = self.conflicts(key, lo, hi, ignore_id)
+            if clashes:
+                errors.append(f"{RESOURCE_LABELS[key[0]]} is already booked (slot {', '.join(map(str, sorted(clashes)))}).")
+        return errors
+
+    def validate_many(self, candidates):
+        """
+        Validates a batch of candidate dicts (day, start, end, classroom_id,
+        teacher_id, division_key, optional id) against the stored timetable and
+        against each other. Accepted candidates are added to the index as it
+        goes, so a later row clashing with an earlier one in the same batch is
+        caught. Returns {position: [messages]} for the rejected ones.
+        """
+        rejected = {}
+        for position, slot in enumerate(candidates):
+            slot_id = slot.get('id')
+            if slot_id is not None:
+                self.remove(slot_id)
+            errors = self.check(
+                slot['day'], slot['start'], slot['end'], slot['classroom_id'],
+                slot['teacher_id'], slot['division_key'],
+            )
+            if errors:
+                rejected[position] = errors
+                continue
+            self.add(
+                slot_id if slot_id is not None else f"new:{position}", slot['day'], slot['start'], slot['end'],
+                slot['classroom_id'], slot['teacher_id'], slot['division_key'],
+            )
+        return rejected
+
+    # =========================================
+    # FINDERS
+    # =========================================
+    def free_rooms(self, day, start, end, room_ids):
+        lo, hi = to_minutes(start), to_minutes(end)
+        return [room_id for room_id in room_ids if not self.conflicts(('room', room_id, day), lo, hi)]
+
+    def free_windows(self, key, day_start=DAY_START, day_end=DAY_END, min_minutes=0):
+        """Gaps between the group's slots inside the working day, as (start, end) times."""
+        windows = []
+        cursor, stop = to_minutes(day_start), to_minutes(day_end)
+        for start, end, _ in self._groups.get(key, ()):
+            if start > cursor:
+                windows.append((cursor, min(start, stop)))
+            cursor = max(cursor, end)
+            if cursor >= stop:
+                break
+        if cursor < stop:
+            windows.append((cursor, stop))
+        return [(from_minutes(a), from_minutes(b)) for a, b in windows if b - a >= max(min_minutes, 1)]
+
+
+def slot_index():
+    """Cached SlotIndex for the current timetable version. Callers may mutate their copy."""
+    key = f"intervals:v{timetable_version()}"
+    index = cache.get(key)
+    if index is None:
+        index = SlotIndex.from_database()
+        cache.set(key, index, 24 * 60 * 60)
+    return index
+
+
+def find_free_rooms(day, start, end):
+    """Classrooms with no slot overlapping [start, end) on `day`, ordered by room number."""
+    rooms = list(Classroom.objects.order_by('room_number').values('id', 'room_number', 'capacity'))
+    free = set(slot_index().free_rooms(day, start, end, [room['id'] for room in rooms]))
+    return [room for room in rooms if room['id'] in free]
+
+
+def find_teacher_free_windows(teacher_id, day, min_minutes=0):
+    return slot_index().free_windows(('teacher', teacher_id, day), min_minutes=min_minutes)
@@ -0,0 +1,124 @@
+"""
+Bulk semester invoicing.
+
+Finance describes a billing run as fee rules: a fee type, an amount and a due
+date, optionally narrowed to a department and/or batch year. Each rule is
+expanded with one anti-join SELECT (students in scope without an invoice of
+that fee type and due date) and written with chunked bulk_create, so
+re-running a rule — or resuming an interrupted job — never double-bills.
+
+Rules apply in order and a student gets at most one invoice per fee type and
+due date, so list specific rules (one batch) before general ones (whole
+department).
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Department, FeeInvoice, StudentProfile
+from .dues import dues_changed
+
+INVOICE_CHUNK_SIZE = 2000
+FEE_TYPES = {code for code, _ in FeeInvoice.FEE_TYPES}
+
+
+def parse_rules(raw_rules):
+    """
+    Validates rule dicts {fee_type, amount, due_date (YYYY-MM-DD), department
+    (code, optional), batch (year, optional)}. Returns (rules, errors) where
+    rules are JSON-safe and errors are [(rule_number, [messages])].
+    """
+    departments = {code.upper(): dept_id for code, dept_id in Department.objects.values_list('code', 'id')}
+    rules, errors = [], []
+    for number, raw in enumerate(raw_rules or [], start=1):
+        if not isinstance(raw, dict):
+            errors.append((number, ["Rule must be an object."]))
+            continue
+        problems = []
+        fee_type = str(raw.get('fee_type', '')).strip().upper()
+        if fee_type not in FEE_TYPES:
+            problems.append(f"Unknown fee type '{raw.get('fee_type')}'.")
+        try:
+            amount = Decimal(str(raw.get('amount')))
+            if amount <= 0:
+                problems.append("Amount must be positive.")
+        except InvalidOperation:
+            problems.append(f"Amount '{raw.get('amount')}' is not a number.")
+        try:
+            due_date = date.fromisoformat(str(raw.get('due_date')))
+        except ValueError:
+            problems.append("due_date must be YYYY-MM-DD.")
+        department_id = None
+        if raw.get('department'):
+            department_id = departments.get(str(raw['department']).strip().upper())
+            if not department_id:
+                problems.append(f"Department '{raw['department']}' not found.")
+        batch_year = None
+        if raw.get('batch'):
+            try:
+                batch_year = int(raw['batch'])
+            except (TypeError, ValueError):
+                problems.append(f"Batch '{raw['batch']}' is not a year.")
+        if problems:
+            errors.append((number, problems))
+            continue
+        rules.append({
+            'fee_type': fee_type, 'amount': str(amount), 'due_date': due_date.isoformat(),
+            'department_id': department_id, 'batch_year': batch_year,
+        })
+    return rules, errors
+
+
+def _scope(rule):
+    students = StudentProfile.objects.all()
+    if rule['department_id']:
+        students = students.filter(department_id=rule['department_id'])
+    if rule['batch_year']:
+        students = students.filter(batch__year=rule['batch_year'])
+    return students
+
+
+def students_to_invoice(rule):
+    """Ids of students in the rule's scope without this invoice yet (one anti-join)."""
+    billed = FeeInvoice.objects.filter(student_id=OuterRef('pk'), fee_type=rule['fee_type'], due_date=rule['due_date'])
+    return _scope(rule).exclude(Exists(billed)).order_by('id').values_list('id', flat=True)
+
+
+def count_in_scope(rules):
+    return sum(_scope(rule).count() for rule in rules)
+
+
+def generate_invoices(rules, chunk_size=INVOICE_CHUNK_SIZE, start_rule=0, on_chunk=None):
+    """
+    Creates invoices for parsed rules from `start_rule` on. Each chunk and the
+    affected students' dues ledger commit together; `on_chunk(result,
+    rule_index, done)` runs inside that transaction (done: rule finished).
+
+    Returns {'created', 'skipped', 'amount', 'by_fee_type': {fee_type: {'created', 'amount'}}}.
+    """
+    result = {'created': 0, 'skipped': 0, 'amount': Decimal('0.00'), 'by_fee_type': defaultdict(lambda: {'created': 0, 'amount': Decimal('0.00')})}
+    for index in range(start_rule, len(rules)):
+        rule = rules[index]
+        amount, due_date = Decimal(rule['amount']), date.fromisoformat(rule['due_date'])
+        student_ids = list(students_to_invoice(rule))
+        result['skipped'] += _scope(rule).count() - len(student_ids)
+
+        chunks = [student_ids[i:i + chunk_size] for i in range(0, len(student_ids), chunk_size)] or [[]]
+        for position, chunk in enumerate(chunks):
+            with transaction.atomic():
+                FeeInvoice.objects.bulk_create([
+                    FeeInvoice(student_id=student_id, fee_type=rule['fee_type'], amount=amount, due_date=due_date)
+                    for student_id in chunk
+                ])
+                dues_changed({student_id: (amount, 1) for student_id in chunk})  # bulk_create skips the ledger signal
+                result['created'] += len(chunk)
+                result['amount'] += amount * len(chunk)
+                result['by_fee_type'][rule['fee_type']]['created'] += len(chunk)
+                result['by_fee_type'][rule['fee_type']]['amount'] += amount * len(chunk)
+                if on_chunk:
+                    on_chunk(result, index, position == len(chunks) - 1)
+    result['by_fee_type'] = dict(result['by_fee_type'])
+    return result
@@ -0,0 +1,208 @@
+"""
+Background job runner.
+
+Views create a BackgroundJob and queue it with queue_job(); a Celery worker
+claims it with a conditional UPDATE (so a job never runs twice at once) and
+dispatches to the runner registered for its job_type. Runners advance the
+job's checkpoint inside each chunk's transaction. If a worker dies, the job
+is left RUNNING with a stale heartbeat; resume_stalled_jobs() puts it back
+to PENDING and the next run starts after the checkpoint.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import BackgroundJob, User
+from .imports import import_students, read_rows, STUDENT_COLUMNS
+from .invoicing import generate_invoices, count_in_scope
+from .mailer import send_attendance_warnings, mail_scope
+
+STALE_AFTER = timedelta(minutes=10)
+MAX_STORED_ERRORS = 1000
+
+RUNNERS = {}
+
+
+def runner(job_type):
+    def register(func):
+        RUNNERS[job_type] = func
+        return func
+    return register
+
+
+def queue_job(job):
+    """Sends the job to a worker once the surrounding transaction commits."""
+    from .tasks import run_background_job
+    transaction.on_commit(lambda: run_background_job.delay(job.id))
+    return job
+
+
+def save_progress(job, *fields):
+    job.heartbeat_at = timezone.now()
+    job.save(update_fields=['heartbeat_at', *fields])
+
+
+def execute_job(job_id):
+    """Claims and runs one job. Returns its final status, or None if another worker holds it."""
+    now = timezone.now()
+    claimed = BackgroundJob.objects.filter(id=job_id, status='PENDING').update(
+        status='RUNNING', heartbeat_at=now, started_at=now, message=''
+    )
+    if not claimed:
+        return None
+
+    job = BackgroundJob.objects.get(id=job_id)
+    try:
+        RUNNERS[job.job_type](job)
+    except Exception as exc:
+        job.status = 'FAILED'
+        job.message = f"{type(exc).__name__}: {exc}"
+    else:
+        job.status = 'COMPLETED'
+    job.finished_at = timezone.now()
+    save_progress(job, 'status', 'message', 'finished_at')
+    return job.status
+
+
+def resume_stalled_jobs():
+    """Re-queues RUNNING jobs whose worker stopped reporting progress; returns how many."""
+    cutoff = timezone.now() - STALE_AFTER
+    stalled = list(
+        BackgroundJob.objects.filter(status='RUNNING')
+        .filter(Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True))
+        .values_list('id', flat=True)
+    )
+    for job_id in stalled:
+        if BackgroundJob.objects.filter(id=job_id, status='RUNNING').update(status='PENDING'):
+            queue_job(BackgroundJob(id=job_id))
+    return len(stalled)
+
+
+def can_view_job(user, job):
+    """Job pages show row errors and roll numbers: only the job's creator and administrators may see them."""
+    return job.created_by_id == user.id or user.role in [User.Role.SUPER_ADMIN, User.Role.ADMIN, User.Role.ACADEMIC_COORDINATOR]
+
+
+def serialize_job(job):
+    return {
+        'id': job.id,
+        'job_type': job.job_type,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'processed': job.processed,
+        'result': job.result,
+        'errors': job.errors,
+        'message': job.message,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+# =========================================
+# RUNNERS
+# =========================================
+@runner('STUDENT_IMPORT')
+def run_student_import(job):
+    """Runs import_students() over the job's file, resuming after job.checkpoint."""
+    if not job.total:
+        with job.input_file.open('rb'):
+            job.total = sum(1 for _ in read_rows(job.input_file, STUDENT_COLUMNS))
+        save_progress(job, 'total')
+
+    # Counters from an interrupted earlier run, kept so totals stay cumulative
+    base = {'processed': job.processed, 'created': job.result.get('created', 0), 'skipped': job.result.get('skipped', 0)}
+    base_errors = list(job.errors)
+    error_count = job.result.get('invalid', len(base_errors))
+
+    def on_chunk(result, last_row):
+        job.checkpoint = last_row
+        job.processed = base['processed'] + result['rows']
+        job.result = {
+            'created': base['created'] + result['created'],
+            'skipped': base['skipped'] + len(result['skipped']),
+            'invalid': error_count + len(result['errors']),
+        }
+        job.errors = (base_errors + [{'row': n, 'errors': p} for n, p in result['errors']])[:MAX_STORED_ERRORS]
+        save_progress(job, 'checkpoint', 'processed', 'result', 'errors')
+
+    with job.input_file.open('rb'):
+        import_students(
+            job.input_file, chunk_size=job.params.get('chunk_size', 500), start_after_row=job.checkpoint, on_chunk=on_chunk
+        )
+
+
+@runner('INVOICE_GENERATION')
+def run_invoice_generation(job):
+    """
+    Runs generate_invoices() over job.params['rules'] (already parsed). The
+    checkpoint counts finished rules; a resumed run repeats at most the rule
+    it was in, whose anti-join skips the students already billed. That rule
+    then counts everything it covered before the interruption again, so
+    result['rule_processed'] records it to be taken out on resume.
+    """
+    rules = job.params['rules']
+    if not job.total:
+        job.total = count_in_scope(rules)
+        save_progress(job, 'total')
+
+    base = {
+        'processed': job.processed, 'created': job.result.get('created', 0), 'skipped': job.result.get('skipped', 0),
+        'amount': Decimal(job.result.get('amount', '0')), 'by_fee_type': job.result.get('by_fee_type', {}),
+    }
+    carried = job.result.get('rule_processed', 0)  # Re-counted as skipped by the resumed rule
+    base['processed'] -= carried
+    base['skipped'] -= carried
+    rule_start = {'processed': 0}
+
+    def on_chunk(result, rule_index, done):
+        processed = result['created'] + result['skipped']
+        if done:
+            job.checkpoint = rule_index + 1
+            rule_start['processed'] = processed
+        job.processed = base['processed'] + result['created'] + result['skipped']
+        by_fee_type = dict(base['by_fee_type'])
+        for fee_type, totals in result['by_fee_type'].items():
+            previous = by_fee_type.get(fee_type, {'created': 0, 'amount': '0'})
+            by_fee_type[fee_type] = {
+                'created': previous['created'] + totals['created'],
+                'amount': str(Decimal(previous['amount']) + totals['amount']),
+            }
+        job.result = {
+            'created': base['created'] + result['created'],
+            'skipped': base['skipped'] + result['skipped'],
+            'amount': str(base['amount'] + result['amount']),
+            'by_fee_type': by_fee_type,
+            'rule_processed': processed - rule_start['processed'],
+        }
+        save_progress(job, 'checkpoint', 'processed', 'result')
+
+    generate_invoices(rules, chunk_size=job.params.get('chunk_size', 2000), start_rule=job.checkpoint, on_chunk=on_chunk)
+
+
+@runner('DEFAULTER_MAILER')
+def run_defaulter_mailer(job):
+    """
+    Runs send_attendance_warnings() for job.params['department_id']. The
+    checkpoint is the last student id whose batch was sent.
+    """
+    department_id = job.params['department_id']
+    if not job.total:
+        job.total = mail_scope(department_id).count()
+        save_progress(job, 'total')
+
+    base = {key: job.result.get(key, 0) for key in ('scanned', 'defaulters', 'sent', 'failed')}
+    base['processed'] = job.processed
+
+    def on_batch(result, last_student_id):
+        job.checkpoint = last_student_id
+        job.processed = base['processed'] + result['scanned']
+        job.result = {key: base[key] + result[key] for key in ('scanned', 'defaulters', 'sent', 'failed')}
+        save_progress(job, 'checkpoint', 'processed', 'result')
+
+    send_attendance_warnings(
+        department_id, threshold=job.params.get('threshold', 75.0), start_after=job.checkpoint, on_batch=on_batch,
+    )
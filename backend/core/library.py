@@ -0,0 +1,236 @@
+"""
+Library loans and fines.
+
+Fines are derived, not accrued: an open loan's fine is a function of its due
+date and today, computed in SQL by with_fines(). LibraryAction.fine_accrued is
+written once, when the book comes back (return_book), so a missed nightly run
+can never under- or over-charge and no job touches open loans.
+
+The RFID desk works in batches: checkout_books()/checkin_books() resolve every
+scanned tag in one query and write the whole stack with one bulk statement.
+The write transaction re-reads the affected open loans under lock first, so
+two desks scanning the same tag cannot both issue or both return it.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import OperationalError, transaction
+from django.db.models import Case, Count, DecimalField, F, Func, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+from .models import LibraryAction, StudentProfile
+
+FINE_PER_DAY = Decimal('10.00')
+FINE_OUTPUT = DecimalField(max_digits=8, decimal_places=2)
+LOAN_DAYS = 14
+MAX_SCANS = 500
+MAX_UID_LENGTH = LibraryAction._meta.get_field('book_uid').max_length
+ISSUE_ATTEMPTS = 3
+
+# Per-scan outcomes returned by the desk API
+ISSUED = 'issued'
+RETURNED = 'returned'
+ALREADY_ISSUED = 'already_issued'
+NOT_ISSUED = 'not_issued'
+UNKNOWN_STUDENT = 'unknown_student'
+UNKNOWN_TITLE = 'unknown_title'
+DUPLICATE_SCAN = 'duplicate_scan'
+INVALID = 'invalid'
+
+
+class DaysSince(Func):
+    """Whole days from a DateField to a fixed date (positive when the column is earlier)."""
+    output_field = IntegerField()
+
+    def __init__(self, expression, today, **extra):
+        super().__init__(Value(today), expression, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, template='(%(expressions)s)', arg_joiner=' - ', **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function='DATEDIFF', **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, template='CAST(julianday(%(expressions)s) AS INTEGER)',
+            arg_joiner=') - julianday(', **extra_context
+        )
+
+
+def fine_for(due_date, returned_on=None, today=None):
+    """Python twin of with_fines() for a single loan."""
+    end = timezone.localtime(returned_on).date() if returned_on else (today or timezone.localdate())
+    return FINE_PER_DAY * max(0, (end - due_date).days)
+
+
+def with_fines(queryset=None, today=None):
+    """
+    Annotates `days_overdue` and `current_fine`: the stored fine for returned
+    books, the fine accrued so far for open loans.
+    """
+    today = today or timezone.localdate()
+    queryset = LibraryAction.objects.all() if queryset is None else queryset
+    return queryset.annotate(
+        days_overdue=Case(
+            When(returned_on__isnull=True, due_date__lt=today, then=DaysSince('due_date', today)),
+            default=Value(0), output_field=IntegerField(),
+        ),
+    ).annotate(
+        current_fine=Case(
+            When(returned_on__isnull=False, then=F('fine_accrued')),
+            default=F('days_overdue') * Value(FINE_PER_DAY),
+            output_field=FINE_OUTPUT,
+        ),
+    )
+
+
+def outstanding_fines(queryset=None, today=None):
+    """Sum of current fines on open loans for a LibraryAction queryset."""
+    loans = with_fines((LibraryAction.objects.all() if queryset is None else queryset).filter(returned_on__isnull=True), today)
+    return loans.aggregate(total=Sum('current_fine'))['total'] or Decimal('0.00')
+
+
+def return_book(loan, returned_on=None):
+    """Closes a loan and stores its final fine."""
+    loan.returned_on = returned_on or timezone.now()
+    loan.fine_accrued = fine_for(loan.due_date, loan.returned_on)
+    loan.save(update_fields=['returned_on', 'fine_accrued'])
+    return loan
+
+
+def library_summary(today=None):
+    """Desk counters from one aggregate over open loans plus one over today's returns (both indexed)."""
+    today = today or timezone.localdate()
+    open_loans = with_fines(LibraryAction.objects.filter(returned_on__isnull=True), today)
+    summary = open_loans.aggregate(
+        active_checkouts=Count('id'),
+        overdue=Count('id', filter=Q(due_date__lt=today)),
+        due_today=Count('id', filter=Q(due_date=today)),
+        overdue_borrowers=Count('student_id', filter=Q(due_date__lt=today), distinct=True),
+        fines_outstanding=Sum('current_fine'),
+    )
+    start = timezone.make_aware(datetime.combine(today, time.min))
+    summary['returned_today'] = LibraryAction.objects.filter(
+        returned_on__gte=start, returned_on__lt=start + timedelta(days=1)
+    ).count()
+    summary['fines_outstanding'] = summary['fines_outstanding'] or Decimal('0.00')
+    return summary
+
+
+# =========================================
+# RFID DESK (batched)
+# =========================================
+def _clean_uid(value):
+    return str(value or '').strip()
+
+
+def checkout_books(scans, due_date=None):
+    """
+    Issues a stack of scans [{student (roll no), book_uid, book_title?}]. A
+    missing title is taken from the tag's last loan. Returns one
+    {book_uid, status, ...} per scan, in order.
+    """
+    due_date = due_date or timezone.localdate() + timedelta(days=LOAN_DAYS)
+    uids = {_clean_uid(scan.get('book_uid')) for scan in scans} - {''}
+    rolls = {str(scan.get('student') or '').strip().upper() for scan in scans} - {''}
+
+    students = dict(StudentProfile.objects.filter(roll_no__in=rolls).values_list('roll_no', 'id'))
+    on_loan, last_title = set(), {}
+    # One pass over each tag's history (newest first): open loans and last known title
+    for uid, title, returned_on in (
+        LibraryAction.objects.filter(book_uid__in=uids).order_by('-id').values_list('book_uid', 'book_title', 'returned_on')
+    ):
+        last_title.setdefault(uid, title)
+        if returned_on is None:
+            on_loan.add(uid)
+
+    results, loans, seen = [], [], set()
+    for scan in scans:
+        uid, roll = _clean_uid(scan.get('book_uid')), str(scan.get('student') or '').strip().upper()
+        title = str(scan.get('book_title') or '').strip()[:200] or last_title.get(uid)
+        if not uid or not roll or len(uid) > MAX_UID_LENGTH:
+            status = INVALID
+        elif uid in seen:
+            status = DUPLICATE_SCAN
+        elif roll not in students:
+            status = UNKNOWN_STUDENT
+        elif uid in on_loan:
+            status = ALREADY_ISSUED
+        elif not title:
+            status = UNKNOWN_TITLE
+        else:
+            status = ISSUED
+            loans.append(LibraryAction(student_id=students[roll], book_uid=uid, book_title=title, due_date=due_date))
+        seen.add(uid)
+        results.append({'book_uid': uid, 'student': roll, 'status': status, **({'due_date': due_date.isoformat()} if status == ISSUED else {})})
+
+    taken = _issue(loans) if loans else set()
+    for result in results:
+        if result['status'] == ISSUED and result['book_uid'] in taken:
+            result['status'] = ALREADY_ISSUED  # Issued at another desk since the read above
+            del result['due_date']
+    return results
+
+
+def _issue(loans):
+    """
+    Writes the loans whose tags are still free; returns the tags found on
+    loan. On MySQL two desks racing for one tag can deadlock on the index
+    gap instead; the loser retries and then sees the winner's loan.
+    """
+    for attempt in range(ISSUE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                taken = set(
+                    LibraryAction.objects.select_for_update()
+                    .filter(book_uid__in=[loan.book_uid for loan in loans], returned_on__isnull=True)
+                    .values_list('book_uid', flat=True)
+                )
+                LibraryAction.objects.bulk_create([loan for loan in loans if loan.book_uid not in taken])
+            return taken
+        except OperationalError:
+            if attempt + 1 == ISSUE_ATTEMPTS or transaction.get_connection().in_atomic_block:
+                raise
+
+
+def checkin_books(book_uids, returned_on=None):
+    """
+    Returns a stack of scanned tags: closes their open loans with the final
+    fine in one bulk UPDATE. Returns one {book_uid, status, ...} per scan.
+    """
+    returned_on = returned_on or timezone.now()
+    uids = [_clean_uid(uid) for uid in book_uids]
+    open_loans = {
+        loan.book_uid: loan for loan in
+        LibraryAction.objects.filter(book_uid__in=set(uids) - {''}, returned_on__isnull=True)
+        .select_related('student').order_by('id')
+    }
+
+    results, closed, seen = [], [], set()
+    for uid in uids:
+        loan = open_loans.pop(uid, None)
+        if not uid or len(uid) > MAX_UID_LENGTH:
+            results.append({'book_uid': uid, 'status': INVALID})
+        elif loan is None:
+            results.append({'book_uid': uid, 'status': DUPLICATE_SCAN if uid in seen else NOT_ISSUED})
+        else:
+            loan.returned_on = returned_on
+            loan.fine_accrued = fine_for(loan.due_date, returned_on)
+            closed.append((loan, len(results)))
+            results.append({
+                'book_uid': uid, 'status': RETURNED, 'student': loan.student.roll_no,
+                'book_title': loan.book_title, 'fine': str(loan.fine_accrued),
+            })
+        seen.add(uid)
+
+    with transaction.atomic():
+        still_open = set(
+            LibraryAction.objects.select_for_update()
+            .filter(id__in=[loan.id for loan, _ in closed], returned_on__isnull=True).values_list('id', flat=True)
+        )
+        for loan, position in closed:
+            if loan.id not in still_open:
+                results[position] = {'book_uid': loan.book_uid, 'status': NOT_ISSUED}  # Returned at another desk
+        LibraryAction.objects.bulk_update([loan for loan, _ in closed if loan.id in still_open], ['returned_on', 'fine_accrued'])
+    return results
@@ -0,0 +1,74 @@
+"""
+Timetable-driven lecture lifecycle.
+
+Run every minute by core.tasks.sync_lecture_lifecycle (Celery Beat):
+  * opens a Lecture for each TimeTable slot that has started, unless the room
+    or teacher is already busy or the slot was already held today;
+  * closes lectures once scheduled_end + LECTURE_AUTO_CLOSE_GRACE has passed;
+  * sweeps orphaned sessions (extra classes with no slot) older than
+    LECTURE_MAX_DURATION.
+All writes are set-based (bulk_create / update), so callers must refresh the
+schedule index and room states afterwards; the task does this.
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Lecture, TimeTable
+
+
+def slot_end(slot_end_time, now):
+    """Aware datetime for a slot's end time on the day of `now`."""
+    return timezone.make_aware(datetime.combine(now.date(), slot_end_time), now.tzinfo)
+
+
+def open_due_lectures(now):
+    """Opens lectures for slots in progress at `now`. Returns the created Lecture objects."""
+    today = now.date()
+    due = list(
+        TimeTable.objects.filter(day_of_week=today.weekday(), start_time__lte=now.time(), end_time__gt=now.time())
+        .order_by('start_time', 'id').values('id', 'course_id', 'classroom_id', 'teacher_id', 'end_time')
+    )
+    if not due:
+        return []
+
+    with transaction.atomic():
+        busy_rooms, busy_teachers = set(), set()
+        for room_id, teacher_id in Lecture.objects.filter(is_active=True).values_list('classroom_id', 'teacher_id'):
+            busy_rooms.add(room_id)
+            busy_teachers.add(teacher_id)
+        held_today = set(
+            Lecture.objects.filter(timetable_slot_id__in=[s['id'] for s in due], start_time__date=today)
+            .values_list('timetable_slot_id', flat=True)
+        )
+
+        to_open = []
+        for slot in due:
+            if slot['id'] in held_today or slot['classroom_id'] in busy_rooms or slot['teacher_id'] in busy_teachers:
+                continue
+            busy_rooms.add(slot['classroom_id'])
+            busy_teachers.add(slot['teacher_id'])
+            to_open.append(Lecture(
+                course_id=slot['course_id'], classroom_id=slot['classroom_id'], teacher_id=slot['teacher_id'],
+                timetable_slot_id=slot['id'], scheduled_end=slot_end(slot['end_time'], now), is_active=True,
+            ))
+        Lecture.objects.bulk_create(to_open)
+    return to_open
+
+
+def close_expired_lectures(now):
+    """
+    Closes lectures past their slot end + grace and sweeps orphaned ones.
+    Returns (closed_count, affected_teacher_ids).
+    """
+    expired = Lecture.objects.filter(is_active=True, scheduled_end__lt=now - settings.LECTURE_AUTO_CLOSE_GRACE)
+    orphaned = Lecture.objects.filter(is_active=True, scheduled_end__isnull=True, start_time__lt=now - settings.LECTURE_MAX_DURATION)
+
+    with transaction.atomic():
+        teacher_ids = set(expired.values_list('teacher_id', flat=True)) | set(orphaned.values_list('teacher_id', flat=True))
+        closed = expired.update(is_active=False, end_time=F('scheduled_end'))
+        closed += orphaned.update(is_active=False, end_time=now)
+    return closed, teacher_ids
@@ -0,0 +1,131 @@
+"""
+Attendance shortage mailer.
+
+Runs as a DEFAULTER_MAILER BackgroundJob, so no teacher request waits on it.
+Students are streamed in keyset chunks (by id). Each chunk costs one grouped
+Attendance query, and conducted lectures per course are counted once per run.
+Each defaulter gets their own message with per-course percentages, addressed
+to them alone. All batches go out over one SMTP connection opened for the
+whole run.
+
+A crash between sending a batch and saving its checkpoint resends that one
+batch on resume; it never skips one.
+"""
+from collections import defaultdict
+
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Count
+
+from .models import Attendance, Course, Lecture, StudentProfile
+
+ATTENDANCE_THRESHOLD = 75.0
+MAIL_BATCH_SIZE = 200
+FROM_EMAIL = "warnings@auraerp.edu"
+SUBJECT = "URGENT: Attendance Shortage Warning | AURA"
+
+
+def mail_scope(department_id):
+    """Students the mailer considers: the department's students with an email address."""
+    return StudentProfile.objects.filter(department_id=department_id).exclude(user__email='')
+
+
+def _course_stats(department_id):
+    """{semester_id: [(course_id, code, name, conducted)]} for courses with at least one finished lecture."""
+    conducted = dict(
+        Lecture.objects.filter(course__department_id=department_id, is_active=False)
+        .values('course_id').annotate(n=Count('id')).values_list('course_id', 'n')
+    )
+    by_semester = defaultdict(list)
+    for course_id, code, name, semester_id in (
+        Course.objects.filter(id__in=conducted).order_by('code').values_list('id', 'code', 'name', 'semester_id')
+    ):
+        by_semester[semester_id].append((course_id, code, name, conducted[course_id]))
+    return by_semester
+
+
+def _warning_body(student_name, department_name, overall, courses, threshold):
+    lines = [
+        f"Dear {student_name},",
+        "",
+        f"Your attendance is {overall:.1f}%, below the mandatory {threshold:.0f}% threshold.",
+        "",
+        "Course-wise attendance:",
+    ]
+    for code, name, attended, conducted in courses:
+        pct = attended / conducted * 100
+        flag = "  <-- below threshold" if pct < threshold else ""
+        lines.append(f"  {code} {name}: {attended}/{conducted} lectures ({pct:.1f}%){flag}")
+    lines += [
+        "",
+        "Please meet your department mentor immediately; a shortage may affect your examination eligibility.",
+        "",
+        "Regards,",
+        f"Department of {department_name}",
+        "AURA Academic Automation",
+    ]
+    return "\n".join(lines)
+
+
+def send_attendance_warnings(department_id, threshold=ATTENDANCE_THRESHOLD, batch_size=MAIL_BATCH_SIZE,
+                             start_after=0, on_batch=None, connection=None):
+    """
+    Mails every student of the department below `threshold` percent overall
+    attendance, starting after student id `start_after`. on_batch(result,
+    last_student_id) runs after each batch is sent. Returns {'scanned',
+    'defaulters', 'sent', 'failed'}.
+    """
+    courses = _course_stats(department_id)
+    students = mail_scope(department_id).select_related('user', 'department').order_by('id')
+    result = {'scanned': 0, 'defaulters': 0, 'sent': 0, 'failed': 0}
+
+    connection = connection or get_connection()
+    connection.open()
+    try:
+        last_id = start_after
+        while True:
+            chunk = list(students.filter(id__gt=last_id)[:batch_size])
+            if not chunk:
+                break
+            attended = defaultdict(int)
+            for student_id, course_id, n in (
+                Attendance.objects.filter(
+                    student_id__in=[s.user_id for s in chunk], status__in=['PRESENT', 'EXCUSED'],
+                    lecture__is_active=False, lecture__course__department_id=department_id,
+                ).values('student_id', 'lecture__course_id').annotate(n=Count('id')).values_list('student_id', 'lecture__course_id', 'n')
+            ):
+                attended[student_id, course_id] = n
+
+            batch = []
+            for student in chunk:
+                semester_courses = courses.get(student.current_semester_id, [])
+                conducted = sum(c[3] for c in semester_courses)
+                if not conducted:
+                    continue
+                rows = [(code, name, attended[student.user_id, course_id], held) for course_id, code, name, held in semester_courses]
+                overall = sum(r[2] for r in rows) / conducted * 100
+                if overall >= threshold:
+                    continue
+                batch.append(EmailMessage(
+                    subject=SUBJECT,
+                    body=_warning_body(student.user.get_full_name() or student.roll_no, student.department.name, overall, rows, threshold),
+                    from_email=FROM_EMAIL,
+                    to=[student.user.email],
+                    connection=connection,
+                ))
+
+            result['scanned'] += len(chunk)
+            result['defaulters'] += len(batch)
+            if batch:
+                try:
+                    result['sent'] += connection.send_messages(batch) or 0
+                except Exception:
+                    # A dropped connection fails the batch, not the run; the next batch reconnects
+                    result['failed'] += len(batch)
+                    connection.close()
+                    connection.open()
+            last_id = chunk[-1].id
+            if on_batch:
+                on_batch(result, last_id)
+    finally:
+        connection.close()
+    return result
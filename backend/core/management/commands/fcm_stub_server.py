@@ -0,0 +1,30 @@
+"""
+Local FCM stub for push load tests.
+
+    python manage.py fcm_stub_server --port 8099
+    FCM_PROJECT_ID=stub FCM_ENDPOINT=http://127.0.0.1:8099 celery -A ble_attendance worker
+
+See core/fcm_stub.py for how tokens are answered.
+"""
+from django.core.management.base import BaseCommand
+
+from core.fcm_stub import make_server
+
+
+class Command(BaseCommand):
+    help = "Serves a local stand-in for the FCM HTTP v1 send endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8099)
+
+    def handle(self, *args, **options):
+        server = make_server(options['host'], options['port'])
+        self.stdout.write(self.style.SUCCESS(f"FCM stub listening on http://{options['host']}:{options['port']} (Ctrl+C to stop)"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Served {server.requests} request(s).")
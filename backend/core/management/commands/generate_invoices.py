@@ -0,0 +1,58 @@
+"""
+Semester billing run.
+
+    python manage.py generate_invoices --rules fees.json
+    python manage.py generate_invoices --fee-type EXAM --amount 2500 --due 2026-08-15 --department CSE --batch 2024
+
+A rules file is a JSON list of {"fee_type", "amount", "due_date",
+"department"?, "batch"?} objects (see core/invoicing.py). Students who already
+have an invoice of that fee type and due date are skipped, so a run can be
+repeated safely.
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.invoicing import parse_rules, generate_invoices, INVOICE_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Generates fee invoices in bulk from fee rules (a JSON file or a single rule given as options)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rules', metavar='PATH', help="JSON file with a list of fee rules.")
+        parser.add_argument('--fee-type', help="TUITION, HOSTEL, TRANSPORT, EXAM or PENALTY.")
+        parser.add_argument('--amount')
+        parser.add_argument('--due', metavar='YYYY-MM-DD')
+        parser.add_argument('--department', metavar='CODE')
+        parser.add_argument('--batch', type=int, metavar='YEAR')
+        parser.add_argument('--chunk-size', type=int, default=INVOICE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['rules']:
+            try:
+                with open(options['rules'], encoding='utf-8') as f:
+                    raw_rules = json.load(f)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read {options['rules']}: {exc}")
+        elif options['fee_type']:
+            raw_rules = [{
+                'fee_type': options['fee_type'], 'amount': options['amount'], 'due_date': options['due'],
+                'department': options['department'], 'batch': options['batch'],
+            }]
+        else:
+            raise CommandError("Give --rules or --fee-type/--amount/--due.")
+
+        rules, errors = parse_rules(raw_rules if isinstance(raw_rules, list) else [raw_rules])
+        if errors:
+            raise CommandError("; ".join(f"Rule {number}: {' '.join(problems)}" for number, problems in errors))
+
+        started = time.perf_counter()
+        result = generate_invoices(rules, chunk_size=options['chunk_size'])
+        for fee_type, totals in sorted(result['by_fee_type'].items()):
+            self.stdout.write(f"  {fee_type:<10} {totals['created']:>7} invoice(s)  ₹{totals['amount']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']} invoice(s) worth ₹{result['amount']}, skipped {result['skipped']} already billed, "
+            f"in {time.perf_counter() - started:.2f}s."
+        ))
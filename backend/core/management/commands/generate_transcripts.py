@@ -0,0 +1,35 @@
+"""
+Bulk transcript pre-rendering for convocation season.
+
+    python manage.py generate_transcripts --department CSE --batch 2022
+    python manage.py generate_transcripts --department CSE --batch 2022 --workers 4
+
+Pages are rendered in a process pool (spawn-safe) and stored in the transcript cache, so
+students opening their transcript afterwards are served without a render.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Batch
+from core.transcripts import generate_batch_transcripts
+
+
+class Command(BaseCommand):
+    help = "Pre-renders and caches transcripts for every student in a batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--department', metavar='CODE', required=True, help="Department code, e.g. CSE.")
+        parser.add_argument('--batch', type=int, metavar='YEAR', required=True, help="Batch year.")
+        parser.add_argument('--workers', type=int, default=None, help="Render processes (default: CPU count).")
+
+    def handle(self, *args, **options):
+        batch = Batch.objects.filter(department__code__iexact=options['department'], year=options['batch']).first()
+        if batch is None:
+            raise CommandError(f"No batch {options['batch']} in department {options['department']}.")
+
+        started = time.perf_counter()
+        rendered = generate_batch_transcripts(batch.id, workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {rendered} transcript(s) for {batch} in {time.perf_counter() - started:.2f}s."
+        ))
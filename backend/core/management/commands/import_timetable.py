@@ -0,0 +1,58 @@
+"""
+Imports a weekly timetable from CSV or XLSX.
+
+    python manage.py import_timetable semester.xlsx --replace
+    python manage.py import_timetable slots.csv --dry-run --report errors.csv
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imports import import_timetable, error_report_lines, ImportFileError, TIMETABLE_COLUMNS, IMPORT_CHUNK_SIZE
+
+
+class _Upload:
+    """Gives a local file the .name/.file shape of an uploaded file."""
+
+    def __init__(self, path):
+        self.name = path
+        self.file = open(path, 'rb')
+
+
+class Command(BaseCommand):
+    help = f"Imports timetable slots from a CSV/XLSX file with columns: {', '.join(TIMETABLE_COLUMNS)}."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--replace', action='store_true', help="Replace the whole timetable (only if every row is valid).")
+        parser.add_argument('--dry-run', action='store_true', help="Validate without writing.")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument('--report', metavar='PATH', help="Write the per-row error report to this CSV file (default: stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            upload = _Upload(options['path'])
+        except OSError as exc:
+            raise CommandError(f"Cannot open {options['path']}: {exc}")
+
+        started = time.perf_counter()
+        try:
+            with upload.file:
+                result = import_timetable(upload, replace=options['replace'], dry_run=options['dry_run'], chunk_size=options['chunk_size'])
+        except ImportFileError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+
+        if result['errors']:
+            if options['report']:
+                with open(options['report'], 'w', newline='', encoding='utf-8') as out:
+                    out.writelines(error_report_lines(result['errors']))
+                self.stdout.write(self.style.WARNING(f"Wrote {len(result['errors'])} row error(s) to {options['report']}"))
+            else:
+                for line in error_report_lines(result['errors']):
+                    self.stdout.write(line, ending='')
+
+        summary = f"{result['rows']} row(s) read, {result['created']} slot(s) created, {len(result['errors'])} rejected in {elapsed:.2f}s."
+        if options['replace'] and result['errors']:
+            summary += " Nothing written: --replace requires every row to be valid."
+        self.stdout.write(self.style.SUCCESS(summary) if not result['errors'] else self.style.WARNING(summary))
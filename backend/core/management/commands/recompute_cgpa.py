@@ -0,0 +1,36 @@
+"""
+Batch CGPA recomputation.
+
+    python manage.py recompute_cgpa                      # everyone
+    python manage.py recompute_cgpa --department CSE --batch 2024
+
+Grade writes keep StudentProfile.cgpa current on their own; run this after
+direct database edits or grade-band changes.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.grading import recompute_cgpa
+from core.models import StudentProfile
+
+
+class Command(BaseCommand):
+    help = "Recomputes stored CGPA and credit totals for a department and/or batch (default: all students)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--department', metavar='CODE', help="Department code, e.g. CSE.")
+        parser.add_argument('--batch', type=int, metavar='YEAR', help="Batch year.")
+
+    def handle(self, *args, **options):
+        students = StudentProfile.objects.all()
+        if options['department']:
+            students = students.filter(department__code__iexact=options['department'])
+        if options['batch']:
+            students = students.filter(batch__year=options['batch'])
+
+        started = time.perf_counter()
+        updated = recompute_cgpa(students)
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed {students.count()} student(s), {updated} changed, in {time.perf_counter() - started:.2f}s."
+        ))
@@ -0,0 +1,36 @@
+"""
+Dues ledger rebuild.
+
+    python manage.py recompute_dues                      # everyone
+    python manage.py recompute_dues --department CSE --batch 2024
+
+Invoice writes keep StudentProfile.outstanding_dues current on their own; run
+this after direct database edits or imports that bypass core.dues.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.dues import recompute_dues
+from core.models import StudentProfile
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the outstanding-dues ledger for a department and/or batch (default: all students)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--department', metavar='CODE', help="Department code, e.g. CSE.")
+        parser.add_argument('--batch', type=int, metavar='YEAR', help="Batch year.")
+
+    def handle(self, *args, **options):
+        students = StudentProfile.objects.all()
+        if options['department']:
+            students = students.filter(department__code__iexact=options['department'])
+        if options['batch']:
+            students = students.filter(batch__year=options['batch'])
+
+        started = time.perf_counter()
+        updated = recompute_dues(students)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt dues for {students.count()} student(s), {updated} changed, in {time.perf_counter() - started:.2f}s."
+        ))
@@ -0,0 +1,72 @@
+"""
+Daily gateway settlement reconciliation.
+
+    python manage.py reconcile_settlement settlement_2026-10-18.csv
+    python manage.py reconcile_settlement settlement.csv --date 2026-10-18 --report findings.csv --dry-run
+
+The settlement file needs transaction_id, invoice_id and amount columns
+(payment_method optional). Invoices the gateway settled but whose webhook
+never arrived are marked paid; every other discrepancy is only reported (see
+core/reconciliation.py).
+"""
+import csv
+import sys
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.reconciliation import reconcile_settlement, REPORT_COLUMNS, RECONCILE_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Reconciles a gateway settlement CSV against recorded payments and invoices."
+
+    def add_arguments(self, parser):
+        parser.add_argument('settlement', metavar='CSV', help="Gateway settlement report.")
+        parser.add_argument('--date', metavar='YYYY-MM-DD', help="Settlement day (default: yesterday).")
+        parser.add_argument('--report', metavar='PATH', help="Write findings to this CSV ('-' for stdout).")
+        parser.add_argument('--dry-run', action='store_true', help="Report only; do not mark invoices paid.")
+        parser.add_argument('--chunk-size', type=int, default=RECONCILE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            settlement_date = date.fromisoformat(options['date']) if options['date'] else timezone.localdate() - timedelta(days=1)
+        except ValueError:
+            raise CommandError("--date must be YYYY-MM-DD.")
+
+        report_file = None
+        try:
+            if options['report'] == '-':
+                report_file = sys.stdout
+            elif options['report']:
+                report_file = open(options['report'], 'w', newline='', encoding='utf-8')
+            report = None
+            if report_file:
+                report = csv.writer(report_file)
+                report.writerow(REPORT_COLUMNS)
+
+            started = time.perf_counter()
+            with open(options['settlement'], newline='', encoding='utf-8-sig') as settlement:
+                result = reconcile_settlement(
+                    settlement, settlement_date, report=report,
+                    dry_run=options['dry_run'], chunk_size=options['chunk_size'],
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        finally:
+            if report_file and report_file is not sys.stdout:
+                report_file.close()
+
+        rows = result.pop('rows', 0)
+        matched = result.pop('matched', 0)
+        settled = result.pop('settled', 0)
+        for finding, count in sorted(result.items()):
+            self.stdout.write(f"  {finding:<20} {count:>7}")
+        verb = "would be marked paid" if options['dry_run'] else "marked paid"
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {rows} settlement row(s) for {settlement_date}: {matched} matched, "
+            f"{settled if not options['dry_run'] else result.get('settled_unrecorded', 0)} invoice(s) {verb}, "
+            f"in {time.perf_counter() - started:.2f}s."
+        ))
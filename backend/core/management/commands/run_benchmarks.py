@@ -0,0 +1,100 @@
+"""
+Endpoint benchmark runner.
+
+    DB_ENGINE=sqlite python manage.py seed_campus --flush --students 5000 --days 14
+    DB_ENGINE=sqlite python manage.py run_benchmarks --save benchmarks/baseline.json
+    DB_ENGINE=sqlite python manage.py run_benchmarks --compare benchmarks/baseline.json --threshold 0.15
+
+Scenarios live in core/benchmarks.py. Every iteration is rolled back, so the
+seeded database can be reused across runs.
+"""
+import json
+import os
+import platform
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.benchmarks import BENCHMARKS, run_benchmark, compare, dataset_summary
+from core.models import StudentProfile, TimeTable
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the hot request paths in-process and compares them against a saved JSON baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', help=f"Comma-separated scenarios. Available: {', '.join(BENCHMARKS)}")
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--save', metavar='PATH', help="Write the results to this JSON file.")
+        parser.add_argument('--compare', metavar='PATH', help="Compare against a previously saved JSON baseline.")
+        parser.add_argument('--threshold', type=float, default=0.15, help="Relative p50 slowdown that counts as a regression (default 0.15).")
+        parser.add_argument('--fail-on-regression', action='store_true', help="Exit with an error when any scenario regresses.")
+
+    def handle(self, *args, **options):
+        names = [n.strip() for n in options['only'].split(',')] if options['only'] else list(BENCHMARKS)
+        unknown = [n for n in names if n not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(unknown)}")
+        if not StudentProfile.objects.exists() or not TimeTable.objects.exists():
+            raise CommandError("Database has no campus data; run `manage.py seed_campus` first.")
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as fh:
+                    baseline = json.load(fh)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {exc}")
+
+        results = {}
+        self.stdout.write(f"{'scenario':<24}{'ops/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'queries':>9}")
+        for name in names:
+            try:
+                # DEBUG query logging would skew timings, so measure production-like settings
+                with override_settings(DEBUG=False):
+                    stats = run_benchmark(name, iterations=options['iterations'], warmup=options['warmup'])
+            except (AssertionError, LookupError) as exc:
+                self.stdout.write(self.style.ERROR(f"{name:<24}FAILED: {exc}"))
+                continue
+            results[name] = stats
+            self.stdout.write(
+                f"{name:<24}{stats['ops_per_sec']:>10.1f}{stats['p50_ms']:>10.2f}"
+                f"{stats['p90_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['queries']:>9}"
+            )
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'git_commit': self._git_commit(),
+                'python': platform.python_version(),
+                'iterations': options['iterations'],
+                'dataset': dataset_summary(),
+            },
+            'results': results,
+        }
+
+        if options['save']:
+            os.makedirs(os.path.dirname(os.path.abspath(options['save'])), exist_ok=True)
+            with open(options['save'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Saved results to {options['save']}"))
+
+        if baseline is not None:
+            changes, regressions = compare(results, baseline.get('results', {}), options['threshold'])
+            self.stdout.write(f"\nCompared with {options['compare']} (threshold {options['threshold']:.0%}):")
+            for name, change in changes.items():
+                line = f"  {name:<24}{change:>+8.1%}"
+                self.stdout.write(self.style.ERROR(line + "  REGRESSION") if name in regressions else line)
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{len(regressions)} scenario(s) regressed beyond {options['threshold']:.0%}.")
+
+    def _git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
@@ -0,0 +1,487 @@
+"""
+Campus-scale synthetic data generator.
+
+    python manage.py seed_campus                          # ~20k students, ~2M attendance rows
+    python manage.py seed_campus --students 2000 --days 10
+    python manage.py seed_campus --flush --workers 4      # replace existing data, parallel attendance writers
+
+Every run with the same --seed and --anchor-date produces the same campus, so
+benchmark and profiling sessions can all start from an identical dataset.
+"""
+import multiprocessing
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, time as dtime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from core.grading import score_one, recompute_cgpa
+from core.dues import recompute_dues
+from core.library import fine_for
+from core.models import (
+    User, Department, Batch, Semester, Classroom, Course, StudentProfile, StaffProfile,
+    ParentProfile, TimeTable, Lecture, Attendance, LeaveRequest, GatePass, Exam, GradeRecord,
+    FeeInvoice, PaymentTransaction, LibraryAction, NotificationInbox
+)
+
+# =========================================
+# CATALOGUES
+# =========================================
+DEPARTMENT_CATALOGUE = [
+    ('CSE', 'Computer Engineering'), ('IT', 'Information Technology'),
+    ('ENTC', 'Electronics & Telecommunication'), ('MECH', 'Mechanical Engineering'),
+    ('CIVIL', 'Civil Engineering'), ('ELEC', 'Electrical Engineering'),
+    ('CHEM', 'Chemical Engineering'), ('AIDS', 'AI & Data Science'),
+]
+COURSE_TOPICS = [
+    'Engineering Mathematics', 'Data Structures', 'Digital Systems', 'Operating Systems',
+    'Database Systems', 'Computer Networks', 'Signals & Systems', 'Thermodynamics',
+    'Machine Learning', 'Control Systems', 'Fluid Mechanics', 'Software Engineering',
+    'Microprocessors', 'Theory of Computation', 'Structural Analysis', 'Power Electronics',
+]
+BOOK_TITLES = [
+    'Introduction to Algorithms (CLRS)', 'Modern Operating Systems (Tanenbaum)',
+    'Computer Networks (Kurose)', 'Database System Concepts (Silberschatz)',
+    'Engineering Mathematics (Grewal)', 'Digital Design (Morris Mano)',
+    'Artificial Intelligence (Russell & Norvig)', 'Signals and Systems (Oppenheim)',
+]
+FIRST_NAMES = [
+    'Aarav', 'Vivaan', 'Aditya', 'Vihaan', 'Arjun', 'Sai', 'Reyansh', 'Krishna', 'Ishaan', 'Rohan',
+    'Ananya', 'Diya', 'Priya', 'Saanvi', 'Aadhya', 'Neha', 'Kavya', 'Isha', 'Riya', 'Sneha',
+]
+LAST_NAMES = [
+    'Sharma', 'Patil', 'Verma', 'Joshi', 'Kulkarni', 'Deshmukh', 'Iyer', 'Reddy', 'Nair', 'Gupta',
+    'Kale', 'Pawar', 'Shinde', 'Mehta', 'Rao', 'Bhosale', 'Jain', 'Chavan', 'Gokhale', 'Varma',
+]
+
+# Five one-hour slots per teaching day (Mon-Fri)
+SLOT_TIMES = [
+    (dtime(9, 0), dtime(10, 0)), (dtime(10, 0), dtime(11, 0)), (dtime(11, 15), dtime(12, 15)),
+    (dtime(12, 15), dtime(13, 15)), (dtime(14, 0), dtime(15, 0)),
+]
+TEACHING_DAYS = range(5)
+FEE_RULES = [
+    # fee_type, share of students billed, amount range
+    ('TUITION', 1.00, (85000, 125000)),
+    ('HOSTEL', 0.35, (55000, 65000)),
+    ('TRANSPORT', 0.25, (15000, 20000)),
+    ('EXAM', 1.00, (2000, 3000)),
+]
+
+# Shared with forked attendance workers (set before the pool is created)
+_ATTENDANCE_STATE = {}
+
+
+@contextmanager
+def historic_timestamps(*fields):
+    """Temporarily disable auto_now_add so bulk_create keeps the generated timestamps."""
+    saved = [(f, f.auto_now_add) for f in fields]
+    for f, _ in saved:
+        f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, value in saved:
+            f.auto_now_add = value
+
+
+def chunked_create(model, rows, chunk_size):
+    """bulk_create an iterable in chunk-sized transactions, keeping memory bounded."""
+    written, buffer = 0, []
+    for obj in rows:
+        buffer.append(obj)
+        if len(buffer) >= chunk_size:
+            with transaction.atomic():
+                model.objects.bulk_create(buffer, batch_size=chunk_size)
+            written += len(buffer)
+            buffer = []
+    if buffer:
+        with transaction.atomic():
+            model.objects.bulk_create(buffer, batch_size=chunk_size)
+        written += len(buffer)
+    return written
+
+
+def _attendance_rows(lecture_specs):
+    state = _ATTENDANCE_STATE
+    for lecture_id, ordinal, gateway_id, starts_at in lecture_specs:
+        rng = random.Random(f"{state['seed']}:{ordinal}:{starts_at.isoformat()}")
+        for user_id, rate in state['cohorts'][ordinal]:
+            roll = rng.random()
+            if roll < rate:
+                status = 'LATE' if rng.random() < 0.05 else 'PRESENT'
+            elif roll < rate + 0.02:
+                status = 'EXCUSED'
+            else:
+                continue  # Absences are inferred, exactly like hardware_sync leaves them
+            yield Attendance(
+                student_id=user_id, lecture_id=lecture_id, status=status,
+                device_id=gateway_id if status != 'EXCUSED' else None,
+                is_manual_override=status == 'EXCUSED',
+                timestamp=starts_at + timedelta(seconds=rng.randint(0, 600)),
+            )
+
+
+def write_attendance(lecture_specs):
+    """Generates and inserts attendance for a slice of lectures. Runs in-process or in a forked worker."""
+    with historic_timestamps(Attendance._meta.get_field('timestamp')):
+        return chunked_create(Attendance, _attendance_rows(lecture_specs), _ATTENDANCE_STATE['chunk_size'])
+
+
+class Command(BaseCommand):
+    help = "Generates a reproducible, campus-scale synthetic dataset for benchmarking and profiling."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=6, help=f"Departments to create (catalogue has {len(DEPARTMENT_CATALOGUE)}, extras are synthetic).")
+        parser.add_argument('--batches', type=int, default=4, help="Batches (admission years) per department.")
+        parser.add_argument('--divisions', type=int, default=2, help="Divisions per batch.")
+        parser.add_argument('--students', type=int, default=20000, help="Total students, spread evenly over all divisions.")
+        parser.add_argument('--teachers-per-department', type=int, default=12)
+        parser.add_argument('--courses-per-semester', type=int, default=5)
+        parser.add_argument('--days', type=int, default=30, help="Days of lecture and attendance history before the anchor date.")
+        parser.add_argument('--anchor-date', help="Treat this YYYY-MM-DD as 'today' (defaults to the real date).")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows per bulk_create transaction.")
+        parser.add_argument('--workers', type=int, default=1, help="Parallel attendance writer processes (ignored on SQLite).")
+        parser.add_argument('--password', default='aura@1234', help="Password for every seeded account (hashed once).")
+        parser.add_argument('--flush', action='store_true', help="Delete existing campus data (superusers are kept) before seeding.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.seed = options['seed']
+        self.chunk_size = options['chunk_size']
+        self.opts = options
+        self.anchor = (
+            datetime.strptime(options['anchor_date'], '%Y-%m-%d').date()
+            if options['anchor_date'] else timezone.localdate()
+        )
+
+        if options['batches'] > 4:
+            raise CommandError("At most 4 batches are supported (one per odd semester).")
+
+        if Department.objects.exists():
+            if not options['flush']:
+                raise CommandError("Core tables already contain data; re-run with --flush to replace them.")
+            self._step("Flushing existing campus data", self._flush)
+
+        # One PBKDF2 run for the whole campus instead of one per account
+        self.password_hash = make_password(options['password'])
+
+        started = time.perf_counter()
+        self._step("Academic structure", self._seed_structure)
+        self._step("Staff", self._seed_staff)
+        self._step("Timetable", self._seed_timetable)
+        self._step("Students & parents", self._seed_students)
+        self._step("Lectures", self._seed_lectures)
+        self._step("Attendance", self._seed_attendance)
+        self._step("Exams & grades", self._seed_grades)
+        self._step("Invoices & payments", self._seed_finance)
+        self._step("Library actions", self._seed_library)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Campus seeded in {time.perf_counter() - started:.1f}s (anchor date {self.anchor})."))
+
+    # =========================================
+    # HELPERS
+    # =========================================
+    def _step(self, label, func):
+        started = time.perf_counter()
+        summary = func()
+        suffix = f" — {summary}" if summary else ""
+        self.stdout.write(f"  {label:<24} {time.perf_counter() - started:7.1f}s{suffix}")
+
+    def _create(self, model, rows):
+        return chunked_create(model, rows, self.chunk_size)
+
+    def _aware(self, day, at):
+        return timezone.make_aware(datetime.combine(day, at))
+
+    def _flush(self):
+        # Children first so each delete stays a plain DELETE instead of a cascade walk
+        for model in [
+            Attendance, Lecture, TimeTable, GradeRecord, Exam, PaymentTransaction, FeeInvoice,
+            LibraryAction, NotificationInbox, GatePass, LeaveRequest, ParentProfile.students.through,
+            ParentProfile, StudentProfile, StaffProfile, Course, Classroom, Batch, Department, Semester,
+        ]:
+            model.objects.all().delete()
+        User.objects.filter(is_superuser=False).delete()
+
+    def _user(self, username, first_name, last_name, role, **extra):
+        return User(
+            username=username, password=self.password_hash, first_name=first_name,
+            last_name=last_name, role=role, email=f"{username.lower()}@aura.edu", **extra
+        )
+
+    # =========================================
+    # PHASES
+    # =========================================
+    def _seed_structure(self):
+        opts, rng = self.opts, self.rng
+        departments = []
+        for i in range(opts['departments']):
+            code, name = DEPARTMENT_CATALOGUE[i] if i < len(DEPARTMENT_CATALOGUE) else (f"D{i:02d}", f"Department {i}")
+            departments.append(Department(code=code, name=name))
+        self._create(Department, departments)
+        self.departments = list(Department.objects.order_by('id'))
+
+        # Batch k was admitted k years ago and sits in odd semester 2k+1
+        self.semesters = {}
+        for number in range(1, 9):
+            self.semesters[number] = Semester.objects.create(number=number, is_active=number % 2 == 1 and number <= 2 * opts['batches'])
+
+        self._create(Batch, [
+            Batch(year=self.anchor.year - k, department=dept)
+            for dept in self.departments for k in range(opts['batches'])
+        ])
+        self.batches = {(b.department_id, b.year): b for b in Batch.objects.all()}
+
+        self._create(Course, [
+            Course(
+                name=f"{COURSE_TOPICS[(2 * k + c) % len(COURSE_TOPICS)]}{' II' if (2 * k + c) >= len(COURSE_TOPICS) else ''}",
+                code=f"{dept.code}{2 * k + 1}{c + 1:02d}", department=dept,
+                semester=self.semesters[2 * k + 1], credits=rng.choice([2, 3, 3, 4]),
+            )
+            for dept in self.departments for k in range(opts['batches']) for c in range(opts['courses_per_semester'])
+        ])
+        self.courses = {}
+        for course in Course.objects.select_related('semester').order_by('code'):
+            self.courses.setdefault((course.department_id, course.semester.number), []).append(course)
+
+        # Every division owns a room, so concurrent slots never collide on (day, start, room)
+        self.classes = []
+        for dept in self.departments:
+            for k in range(opts['batches']):
+                for d in range(opts['divisions']):
+                    self.classes.append({
+                        'ordinal': len(self.classes), 'dept': dept, 'semester': 2 * k + 1,
+                        'batch': self.batches[(dept.id, self.anchor.year - k)],
+                        'division': chr(ord('A') + d), 'local_index': k * opts['divisions'] + d,
+                    })
+        self._create(Classroom, [
+            Classroom(room_number=f"{100 + c['ordinal']}", capacity=120, esp_device_id=f"ESP_ROOM_{100 + c['ordinal']}")
+            for c in self.classes
+        ])
+        rooms = {r.room_number: r for r in Classroom.objects.all()}
+        for c in self.classes:
+            c['room'] = rooms[f"{100 + c['ordinal']}"]
+        return f"{len(self.departments)} depts, {len(self.batches)} batches, {sum(map(len, self.courses.values()))} courses, {len(rooms)} rooms"
+
+    def _seed_staff(self):
+        opts = self.opts
+        # A teacher can take at most one division per slot, so every division in a department needs its own
+        per_dept = max(opts['teachers_per_department'], opts['batches'] * opts['divisions'])
+        users, profiles = [], []
+        for dept in self.departments:
+            for i in range(per_dept):
+                users.append(self._user(f"T{dept.code}{i + 1:02d}", self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES), User.Role.TEACHER))
+                profiles.append((f"T{dept.code}{i + 1:02d}", dept, f"EMP{dept.code}{i + 1:03d}"))
+            users.append(self._user(f"HOD{dept.code}", 'Head', dept.code, User.Role.HOD))
+            profiles.append((f"HOD{dept.code}", dept, f"HOD{dept.code}001"))
+        for username, role in [
+            ('coordinator', User.Role.ACADEMIC_COORDINATOR), ('librarian', User.Role.LIBRARIAN),
+            ('finance', User.Role.FINANCE_CLERK), ('security', User.Role.SECURITY_OFFICER),
+        ]:
+            users.append(self._user(username, username.title(), 'Office', role))
+            profiles.append((username, None, f"ADM-{username.upper()}"))
+        self._create(User, users)
+
+        ids = dict(User.objects.filter(username__in=[p[0] for p in profiles]).values_list('username', 'id'))
+        self._create(StaffProfile, [
+            StaffProfile(user_id=ids[username], department=dept, employee_id=employee_id)
+            for username, dept, employee_id in profiles
+        ])
+        self.teachers = {
+            dept.id: [ids[f"T{dept.code}{i + 1:02d}"] for i in range(per_dept)] for dept in self.departments
+        }
+        return f"{len(users)} accounts"
+
+    def _seed_timetable(self):
+        slots = []
+        for c in self.classes:
+            courses = self.courses[(c['dept'].id, c['semester'])]
+            teachers = self.teachers[c['dept'].id]
+            for day in TEACHING_DAYS:
+                for s, (start, end) in enumerate(SLOT_TIMES):
+                    slots.append(TimeTable(
+                        day_of_week=day, start_time=start, end_time=end,
+                        course=courses[(s + day) % len(courses)], classroom=c['room'],
+                        teacher_id=teachers[(c['local_index'] + s + day) % len(teachers)],
+                        division=c['division'],
+                    ))
+        self._create(TimeTable, slots)
+        self.timetable = slots
+        return f"{len(slots)} slots"
+
+    def _seed_students(self):
+        opts, rng = self.opts, self.rng
+        base, extra = divmod(opts['students'], len(self.classes))
+        users, profile_specs = [], []
+        self.cohort_rates = {}
+        for c in self.classes:
+            teachers = self.teachers[c['dept'].id]
+            for i in range(base + (1 if c['ordinal'] < extra else 0)):
+                roll = f"{c['batch'].year % 100:02d}{c['dept'].code}{c['division']}{i + 1:04d}"
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                users.append(self._user(roll, first, last, User.Role.STUDENT, device_fingerprint=f"FP-{roll}"))
+                users.append(self._user(f"P{roll}", rng.choice(FIRST_NAMES), last, User.Role.PARENT))
+                profile_specs.append((roll, c, teachers[c['local_index'] % len(teachers)]))
+                # Per-student attendance propensity; Beta(9, 2) leaves roughly a quarter below 75%
+                self.cohort_rates[roll] = (rng.betavariate(9, 2), rng.gauss(62, 14))
+        self._create(User, users)
+
+        ids = dict(User.objects.filter(role__in=[User.Role.STUDENT, User.Role.PARENT]).values_list('username', 'id'))
+        self._create(StudentProfile, (
+            StudentProfile(
+                user_id=ids[roll], roll_no=roll, department=c['dept'], batch=c['batch'],
+                current_semester=self.semesters[c['semester']], division=c['division'],
+                teacher_guardian_id=tg_id,
+            )
+            for roll, c, tg_id in profile_specs
+        ))
+        self._create(ParentProfile, (ParentProfile(user_id=ids[f"P{roll}"]) for roll, _, _ in profile_specs))
+
+        profile_ids = dict(StudentProfile.objects.values_list('roll_no', 'id'))
+        parent_ids = dict(ParentProfile.objects.values_list('user__username', 'id'))
+        Link = ParentProfile.students.through
+        self._create(Link, (
+            Link(parentprofile_id=parent_ids[f"P{roll}"], studentprofile_id=profile_ids[roll])
+            for roll, _, _ in profile_specs
+        ))
+
+        self.cohorts = {c['ordinal']: [] for c in self.classes}
+        self.students = []
+        for roll, c, _ in profile_specs:
+            rate, ability = self.cohort_rates[roll]
+            self.cohorts[c['ordinal']].append((ids[roll], rate))
+            self.students.append((profile_ids[roll], c, ability))
+        return f"{len(profile_specs)} students, {len(profile_specs)} parents"
+
+    def _seed_lectures(self):
+        days = [self.anchor - timedelta(days=n) for n in range(self.opts['days'], 0, -1)]
+        ordinal_by_room = {c['room'].id: c['ordinal'] for c in self.classes}
+
+        def rows():
+            for day in days:
+                for slot in self.timetable:
+                    if slot.day_of_week != day.weekday():
+                        continue
+                    yield Lecture(
+                        course_id=slot.course_id, classroom_id=slot.classroom_id, teacher_id=slot.teacher_id,
+                        start_time=self._aware(day, slot.start_time), end_time=self._aware(day, slot.end_time),
+                        is_active=False,
+                    )
+
+        with historic_timestamps(Lecture._meta.get_field('start_time')):
+            written = self._create(Lecture, rows())
+
+        window_start = self._aware(self.anchor - timedelta(days=self.opts['days']), dtime.min)
+        gateways = {c['room'].id: c['room'].esp_device_id for c in self.classes}
+        self.lecture_specs = [
+            (lecture_id, ordinal_by_room[room_id], gateways[room_id], starts_at)
+            for lecture_id, room_id, starts_at in Lecture.objects.filter(
+                start_time__gte=window_start, classroom_id__in=ordinal_by_room
+            ).values_list('id', 'classroom_id', 'start_time').order_by('id')
+        ]
+        return f"{written} lectures"
+
+    def _seed_attendance(self):
+        workers = self.opts['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING("  SQLite allows a single writer; running attendance with 1 worker."))
+            workers = 1
+        if workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+            self.stdout.write(self.style.WARNING("  Parallel writers need fork(); running attendance with 1 worker."))
+            workers = 1
+
+        _ATTENDANCE_STATE.update(cohorts=self.cohorts, seed=self.seed, chunk_size=self.chunk_size)
+        if workers == 1:
+            return f"{write_attendance(self.lecture_specs)} rows"
+
+        # Each forked worker opens its own DB connection and owns whole lectures
+        slices = [self.lecture_specs[i:i + 25] for i in range(0, len(self.lecture_specs), 25)]
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            written = sum(pool.imap_unordered(write_attendance, slices))
+        return f"{written} rows across {workers} workers"
+
+    def _seed_grades(self):
+        rng = self.rng
+        exams = {}
+        for number, semester in self.semesters.items():
+            if not semester.is_active:
+                continue
+            exams[number] = [
+                Exam.objects.create(name=f"Mid-Term {self.anchor.year}", exam_type='MID', date=self.anchor - timedelta(days=60), semester=semester, max_marks=50, passing_marks=20),
+                Exam.objects.create(name=f"End-Semester {self.anchor.year}", exam_type='END', date=self.anchor - timedelta(days=10), semester=semester, max_marks=100, passing_marks=40),
+            ]
+
+        def rows():
+            for profile_id, c, ability in self.students:
+                for exam in exams[c['semester']]:
+                    for course in self.courses[(c['dept'].id, c['semester'])]:
+                        if rng.random() < 0.01:
+                            yield GradeRecord(student_id=profile_id, exam=exam, course=course, is_absent=True)
+                            continue
+                        pct = min(100.0, max(0.0, rng.gauss(ability, 10)))
+                        marks = Decimal(round(pct * exam.max_marks / 100, 2)).quantize(Decimal('0.01'))
+                        percentage, grade_point = score_one(marks, exam.max_marks)  # bulk_create skips save()
+                        yield GradeRecord(
+                            student_id=profile_id, exam=exam, course=course, marks_obtained=marks,
+                            percentage=percentage, grade_point=grade_point,
+                        )
+
+        created = self._create(GradeRecord, rows())
+        recompute_cgpa()  # bulk_create skips the grade signals
+        return f"{sum(map(len, exams.values()))} exams, {created} grade records"
+
+    def _seed_finance(self):
+        rng = self.rng
+        tuition = {dept.id: rng.randrange(*FEE_RULES[0][2], 5000) for dept in self.departments}
+
+        def rows():
+            for profile_id, c, _ in self.students:
+                for fee_type, share, (low, high) in FEE_RULES:
+                    if rng.random() >= share:
+                        continue
+                    amount = tuition[c['dept'].id] if fee_type == 'TUITION' else rng.randrange(low, high, 500)
+                    yield FeeInvoice(
+                        student_id=profile_id, fee_type=fee_type, amount=Decimal(amount),
+                        due_date=self.anchor - timedelta(days=rng.randint(-30, 90)),
+                        is_paid=rng.random() < 0.75,
+                    )
+
+        invoices = self._create(FeeInvoice, rows())
+        payments = self._create(PaymentTransaction, (
+            PaymentTransaction(invoice_id=invoice_id, transaction_id=f"pay_seed_{invoice_id}", amount_paid=amount, is_successful=True)
+            for invoice_id, amount in FeeInvoice.objects.filter(is_paid=True).values_list('id', 'amount').iterator(chunk_size=self.chunk_size)
+        ))
+        recompute_dues()  # bulk_create skips the dues ledger signal
+        return f"{invoices} invoices, {payments} payments"
+
+    def _seed_library(self):
+        rng = self.rng
+        now = self._aware(self.anchor, dtime(18, 0))
+
+        def rows():
+            for profile_id, _, _ in self.students:
+                if rng.random() >= 0.3:
+                    continue
+                for _ in range(rng.randint(1, 3)):
+                    issued = now - timedelta(days=rng.randint(1, 45), minutes=rng.randint(0, 600))
+                    due = issued.date() + timedelta(days=14)
+                    returned = issued + timedelta(days=rng.randint(3, 20))
+                    if returned > now or rng.random() < 0.4:
+                        returned = None
+                    # Open loans carry no stored fine; it is computed from the due date (core/library.py)
+                    yield LibraryAction(
+                        student_id=profile_id, book_uid=f"RFID-{rng.getrandbits(40):010X}",
+                        book_title=rng.choice(BOOK_TITLES), issued_on=issued, due_date=due,
+                        returned_on=returned, fine_accrued=fine_for(due, returned) if returned else 0,
+                    )
+
+        with historic_timestamps(LibraryAction._meta.get_field('issued_on')):
+            return f"{self._create(LibraryAction, rows())} actions"
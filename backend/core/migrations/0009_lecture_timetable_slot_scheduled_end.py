@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_apprelease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lecture',
+            name='scheduled_end',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lecture',
+            name='timetable_slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lectures', to='core.timetable'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:47
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# Frozen copy of the bands in core/grading.py at the time of this migration
+GRADE_BANDS = ((90, 10), (80, 9), (70, 8), (60, 7), (50, 6), (40, 5), (35, 4))
+
+
+def backfill_grade_points(apps, schema_editor):
+    GradeRecord = apps.get_model('core', 'GradeRecord')
+    Exam = apps.get_model('core', 'Exam')
+    for exam in Exam.objects.all():
+        batch = []
+        for record in GradeRecord.objects.filter(exam=exam).only('id', 'marks_obtained', 'is_absent').iterator(chunk_size=5000):
+            if record.is_absent or record.marks_obtained is None:
+                record.percentage, record.grade_point = None, 0
+            else:
+                pct = record.marks_obtained * 100 / exam.max_marks
+                record.percentage = pct.quantize(Decimal('0.01'))
+                record.grade_point = next((points for floor, points in GRADE_BANDS if pct >= floor), 0)
+            batch.append(record)
+            if len(batch) >= 5000:
+                GradeRecord.objects.bulk_update(batch, ['percentage', 'grade_point'])
+                batch = []
+        GradeRecord.objects.bulk_update(batch, ['percentage', 'grade_point'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='graderecord',
+            name='grade_point',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='graderecord',
+            name='percentage',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=5, null=True),
+        ),
+        migrations.RunPython(backfill_grade_points, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:48
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def backfill_cgpa(apps, schema_editor):
+    GradeRecord = apps.get_model('core', 'GradeRecord')
+    StudentProfile = apps.get_model('core', 'StudentProfile')
+    totals = (
+        GradeRecord.objects.filter(is_absent=False, course__credits__gt=0).values('student_id')
+        .annotate(points=Sum(F('grade_point') * F('course__credits')), credits=Sum('course__credits'))
+    )
+    batch = []
+    for row in totals.iterator(chunk_size=5000):
+        cgpa = Decimal(f"{round(row['points'] / row['credits'], 2):.2f}")
+        batch.append(StudentProfile(id=row['student_id'], cgpa=cgpa, total_credits=row['credits'], credit_points=row['points']))
+        if len(batch) >= 2000:
+            StudentProfile.objects.bulk_update(batch, ['cgpa', 'total_credits', 'credit_points'])
+            batch = []
+    StudentProfile.objects.bulk_update(batch, ['cgpa', 'total_credits', 'credit_points'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_graderecord_stored_grade_point'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentprofile',
+            name='cgpa',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=4),
+        ),
+        migrations.AddField(
+            model_name='studentprofile',
+            name='credit_points',
+            field=models.PositiveIntegerField(default=0, help_text='Sum of grade point x credits over attempted courses'),
+        ),
+        migrations.AddField(
+            model_name='studentprofile',
+            name='total_credits',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_cgpa, migrations.RunPython.noop),
+    ]
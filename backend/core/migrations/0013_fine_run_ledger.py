@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_studentprofile_stored_cgpa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FineRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_date', models.DateField(unique=True)),
+                ('books_fined', models.PositiveIntegerField(default=0)),
+                ('penalties_created', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_fine_run_ledger'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='finerun',
+            name='books_fined',
+        ),
+        migrations.AlterField(
+            model_name='libraryaction',
+            name='fine_accrued',
+            field=models.DecimalField(decimal_places=2, default=0.0, help_text='Final fine, stored on return; open loans are computed (core/library.py)', max_digits=6),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:00
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_dues(apps, schema_editor):
+    FeeInvoice = apps.get_model('core', 'FeeInvoice')
+    StudentProfile = apps.get_model('core', 'StudentProfile')
+    totals = FeeInvoice.objects.filter(is_paid=False).values('student_id').annotate(total=Sum('amount'), count=Count('id'))
+    batch = []
+    for row in totals.iterator(chunk_size=5000):
+        batch.append(StudentProfile(id=row['student_id'], outstanding_dues=row['total'], unpaid_invoices=row['count']))
+        if len(batch) >= 2000:
+            StudentProfile.objects.bulk_update(batch, ['outstanding_dues', 'unpaid_invoices'])
+            batch = []
+    StudentProfile.objects.bulk_update(batch, ['outstanding_dues', 'unpaid_invoices'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_library_fines_on_return'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentprofile',
+            name='outstanding_dues',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='studentprofile',
+            name='unpaid_invoices',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='studentprofile',
+            index=models.Index(fields=['department', 'outstanding_dues'], name='core_studen_departm_3742b3_idx'),
+        ),
+        migrations.RunPython(backfill_dues, migrations.RunPython.noop),
+    ]
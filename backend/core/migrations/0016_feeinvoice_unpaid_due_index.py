@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_studentprofile_dues_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feeinvoice',
+            index=models.Index(fields=['is_paid', 'due_date'], name='core_feeinv_is_paid_90570c_idx'),
+        ),
+    ]
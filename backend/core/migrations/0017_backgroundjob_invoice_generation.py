@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_feeinvoice_unpaid_due_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='job_type',
+            field=models.CharField(choices=[('STUDENT_IMPORT', 'Student Import'), ('INVOICE_GENERATION', 'Invoice Generation')], max_length=30),
+        ),
+    ]
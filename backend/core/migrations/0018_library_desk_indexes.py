@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_backgroundjob_invoice_generation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='libraryaction',
+            index=models.Index(fields=['returned_on', 'due_date'], name='core_librar_returne_af7911_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libraryaction',
+            index=models.Index(fields=['book_uid', 'returned_on'], name='core_librar_book_ui_9607b1_idx'),
+        ),
+    ]
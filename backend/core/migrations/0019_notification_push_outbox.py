@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_library_desk_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificationinbox',
+            name='fcm_dispatched',
+            field=models.BooleanField(default=False, help_text='Claimed by the push outbox (core/push.py)'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationinbox',
+            index=models.Index(fields=['fcm_dispatched', 'created_at'], name='core_notifi_fcm_dis_a30dea_idx'),
+        ),
+    ]
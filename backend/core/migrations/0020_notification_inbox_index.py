@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_notification_push_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificationinbox',
+            index=models.Index(fields=['user', 'is_read', 'created_at'], name='core_notifi_user_id_dad591_idx'),
+        ),
+    ]
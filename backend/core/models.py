@@ -106,15 +106,17 @@ class StudentProfile(models.Model):
     # Pastoral Linkage constraint
     teacher_guardian = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='tg_cohort')
     
-    @property
-    def cgpa(self):
-        records = self.grades.filter(is_absent=False)
-        if not records.exists():
-            return 0.0
-        
-        total_points = sum(r.grade_point * r.course.credits for r in records if r.course.credits)
-        total_credits = sum(r.course.credits for r in records if r.course.credits)
-        return round(float(total_points / total_credits), 2) if total_credits > 0 else 0.0
+    # ✅ Denormalized academic standing, kept current by core.grading.grades_changed()
+    cgpa = models.DecimalField(max_digits=4, decimal_places=2, default=0, db_index=True)
+    total_credits = models.PositiveIntegerField(default=0)
+    credit_points = models.PositiveIntegerField(default=0, help_text="Sum of grade point x credits over attempted courses")
+
+    # ✅ Denormalized dues ledger, kept current by core.dues.dues_changed()
+    outstanding_dues = models.DecimalField(max_digits=12, decimal_places=2, default=0, db_index=True)
+    unpaid_invoices = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['department', 'outstanding_dues'])]
 
     def __str__(self):
         return f"{self.roll_no} ({self.user.username})"
@@ -171,6 +173,10 @@ class Lecture(models.Model):
     is_active = models.BooleanField(default=True)
     session_token = models.CharField(max_length=100, default=uuid.uuid4, unique=True)
 
+    # Lifecycle: timetable lectures close automatically at scheduled_end + grace (core.lifecycle)
+    timetable_slot = models.ForeignKey('TimeTable', on_delete=models.SET_NULL, null=True, blank=True, related_name='lectures')
+    scheduled_end = models.DateTimeField(null=True, blank=True, db_index=True)
+
     def __str__(self):
         return f"{self.course.code} ({self.start_time.date()})"
 
@@ -250,26 +256,21 @@ class GradeRecord(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     marks_obtained = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     is_absent = models.BooleanField(default=False)
+    # ✅ Stored at write time (save() / core.grading.ingest_marks) so reads never re-derive them
+    percentage = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, editable=False)
+    grade_point = models.PositiveSmallIntegerField(default=0, editable=False)
     
     @property
     def passed(self):
         if self.is_absent or self.marks_obtained is None:
             return False
         return self.marks_obtained >= self.exam.passing_marks
-        
-    @property
-    def grade_point(self):
-        if self.is_absent or self.marks_obtained is None:
-            return 0
-        percentage = (self.marks_obtained / self.exam.max_marks) * 100
-        if percentage >= 90: return 10
-        elif percentage >= 80: return 9
-        elif percentage >= 70: return 8
-        elif percentage >= 60: return 7
-        elif percentage >= 50: return 6
-        elif percentage >= 40: return 5
-        elif percentage >= 35: return 4
-        return 0
+
+    def save(self, *args, **kwargs):
+        from .grading import score_one
+        marks = None if self.is_absent else self.marks_obtained
+        self.percentage, self.grade_point = score_one(marks, self.exam.max_marks)
+        super().save(*args, **kwargs)
 
     class Meta:
         unique_together = ('student', 'exam', 'course')
@@ -308,6 +309,9 @@ class FeeInvoice(models.Model):
     due_date = models.DateField()
     is_paid = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['is_paid', 'due_date'])]
     
     def __str__(self):
         return f"{self.fee_type} - {self.student.roll_no} - ₹{self.amount}"
@@ -323,6 +327,15 @@ class PaymentTransaction(models.Model):
     def __str__(self):
         return f"TXN {self.transaction_id} - Success: {self.is_successful}"
 
+class FineRun(models.Model):
+    """Ledger of nightly fine runs (core/fines.py); the unique date makes a repeated beat delivery a no-op."""
+    run_date = models.DateField(unique=True)
+    penalties_created = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Fine run {self.run_date}: {self.penalties_created} penalties"
+
 class LibraryAction(models.Model):
     student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name='library_books')
     book_uid = models.CharField(max_length=50, help_text="Physical RFID tag or Barcode")
@@ -330,7 +343,13 @@ class LibraryAction(models.Model):
     issued_on = models.DateTimeField(auto_now_add=True)
     due_date = models.DateField()
     returned_on = models.DateTimeField(null=True, blank=True)
-    fine_accrued = models.DecimalField(max_digits=6, decimal_places=2, default=0.00)
+    fine_accrued = models.DecimalField(max_digits=6, decimal_places=2, default=0.00, help_text="Final fine, stored on return; open loans are computed (core/library.py)")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['returned_on', 'due_date']),  # open loans (returned_on IS NULL) by due date
+            models.Index(fields=['book_uid', 'returned_on']),  # RFID desk tag lookups
+        ]
     
     @property
     def is_overdue(self):
@@ -351,7 +370,13 @@ class NotificationInbox(models.Model):
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    fcm_dispatched = models.BooleanField(default=False)
+    fcm_dispatched = models.BooleanField(default=False, help_text="Claimed by the push outbox (core/push.py)")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fcm_dispatched', 'created_at']),  # Push outbox scan
+            models.Index(fields=['user', 'is_read', 'created_at']),  # Inbox pages and unread recounts
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.title[:30]}"
@@ -373,4 +398,50 @@ class AppRelease(models.Model):
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"v{self.version_name} ({self.version_code}) - {'ACTIVE' if self.is_active else 'Archived'}"
\ No newline at end of file
+        return f"v{self.version_name} ({self.version_code}) - {'ACTIVE' if self.is_active else 'Archived'}"
+# ==========================================
+# 12. BACKGROUND JOBS
+# ==========================================
+class BackgroundJob(models.Model):
+    """
+    Long-running work (imports, bulk generation, mailers) handed to Celery.
+    Workers commit in chunks and advance `checkpoint` in the same transaction,
+    so a job whose worker died resumes after the last committed chunk.
+    """
+    JOB_TYPES = (
+        ('STUDENT_IMPORT', 'Student Import'),
+        ('INVOICE_GENERATION', 'Invoice Generation'),
+        ('DEFAULTER_MAILER', 'Attendance Warning Mailer'),
+    )
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    )
+    job_type = models.CharField(max_length=30, choices=JOB_TYPES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING', db_index=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='background_jobs')
+    input_file = models.FileField(upload_to='jobs/', null=True, blank=True)
+    params = models.JSONField(default=dict, blank=True)
+
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    checkpoint = models.PositiveIntegerField(default=0, help_text="Last committed row/item; a resumed run starts after it")
+    result = models.JSONField(default=dict, blank=True)
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def progress(self):
+        if self.status == 'COMPLETED':
+            return 100
+        return min(99, int(self.processed * 100 / self.total)) if self.total else 0
+
+    def __str__(self):
+        return f"{self.get_job_type_display()} #{self.pk} ({self.status})"
@@ -0,0 +1,97 @@
+"""
+Absence notification fan-out.
+
+Writers report absences with absences_recorded(attendance_ids). Every call
+made inside one transaction (the Attendance signal fires once per row) joins
+the same batch; once it commits, notify_absences (Celery) turns the batch into inbox rows
+for each student and every linked parent. A batch costs two reads (absences
+with student and lecture details, parent links) and one bulk_create of inbox
+rows, however many rows or parents are involved; pushes then go out through
+the coalescing outbox in core/push.py. Nothing runs on the request path.
+
+bulk_create skips the Attendance signal, so bulk writers call
+absences_recorded() themselves.
+"""
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Attendance, NotificationInbox, ParentProfile
+from .inbox import notifications_created
+
+NOTIFY_CHUNK_SIZE = 1000
+
+STUDENT_TITLE = "Attendance Alert"
+PARENT_TITLE = "Ward Attendance Alert"
+
+
+_pending = threading.local()
+
+
+def absences_recorded(attendance_ids):
+    """
+    Queues notifications for ABSENT attendance rows after the caller's
+    transaction commits, in one flush per transaction. Outside a transaction
+    the batch is queued at once.
+    """
+    connection = transaction.get_connection()
+    batch = getattr(_pending, 'batch', None)
+    # A new commit-hook list means the transaction that owned the batch has ended (or a savepoint rolled back)
+    if connection.in_atomic_block and batch is not None and batch[0] is connection.run_on_commit:
+        batch[1].update(attendance_ids)
+        return
+    ids = set(attendance_ids)
+    if not ids:
+        return
+    _pending.batch = (connection.run_on_commit, ids)
+    transaction.on_commit(lambda: _queue_absences(ids))
+
+
+def _queue_absences(ids):
+    from .tasks import notify_absences
+    attendance_ids = sorted(ids)
+    for i in range(0, len(attendance_ids), NOTIFY_CHUNK_SIZE):
+        notify_absences.delay(attendance_ids[i:i + NOTIFY_CHUNK_SIZE])
+
+
+def build_absence_notifications(attendance_ids):
+    """Creates inbox rows for a batch of absences; returns how many."""
+    absences = list(
+        Attendance.objects.filter(id__in=attendance_ids, status='ABSENT').values(
+            'student_id', 'student__username', 'student__first_name', 'student__last_name',
+            'lecture__course__name', 'lecture__start_time',
+        )
+    )
+    if not absences:
+        return 0
+
+    parents = defaultdict(list)
+    for student_user_id, parent_user_id in (
+        ParentProfile.students.through.objects
+        .filter(studentprofile__user_id__in={a['student_id'] for a in absences})
+        .values_list('studentprofile__user_id', 'parentprofile__user_id')
+    ):
+        parents[student_user_id].append(parent_user_id)
+
+    inbox = []
+    for absence in absences:
+        course = absence['lecture__course__name']
+        day = timezone.localtime(absence['lecture__start_time']).strftime('%Y-%m-%d')
+        name = f"{absence['student__first_name']} {absence['student__last_name']}".strip() or absence['student__username']
+
+        inbox.append(NotificationInbox(
+            user_id=absence['student_id'], title=STUDENT_TITLE,
+            message=f"You have been marked ABSENT for {course} on {day}.",
+        ))
+        for parent_user_id in parents[absence['student_id']]:
+            inbox.append(NotificationInbox(
+                user_id=parent_user_id, title=PARENT_TITLE,
+                message=f"Your ward, {name}, was marked ABSENT for {course} on {day}.",
+            ))
+
+    with transaction.atomic():
+        NotificationInbox.objects.bulk_create(inbox, batch_size=NOTIFY_CHUNK_SIZE)
+        notifications_created(row.user_id for row in inbox)  # bulk_create skips the unread-count signal
+    return len(inbox)
@@ -0,0 +1,58 @@
+"""
+Payment webhook ingestion.
+
+Gateways retry aggressively near fee deadlines, so settlement must be
+idempotent and race-free without taking application-level locks:
+
+1. A retry of a recorded transaction_id is acknowledged from one indexed read
+   (or rejected as a conflict when it was recorded for another invoice).
+2. The invoice is settled with a conditional UPDATE (is_paid=False -> True);
+   of any number of concurrent deliveries exactly one sees rowcount 1, the
+   rest block on the row lock and then see 0.
+3. Only that winner records the PaymentTransaction and moves the student's
+   dues ledger (a single delta UPDATE), all in one transaction.
+
+Everything else (student notifications) is queued after commit, so the
+gateway gets its acknowledgement as soon as the row is settled.
+"""
+from django.db import IntegrityError, transaction
+
+from .models import FeeInvoice, PaymentTransaction
+from .dues import dues_changed
+
+SETTLED = 'settled'
+DUPLICATE = 'duplicate'
+ALREADY_PAID = 'already_paid'
+NOT_FOUND = 'not_found'
+CONFLICT = 'conflict'
+
+
+def settle_invoice(invoice_id, transaction_id, payment_method='RAZORPAY'):
+    """Applies one gateway confirmation; returns one of the outcome constants above."""
+    recorded_for = PaymentTransaction.objects.filter(transaction_id=transaction_id).values_list('invoice_id', flat=True).first()
+    if recorded_for is not None:
+        return DUPLICATE if recorded_for == invoice_id else CONFLICT
+
+    invoice = FeeInvoice.objects.filter(id=invoice_id).values('student_id', 'amount').first()
+    if invoice is None:
+        return NOT_FOUND
+
+    try:
+        with transaction.atomic():
+            if not FeeInvoice.objects.filter(id=invoice_id, is_paid=False).update(is_paid=True):
+                return ALREADY_PAID
+            PaymentTransaction.objects.create(
+                invoice_id=invoice_id, transaction_id=transaction_id, amount_paid=invoice['amount'],
+                payment_method=payment_method, is_successful=True,
+            )
+            dues_changed({invoice['student_id']: (-invoice['amount'], -1)})  # update() skips the ledger signal
+            transaction.on_commit(lambda: _queue_receipt(invoice_id))
+    except IntegrityError:
+        # transaction_id was recorded by a concurrent delivery (or reused for another invoice)
+        return DUPLICATE if PaymentTransaction.objects.filter(transaction_id=transaction_id, invoice_id=invoice_id).exists() else CONFLICT
+    return SETTLED
+
+
+def _queue_receipt(invoice_id):
+    from .tasks import notify_payment_received
+    notify_payment_received.delay(invoice_id)
@@ -0,0 +1,271 @@
+"""
+Push delivery (Firebase Cloud Messaging HTTP v1).
+
+NotificationInbox doubles as the push outbox: writers only create inbox rows
+(fcm_dispatched=False) and call schedule_push_flush(). One flush per
+FCM_COALESCE_WINDOW claims every pending row, folds each user's alerts into a
+single push, and hands the pushes to dispatch_fcm_batch in batches of
+FCM_BATCH_SIZE. A batch is sent over FCM_CONCURRENCY keep-alive connections;
+dead tokens are cleared from User.fcm_device_token in one UPDATE and
+transient failures are re-queued with exponential backoff.
+
+Rows older than PUSH_MAX_AGE are never pushed, so a user registering a device
+later is not flooded with stale alerts.
+"""
+import http.client
+import json
+import logging
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import NotificationInbox, User
+
+logger = logging.getLogger(__name__)
+
+FCM_BATCH_SIZE = 500
+OUTBOX_CHUNK_SIZE = 5000
+PUSH_MAX_AGE = timedelta(hours=1)
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 2  # seconds; attempt n waits BACKOFF_BASE * 2**n (+ jitter)
+FCM_SCOPE = 'https://www.googleapis.com/auth/firebase.messaging'
+
+FLUSH_SCHEDULED_KEY = 'push:flush:scheduled'
+
+OK = 'OK'
+# FCM error codes: the token is dead and should be forgotten ...
+PRUNE_ERRORS = {'UNREGISTERED', 'INVALID_ARGUMENT', 'SENDER_ID_MISMATCH'}
+# ... or the request may succeed later
+TRANSIENT_ERRORS = {'UNAVAILABLE', 'INTERNAL', 'QUOTA_EXCEEDED'}
+_STATUS_ERRORS = {400: 'INVALID_ARGUMENT', 401: 'THIRD_PARTY_AUTH_ERROR', 403: 'SENDER_ID_MISMATCH',
+                  404: 'UNREGISTERED', 429: 'QUOTA_EXCEEDED', 500: 'INTERNAL', 503: 'UNAVAILABLE'}
+
+
+# =========================================
+# TRANSPORT
+# =========================================
+class FCMClient:
+    """
+    HTTP v1 sender: a batch is fanned out over a pool of `concurrency`
+    threads, each holding one keep-alive connection. The pool lives as long
+    as the client (get_client() caches it), so connections and their TLS
+    sessions carry over from one batch to the next.
+    """
+
+    def __init__(self, endpoint, project_id, credentials_file='', concurrency=16, timeout=10):
+        parts = urlsplit(endpoint)
+        self.scheme, self.host, self.timeout = parts.scheme, parts.netloc, timeout
+        self.path = f"{parts.path.rstrip('/')}/v1/projects/{project_id}/messages:send"
+        self.concurrency = max(1, concurrency)
+        self._credentials = self._load_credentials(credentials_file) if credentials_file else None
+        self._credentials_lock = threading.Lock()
+        self._local = threading.local()
+        self._pool, self._pool_pid = None, None
+        self._pool_lock = threading.Lock()
+
+    @staticmethod
+    def _load_credentials(path):
+        from google.oauth2 import service_account
+        return service_account.Credentials.from_service_account_file(path, scopes=[FCM_SCOPE])
+
+    def _auth_header(self):
+        if self._credentials is None:
+            return {}
+        with self._credentials_lock:
+            if not self._credentials.valid:
+                from google.auth.transport.requests import Request
+                self._credentials.refresh(Request())
+            return {'Authorization': f"Bearer {self._credentials.token}"}
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            factory = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = self._local.conn = factory(self.host, timeout=self.timeout)
+        return conn
+
+    def send(self, message):
+        """Sends one message; returns (OK or FCM error code, retry_after seconds or None)."""
+        body = json.dumps({'message': {
+            'token': message['token'],
+            'notification': {'title': message['title'], 'body': message['body']},
+        }}).encode('utf-8')
+        headers = {'Content-Type': 'application/json', **self._auth_header()}
+        try:
+            conn = self._connection()
+            conn.request('POST', self.path, body, headers)
+            response = conn.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            self._local.conn = None  # Reconnect on the next message
+            return 'UNAVAILABLE', None
+        if response.status == 200:
+            return OK, None
+        retry_after = response.getheader('Retry-After')
+        return self._error_code(response.status, payload), int(retry_after) if (retry_after or '').isdigit() else None
+
+    @staticmethod
+    def _error_code(status, payload):
+        try:
+            error = json.loads(payload)['error']
+            for detail in error.get('details', []):
+                if detail.get('errorCode'):
+                    return detail['errorCode']
+            return error.get('status') or _STATUS_ERRORS.get(status, 'UNKNOWN')
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return _STATUS_ERRORS.get(status, 'UNKNOWN')
+
+    def _executor(self):
+        # A client created before a prefork worker forked holds a pool whose threads did not survive the fork
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(self.concurrency, thread_name_prefix='fcm')
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def send_batch(self, messages):
+        """Results for `messages`, in order."""
+        return list(self._executor().map(self.send, messages))
+
+    def close(self):
+        """Stops the sender threads; their connections close with them."""
+        with self._pool_lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+@lru_cache(maxsize=4)
+def _client(endpoint, project_id, credentials_file, concurrency):
+    return FCMClient(endpoint, project_id, credentials_file, concurrency)
+
+
+def get_client():
+    """The configured FCM client, or None when FCM_PROJECT_ID is unset (pushes are logged only)."""
+    if not settings.FCM_PROJECT_ID:
+        return None
+    return _client(settings.FCM_ENDPOINT, settings.FCM_PROJECT_ID, settings.FCM_CREDENTIALS_FILE, settings.FCM_CONCURRENCY)
+
+
+# =========================================
+# DELIVERY
+# =========================================
+def backoff(attempt, retry_after=None):
+    return max(retry_after or 0, BACKOFF_BASE * 2 ** attempt) + random.uniform(0, BACKOFF_BASE)
+
+
+def deliver(messages, attempt=0, client=None):
+    """
+    Sends one batch of {'user_id', 'token', 'title', 'body'} messages, prunes
+    dead tokens and re-queues transient failures. Returns counters.
+    """
+    client = client or get_client()
+    if client is None:
+        for message in messages:
+            logger.info(f"🔥 [FCM PUSH] To: {message['token']} | Title: {message['title']} | Body: {message['body']}")
+        return {'sent': len(messages), 'pruned': 0, 'retrying': 0, 'failed': 0}
+
+    dead, retry, failed, retry_after = set(), [], 0, None
+    results = client.send_batch(messages)
+    for message, (code, wait) in zip(messages, results):
+        if code == OK:
+            continue
+        if code in PRUNE_ERRORS:
+            dead.add(message['token'])
+        elif code in TRANSIENT_ERRORS and attempt + 1 < MAX_ATTEMPTS:
+            retry.append(message)
+            retry_after = max(retry_after or 0, wait or 0) or None
+        else:
+            failed += 1
+            logger.warning(f"FCM push to user {message.get('user_id')} failed: {code}")
+
+    if dead:
+        User.objects.filter(fcm_device_token__in=dead).update(fcm_device_token=None)
+    if retry:
+        from .tasks import dispatch_fcm_batch
+        dispatch_fcm_batch.apply_async((retry, attempt + 1), countdown=backoff(attempt, retry_after))
+    return {
+        'sent': sum(code == OK for code, _ in results), 'pruned': len(dead),
+        'retrying': len(retry), 'failed': failed,
+    }
+
+
+# =========================================
+# OUTBOX
+# =========================================
+def schedule_push_flush():
+    """Call after creating inbox rows; the first caller in a window schedules the flush that covers all of them."""
+    def schedule():
+        if cache.add(FLUSH_SCHEDULED_KEY, 1, settings.FCM_COALESCE_WINDOW):
+            from .tasks import flush_pending_pushes
+            flush_pending_pushes.apply_async(countdown=settings.FCM_COALESCE_WINDOW)
+
+    transaction.on_commit(schedule)
+
+
+def _coalesce(rows, tokens):
+    """One message per user: the alert itself, or a summary when several arrived in the window."""
+    alerts = {}
+    for row in rows:
+        if not tokens.get(row['user_id']):
+            continue  # Pruned since the row was claimed
+        user = alerts.setdefault(row['user_id'], {'token': tokens[row['user_id']], 'count': 0})
+        user['count'] += 1
+        user['latest'] = row  # rows arrive in id order
+    messages = []
+    for user_id, user in alerts.items():
+        latest = user['latest']
+        if user['count'] == 1:
+            title, body = latest['title'], latest['message']
+        else:
+            title, body = f"{user['count']} new notifications", f"{latest['title']}: {latest['message']}"
+        messages.append({'user_id': user_id, 'token': user['token'], 'title': title, 'body': body[:1000]})
+    return messages
+
+
+def flush_pending_pushes(now=None):
+    """
+    Claims every unpushed inbox row for users with a device token and queues
+    the coalesced pushes. Rows are claimed page by page with SELECT ... FOR
+    UPDATE SKIP LOCKED and marked dispatched in the same transaction, so
+    overlapping flushes split the outbox between them instead of pushing a
+    row twice. Returns (rows claimed, pushes queued).
+    """
+    cache.delete(FLUSH_SCHEDULED_KEY)  # Rows written from here on schedule the next flush
+    now = now or timezone.now()
+    pending = NotificationInbox.objects.select_for_update(skip_locked=True).filter(
+        fcm_dispatched=False, created_at__gte=now - PUSH_MAX_AGE,
+        user_id__in=User.objects.filter(fcm_device_token__isnull=False).exclude(fcm_device_token='').values('id'),
+    )
+
+    with transaction.atomic():
+        rows, last_id = [], 0
+        while True:
+            page = list(pending.filter(id__gt=last_id).order_by('id').values('id', 'user_id', 'title', 'message')[:OUTBOX_CHUNK_SIZE])
+            if not page:
+                break
+            NotificationInbox.objects.filter(id__in=[row['id'] for row in page]).update(fcm_dispatched=True)
+            rows.extend(page)
+            last_id = page[-1]['id']
+        if not rows:
+            return 0, 0
+
+        tokens = dict(User.objects.filter(id__in={row['user_id'] for row in rows}).values_list('id', 'fcm_device_token'))
+        messages = _coalesce(rows, tokens)
+
+        def queue():
+            from .tasks import dispatch_fcm_batch
+            for i in range(0, len(messages), FCM_BATCH_SIZE):
+                dispatch_fcm_batch.delay(messages[i:i + FCM_BATCH_SIZE])
+
+        transaction.on_commit(queue)
+    return len(rows), len(messages)
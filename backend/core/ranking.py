@@ -0,0 +1,104 @@
+"""
+Merit lists and ranks.
+
+A cohort (Batch or Department by stored CGPA, or Exam by mean percentage
+across its courses) is ranked with one query and one numpy sort. The whole
+ranked cohort is cached under the grades version (core.grading), so any grade
+write retires every merit list at once and top-N/one-student lookups are
+served from memory.
+"""
+import numpy as np
+from django.core.cache import cache
+
+from .models import Batch, Department, Exam, GradeRecord, StudentProfile
+from .grading import grades_version
+
+RANKING_TTL = 24 * 60 * 60
+SCOPES = ('batch', 'department', 'exam')
+
+
+def dense_ranks(scores):
+    """
+    Dense ranks (1 = best; equal scores share a rank, no gaps) and the
+    percentile of each score, i.e. the share of the cohort scoring strictly lower.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if not len(scores):
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    _, inverse = np.unique(-scores, return_inverse=True)
+    ranks = inverse + 1
+    below = len(scores) - np.searchsorted(np.sort(-scores), -scores, side='right')
+    return ranks, np.round(below * 100.0 / len(scores), 1)
+
+
+def _cohort(scope, scope_id):
+    """Returns (label, student ids, scores) for a ranking scope."""
+    if scope == 'exam':
+        exam = Exam.objects.get(id=scope_id)
+        rows = np.array(
+            list(GradeRecord.objects.filter(exam=exam).values_list('student_id', 'percentage')),
+            dtype=np.float64,
+        ).reshape(-1, 2)
+        ids, inverse = np.unique(rows[:, 0].astype(np.int64), return_inverse=True)
+        pct = np.nan_to_num(rows[:, 1])  # Absent counts as 0
+        scores = np.round(np.bincount(inverse, weights=pct) / np.bincount(inverse), 2)
+        return str(exam), ids, scores
+
+    model = Batch if scope == 'batch' else Department
+    label = str(model.objects.get(id=scope_id))
+    rows = list(StudentProfile.objects.filter(**{f"{scope}_id": scope_id}).values_list('id', 'cgpa'))
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    scores = np.array([float(r[1]) for r in rows], dtype=np.float64)
+    return label, ids, scores
+
+
+def build_merit_list(scope, scope_id):
+    """Ranks a whole cohort. Entries are sorted best-first."""
+    label, ids, scores = _cohort(scope, scope_id)
+    ranks, percentiles = dense_ranks(scores)
+    order = np.lexsort((ids, ranks))  # By rank, ties broken by id for a stable listing
+
+    info = {
+        row['id']: row for row in
+        StudentProfile.objects.filter(id__in=ids.tolist()).values('id', 'roll_no', 'user__first_name', 'user__last_name')
+    }
+    entries = []
+    for i in order:
+        student = info.get(int(ids[i]), {})
+        entries.append({
+            'student_id': int(ids[i]),
+            'roll_no': student.get('roll_no'),
+            'name': f"{student.get('user__first_name', '')} {student.get('user__last_name', '')}".strip(),
+            'score': float(scores[i]),
+            'rank': int(ranks[i]),
+            'percentile': float(percentiles[i]),
+        })
+    return {
+        'scope': scope,
+        'scope_id': scope_id,
+        'label': label,
+        'metric': 'mean %' if scope == 'exam' else 'CGPA',
+        'count': len(entries),
+        'mean': round(float(scores.mean()), 2) if len(scores) else 0.0,
+        'entries': entries,
+    }
+
+
+def merit_list(scope, scope_id, top=None):
+    """Cached merit list; `top` trims the entries (ties at the cut-off are kept)."""
+    if scope not in SCOPES:
+        raise ValueError(f"Unknown ranking scope '{scope}'.")
+    key = f"ranking:v{grades_version()}:{scope}:{scope_id}"
+    ranked = cache.get(key)
+    if ranked is None:
+        ranked = build_merit_list(scope, scope_id)
+        cache.set(key, ranked, RANKING_TTL)
+    if top:
+        cutoff = ranked['entries'][top - 1]['rank'] if len(ranked['entries']) >= top else None
+        ranked = {**ranked, 'entries': [e for e in ranked['entries'] if cutoff is None or e['rank'] <= cutoff]}
+    return ranked
+
+
+def student_standing(student_id, scope, scope_id):
+    """The student's entry in a cached merit list, or None."""
+    return next((e for e in merit_list(scope, scope_id)['entries'] if e['student_id'] == student_id), None)
@@ -0,0 +1,188 @@
+"""
+Gateway settlement reconciliation.
+
+The gateway's daily settlement report is the source of truth for money that
+actually moved; PaymentTransaction rows only exist for webhooks we received.
+reconcile_settlement() streams the report in chunks and hash-joins each chunk
+against the transactions and invoices it references (two indexed IN reads per
+chunk), then walks our own transactions for the settlement day in keyset
+chunks to find payments the gateway never settled. Memory is bounded by the
+chunk size plus one set of transaction ids from the report.
+
+Findings:
+    settled_unrecorded   settled by the gateway, never webhooked (fixed unless dry run)
+    missing_settlement   webhooked here, absent from the report
+    duplicate            transaction id repeated in the report
+    double_payment       invoice already paid under another transaction id
+    amount_mismatch      settled amount differs from the recorded payment or invoice
+    invoice_mismatch     report and our transaction disagree on the invoice
+    unknown_invoice      report references an invoice that does not exist
+    invalid              row could not be parsed
+"""
+import csv
+from collections import Counter, defaultdict
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import FeeInvoice, PaymentTransaction
+from .dues import dues_changed
+
+RECONCILE_CHUNK_SIZE = 5000
+REQUIRED_COLUMNS = ('transaction_id', 'invoice_id', 'amount')
+REPORT_COLUMNS = ('finding', 'transaction_id', 'invoice_id', 'settled_amount', 'recorded_amount', 'line')
+
+SETTLED_UNRECORDED = 'settled_unrecorded'
+MISSING_SETTLEMENT = 'missing_settlement'
+DUPLICATE = 'duplicate'
+DOUBLE_PAYMENT = 'double_payment'
+AMOUNT_MISMATCH = 'amount_mismatch'
+INVOICE_MISMATCH = 'invoice_mismatch'
+UNKNOWN_INVOICE = 'unknown_invoice'
+INVALID = 'invalid'
+
+
+def _settlement_rows(csv_file, chunk_size):
+    """Yields lists of parsed rows: (line, transaction_id, invoice_id or None, amount or None, method)."""
+    reader = csv.DictReader(csv_file)
+    headers = {(name or '').strip().lower() for name in reader.fieldnames or []}
+    missing = [column for column in REQUIRED_COLUMNS if column not in headers]
+    if missing:
+        raise ValueError(f"Settlement file is missing column(s): {', '.join(missing)}")
+
+    chunk = []
+    for line, raw in enumerate(reader, start=2):
+        row = {(key or '').strip().lower(): (value or '').strip() for key, value in raw.items()}
+        try:
+            invoice_id, amount = int(row['invoice_id']), Decimal(row['amount'])
+        except (ValueError, InvalidOperation):
+            invoice_id = amount = None
+        chunk.append((line, row['transaction_id'], invoice_id, amount, row.get('payment_method') or 'RAZORPAY'))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _settle_unrecorded(rows):
+    """Marks never-webhooked invoices paid and records their transactions; returns the rows applied."""
+    with transaction.atomic():
+        unpaid = {
+            invoice_id: (student_id, amount) for invoice_id, student_id, amount in
+            FeeInvoice.objects.select_for_update()
+            .filter(id__in=[invoice_id for _, _, invoice_id, _, _ in rows], is_paid=False)
+            .values_list('id', 'student_id', 'amount')
+        }
+        applied = [row for row in rows if row[2] in unpaid]
+        if not applied:
+            return applied
+        FeeInvoice.objects.filter(id__in=unpaid).update(is_paid=True)
+        PaymentTransaction.objects.bulk_create([
+            PaymentTransaction(invoice_id=invoice_id, transaction_id=txn_id, amount_paid=amount,
+                               payment_method=method, is_successful=True)
+            for _, txn_id, invoice_id, amount, method in applied
+        ])
+        settled = defaultdict(lambda: (Decimal('0.00'), 0))
+        for student_id, amount in unpaid.values():
+            total, count = settled[student_id]
+            settled[student_id] = (total - amount, count - 1)
+        dues_changed(settled)  # update() skips the ledger signal
+    return applied
+
+
+def reconcile_settlement(csv_file, settlement_date, report=None, dry_run=False, chunk_size=RECONCILE_CHUNK_SIZE):
+    """
+    Reconciles an open settlement CSV (columns transaction_id, invoice_id,
+    amount, optional payment_method) against the database. Each finding is
+    written to `report` (a csv.writer-compatible object) as it is found.
+    Returns {'rows', 'matched', 'settled', <finding>: count, ...}.
+    """
+    counts = Counter()
+    seen = set()
+
+    def flag(finding, txn_id, invoice_id=None, settled=None, recorded=None, line=None):
+        counts[finding] += 1
+        if report is not None:
+            report.writerow((finding, txn_id, invoice_id or '', settled if settled is not None else '',
+                             recorded if recorded is not None else '', line or ''))
+
+    for chunk in _settlement_rows(csv_file, chunk_size):
+        counts['rows'] += len(chunk)
+        txn_ids = {txn_id for _, txn_id, _, _, _ in chunk}
+        recorded = {
+            row['transaction_id']: row for row in
+            PaymentTransaction.objects.filter(transaction_id__in=txn_ids).values('transaction_id', 'invoice_id', 'amount_paid')
+        }
+        invoices = {
+            row['id']: row for row in
+            FeeInvoice.objects.filter(id__in={invoice_id for _, _, invoice_id, _, _ in chunk if invoice_id})
+            .values('id', 'student_id', 'amount', 'is_paid')
+        }
+
+        unrecorded = []
+        for line, txn_id, invoice_id, amount, method in chunk:
+            if not txn_id or invoice_id is None:
+                flag(INVALID, txn_id, line=line)
+                continue
+            if txn_id in seen:
+                flag(DUPLICATE, txn_id, invoice_id, amount, line=line)
+                continue
+            seen.add(txn_id)
+
+            ours = recorded.get(txn_id)
+            if ours:
+                if ours['invoice_id'] != invoice_id:
+                    flag(INVOICE_MISMATCH, txn_id, invoice_id, amount, ours['amount_paid'], line)
+                elif ours['amount_paid'] != amount:
+                    flag(AMOUNT_MISMATCH, txn_id, invoice_id, amount, ours['amount_paid'], line)
+                else:
+                    counts['matched'] += 1
+                continue
+
+            invoice = invoices.get(invoice_id)
+            if invoice is None:
+                flag(UNKNOWN_INVOICE, txn_id, invoice_id, amount, line=line)
+            elif invoice['amount'] != amount:
+                flag(AMOUNT_MISMATCH, txn_id, invoice_id, amount, invoice['amount'], line)
+            elif invoice['is_paid']:
+                flag(DOUBLE_PAYMENT, txn_id, invoice_id, amount, invoice['amount'], line)
+            else:
+                unrecorded.append((line, txn_id, invoice_id, amount, method))
+
+        # Two report rows can settle the same invoice; only the first is applied, the rest are double payments
+        first_per_invoice = {}
+        for row in unrecorded:
+            if row[2] in first_per_invoice:
+                flag(DOUBLE_PAYMENT, row[1], row[2], row[3], line=row[0])
+            else:
+                first_per_invoice[row[2]] = row
+        unrecorded = list(first_per_invoice.values())
+
+        applied = unrecorded if dry_run else _settle_unrecorded(unrecorded)
+        applied_ids = {row[1] for row in applied}
+        for line, txn_id, invoice_id, amount, _ in unrecorded:
+            if txn_id in applied_ids:
+                flag(SETTLED_UNRECORDED, txn_id, invoice_id, amount, line=line)
+            else:
+                flag(DOUBLE_PAYMENT, txn_id, invoice_id, amount, line=line)  # paid by a webhook since the read
+        counts['settled'] += 0 if dry_run else len(applied)
+
+    # Reverse side: our successful payments that day, in keyset chunks, probed against the report's ids
+    start = timezone.make_aware(datetime.combine(settlement_date, dt_time.min))
+    ours = PaymentTransaction.objects.filter(
+        is_successful=True, timestamp__gte=start, timestamp__lt=start + timedelta(days=1)
+    ).order_by('id')
+    last_id = 0
+    while True:
+        page = list(ours.filter(id__gt=last_id).values_list('id', 'transaction_id', 'invoice_id', 'amount_paid')[:chunk_size])
+        if not page:
+            break
+        for _, txn_id, invoice_id, amount_paid in page:
+            if txn_id not in seen:
+                flag(MISSING_SETTLEMENT, txn_id, invoice_id, recorded=amount_paid)
+        last_id = page[-1][0]
+
+    return dict(counts)
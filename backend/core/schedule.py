@@ -0,0 +1,187 @@
+"""
+Weekly schedule index and gateway room states.
+
+A per-teacher, per-day view of TimeTable slots joined with today's lecture
+states. It is built with two queries regardless of slot count and cached until
+midnight. Signals (core/signals.py) drop a teacher's entry when one of their
+Lecture rows changes and bump the timetable version when any TimeTable row
+changes. Code that writes with bulk_create()/update() bypasses signals and
+must call the invalidation helpers itself.
+
+Invalidation only reaches other processes through a shared cache (REDIS_URL).
+With the per-process default, lectures opened by beat or another web worker
+would go unseen, so entries then expire after LOCAL_SCHEDULE_TTL instead.
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Classroom, Lecture, TimeTable
+
+TIMETABLE_VERSION_KEY = 'schedule:timetable_version'
+ROOM_STATE_TTL = 90  # seconds; beat republishes every minute (core.tasks.sync_lecture_lifecycle)
+LOCAL_SCHEDULE_TTL = 60  # seconds; cap when the cache is per-process (beat's lecture cadence)
+LOCAL_ROOM_STATE_TTL = 5  # seconds; beat's republish is invisible to web workers on a per-process cache
+
+
+def cache_is_shared():
+    """False for per-process backends, where another process's invalidation never arrives."""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def timetable_version():
+    return cache.get_or_set(TIMETABLE_VERSION_KEY, 1, None)
+
+
+def _cache_key(teacher_id, day):
+    return f"schedule:v{timetable_version()}:teacher:{teacher_id}:{day.isoformat()}"
+
+
+def _schedule_ttl(now):
+    midnight = timezone.make_aware(datetime.combine(now.date() + timedelta(days=1), time.min), now.tzinfo)
+    ttl = max(60, int((midnight - now).total_seconds()))
+    return ttl if cache_is_shared() else min(ttl, LOCAL_SCHEDULE_TTL)
+
+
+def bump_timetable_version():
+    """Invalidates every cached schedule. Call after bulk TimeTable writes."""
+    if not cache.add(TIMETABLE_VERSION_KEY, 2, None):
+        try:
+            cache.incr(TIMETABLE_VERSION_KEY)
+        except ValueError:
+            cache.set(TIMETABLE_VERSION_KEY, 2, None)
+
+
+def invalidate_teacher_schedule(*teacher_ids):
+    """Drops today's cached schedule for the given teachers. Call after bulk Lecture writes."""
+    today = timezone.localdate()
+    cache.delete_many([_cache_key(tid, today) for tid in teacher_ids if tid])
+
+
+def build_teacher_schedule(teacher_id, now=None):
+    """
+    Builds today's schedule for one teacher from the database (2 queries).
+    Slot status is ACTIVE when the teacher's live lecture matches the slot's
+    course and room, FINISHED when such a lecture already ended today, else UPCOMING.
+    """
+    now = timezone.localtime(now or timezone.now())
+    today = now.date()
+
+    slots = (
+        TimeTable.objects.filter(teacher_id=teacher_id, day_of_week=today.weekday())
+        .select_related('course', 'classroom').order_by('start_time')
+    )
+    lectures = list(
+        Lecture.objects.filter(teacher_id=teacher_id)
+        .filter(Q(is_active=True) | Q(start_time__date=today))
+        .order_by('-start_time').values('id', 'course_id', 'classroom_id', 'is_active')
+    )
+
+    active = next((lec for lec in lectures if lec['is_active']), None)
+    finished = {(lec['course_id'], lec['classroom_id']) for lec in lectures if not lec['is_active']}
+
+    entries = []
+    for slot in slots:
+        key = (slot.course_id, slot.classroom_id)
+        if active and (active['course_id'], active['classroom_id']) == key:
+            status = 'ACTIVE'
+        elif key in finished:
+            status = 'FINISHED'
+        else:
+            status = 'UPCOMING'
+        entries.append({
+            'id': slot.id,
+            'start_time': slot.start_time,
+            'end_time': slot.end_time,
+            'course_id': slot.course_id,
+            'course_name': slot.course.name,
+            'course_code': slot.course.code,
+            'classroom_id': slot.classroom_id,
+            'room': slot.classroom.room_number if slot.classroom else 'TBD',
+            'division': slot.division,
+            'status': status,
+        })
+
+    return {
+        'date': today,
+        'slots': entries,
+        'active_lecture_id': active['id'] if active else None,
+    }
+
+
+def teacher_schedule(teacher_id, now=None):
+    """Cached entry point used by the teacher views."""
+    now = timezone.localtime(now or timezone.now())
+    key = _cache_key(teacher_id, now.date())
+    schedule = cache.get(key)
+    if schedule is None:
+        schedule = build_teacher_schedule(teacher_id, now)
+        cache.set(key, schedule, _schedule_ttl(now))
+    return schedule
+
+
+# =========================================
+# GATEWAY ROOM STATES
+# =========================================
+# hardware_sync asks "which lecture is live in the room behind this gateway?"
+# on every BLE sweep. The answer is published to the cache so the common case
+# needs no Classroom or Lecture query at all. Without a shared cache the
+# published states never reach the web workers, so each one only keeps its own
+# lookups for a few seconds.
+
+def _room_state_ttl():
+    return ROOM_STATE_TTL if cache_is_shared() else LOCAL_ROOM_STATE_TTL
+
+
+def _room_key(gateway_id):
+    return f"schedule:room:{gateway_id.strip().lower()}"
+
+
+def _room_state(room, lecture):
+    return {
+        'classroom_id': room['id'],
+        'room_number': room['room_number'],
+        'lecture_id': lecture['id'] if lecture else None,
+        'course_code': lecture['course__code'] if lecture else None,
+    }
+
+
+def refresh_room_states():
+    """Republishes every gateway's room state in 2 queries."""
+    rooms = Classroom.objects.exclude(esp_device_id__isnull=True).exclude(esp_device_id='').values('id', 'room_number', 'esp_device_id')
+    active = {}
+    for lecture in Lecture.objects.filter(is_active=True).order_by('-id').values('id', 'classroom_id', 'course__code'):
+        active[lecture['classroom_id']] = lecture  # Oldest active lecture wins, like .first()
+    cache.set_many({
+        _room_key(room['esp_device_id']): _room_state(room, active.get(room['id'])) for room in rooms
+    }, _room_state_ttl())
+    return len(rooms)
+
+
+def forget_room_state(classroom_id):
+    """Drops a room's cached state so the next sync resolves it fresh."""
+    gateway_id = Classroom.objects.filter(id=classroom_id).values_list('esp_device_id', flat=True).first()
+    if gateway_id:
+        cache.delete(_room_key(gateway_id))
+
+
+def resolve_room(gateway_id):
+    """
+    Returns the cached room state for a gateway, resolving it from the
+    database on a miss. classroom_id is None for unregistered gateways.
+    """
+    key = _room_key(gateway_id)
+    state = cache.get(key)
+    if state is None:
+        room = Classroom.objects.filter(esp_device_id__iexact=gateway_id.strip()).values('id', 'room_number').first()
+        if room is None:
+            state = {'classroom_id': None, 'room_number': None, 'lecture_id': None, 'course_code': None}
+        else:
+            lecture = Lecture.objects.filter(classroom_id=room['id'], is_active=True).order_by('id').values('id', 'course__code').first()
+            state = _room_state(room, lecture)
+        cache.set(key, state, _room_state_ttl())
+    return state
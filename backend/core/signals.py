@@ -1,39 +1,94 @@
-from django.db.models.signals import post_save
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import Attendance, NotificationInbox
-from .tasks import dispatch_fcm_push
+from .models import Attendance, Lecture, TimeTable, Exam, GradeRecord, FeeInvoice, NotificationInbox
+from .schedule import invalidate_teacher_schedule, bump_timetable_version, forget_room_state
+from .grading import grades_changed, rescore_exam
+from .dues import dues_changed
+from .notifications import absences_recorded
+from .inbox import notifications_created
 
 @receiver(post_save, sender=Attendance)
-def trigger_absent_notification(sender, instance, created, **kwargs):
-    """
-    Automated Communication Hub Trigger:
-    When a student represents an 'ABSENT' state, dispatch local DB alerts
-    and trigger a Celery task to hit Google Firebase Cloud Messaging (FCM).
-    """
+def trigger_absent_notification(sender, instance, **kwargs):
+    """Per-row saves (admin, manual edits) join their transaction's batch; one Celery fan-out runs after commit (core/notifications.py)."""
     if instance.status == 'ABSENT':
-        student = instance.student
-        
-        # 1. Notify Student locally
-        NotificationInbox.objects.create(
-            user=student,
-            title="Attendance Alert",
-            message=f"You have been marked ABSENT for {instance.lecture.course.name} on {instance.lecture.start_time.strftime('%Y-%m-%d')}.",
-            fcm_dispatched=bool(student.fcm_device_token)
-        )
-        if student.fcm_device_token:
-            dispatch_fcm_push.delay("Attendance Alert", f"Marked ABSENT for {instance.lecture.course.name}", student.fcm_device_token)
-            
-        # 2. Notify Parent locally
-        try:
-            parent_profile = getattr(student, 'student_profile', None).parent
-            if parent_profile:
-                NotificationInbox.objects.create(
-                    user=parent_profile.user,
-                    title="Ward Attendance Alert",
-                    message=f"Your ward, {student.get_full_name() or student.username}, was marked ABSENT for {instance.lecture.course.name}.",
-                    fcm_dispatched=bool(parent_profile.user.fcm_device_token)
-                )
-                if parent_profile.user.fcm_device_token:
-                    dispatch_fcm_push.delay("Ward Attendance Alert", f"Your ward was marked ABSENT for {instance.lecture.course.name}.", parent_profile.user.fcm_device_token)
-        except Exception:
-            pass # No linked parent profile found
+        absences_recorded([instance.id])
+
+
+@receiver([post_save, post_delete], sender=Lecture)
+def refresh_teacher_schedule(sender, instance, **kwargs):
+    """Starting or ending a lecture changes the teacher's slot states and the room's live lecture."""
+    invalidate_teacher_schedule(instance.teacher_id)
+    forget_room_state(instance.classroom_id)
+
+
+@receiver([post_save, post_delete], sender=TimeTable)
+def refresh_timetable_index(sender, instance, **kwargs):
+    """Slot edits can move a slot between teachers and days, so drop every cached schedule."""
+    bump_timetable_version()
+
+
+@receiver([post_save, post_delete], sender=GradeRecord)
+def refresh_grade_aggregates(sender, instance, **kwargs):
+    """Single-record edits (admin, shell); bulk ingestion calls grades_changed() itself."""
+    grades_changed([instance.student_id], [instance.exam_id])
+
+
+@receiver(pre_save, sender=Exam)
+def remember_exam_marking(sender, instance, **kwargs):
+    instance._stored_marking = (
+        Exam.objects.filter(pk=instance.pk).values_list('max_marks', 'passing_marks').first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Exam)
+def rescore_exam_records(sender, instance, created, **kwargs):
+    """Stored percentages and grade points depend on max marks; analytics also on passing marks."""
+    stored = getattr(instance, '_stored_marking', None)
+    if created or stored is None:
+        return
+    if stored[0] != instance.max_marks:
+        rescore_exam(instance)
+    elif stored[1] != instance.passing_marks:
+        grades_changed((), [instance.id])
+
+
+def _invoice_state(invoice):
+    return {'student_id': invoice.student_id, 'amount': invoice.amount, 'is_paid': invoice.is_paid}
+
+
+def _move_ledger(before, after):
+    """Moves the dues ledger by what one invoice write changed (either state may be None)."""
+    deltas = defaultdict(lambda: (Decimal('0.00'), 0))
+    for sign, state in ((-1, before), (1, after)):
+        if state and not state['is_paid']:
+            amount, count = deltas[state['student_id']]
+            deltas[state['student_id']] = (amount + sign * state['amount'], count + sign)
+    dues_changed(deltas)
+
+
+@receiver(pre_save, sender=FeeInvoice)
+def remember_invoice_state(sender, instance, **kwargs):
+    instance._stored_state = (
+        FeeInvoice.objects.filter(pk=instance.pk).values('student_id', 'amount', 'is_paid').first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=FeeInvoice)
+def refresh_dues_ledger(sender, instance, **kwargs):
+    """Single-invoice writes (admin, shell); bulk writers and the webhook call dues_changed() themselves."""
+    _move_ledger(getattr(instance, '_stored_state', None), _invoice_state(instance))
+
+
+@receiver(post_delete, sender=FeeInvoice)
+def release_dues_ledger(sender, instance, **kwargs):
+    _move_ledger(_invoice_state(instance), None)
+
+
+@receiver(post_save, sender=NotificationInbox)
+def bump_unread_count(sender, instance, created, **kwargs):
+    """Single inbox rows (receipts, device reports); bulk writers call notifications_created() themselves."""
+    if created and not instance.is_read:
+        notifications_created([instance.user_id])
@@ -1,69 +1,133 @@
 from celery import shared_task
 from django.utils import timezone
-from .models import LibraryAction, FeeInvoice
-from decimal import Decimal
 
 @shared_task
 def calculate_daily_fines():
     """
     Automated Background Worker:
-    Runs every midnight via Celery Beat.
-    Identifies overdue library books and unpaid invoices,
-    and sequentially increments the fine accrued or penalty.
+    Runs every midnight via Celery Beat. Raises late-payment penalties as
+    set-based writes (core/fines.py); a per-day ledger makes a repeated
+    delivery harmless. Library fines need no nightly write: they are derived
+    from due dates on read (core/library.py).
     """
-    today = timezone.now().date()
-    
-    # 1. Library Fines (₹10 per day overdue)
-    overdue_books = LibraryAction.objects.filter(
-        returned_on__isnull=True, 
-        due_date__lt=today
-    )
-    
-    for book in overdue_books:
-        # Increment fine by 10 per overdue day since the task runs daily
-        book.fine_accrued += Decimal('10.00')
-        book.save()
-        
-    # 2. Defaulter Penalty on Fee Invoices (Late after 7 days overdue)
-    penalty_date = today - timezone.timedelta(days=7)
-    overdue_invoices = FeeInvoice.objects.filter(
-        is_paid=False,
-        due_date__lte=penalty_date
-    ).exclude(fee_type='PENALTY')
-    
-    penalty_count = 0
-    for invoice in overdue_invoices:
-        # Check if penalty already exists for this invoice this week
-        recent_penalty = FeeInvoice.objects.filter(
-            student=invoice.student,
-            fee_type='PENALTY',
-            amount=Decimal('500.00'),
-            created_at__date=today
-        ).exists()
-        
-        if not recent_penalty:
-            FeeInvoice.objects.create(
-                student=invoice.student,
-                fee_type='PENALTY',
-                amount=Decimal('500.00'),
-                due_date=today + timezone.timedelta(days=7)
-            )
-            penalty_count += 1
-            
-    return f"Fines calculation complete. Handled {overdue_books.count()} books and {penalty_count} penalties."
+    from .fines import run_daily_fines
+    run = run_daily_fines()
+    if run is None:
+        return "Fines already calculated for today. Skipped."
+    return f"Fines calculation complete. Raised {run.penalties_created} penalties."
 
 @shared_task
 def dispatch_fcm_push(title, body, fcm_token):
-    """
-    Mock FCM Dispatcher for Push Notifications.
-    In production, this would securely authenticate with the Firebase Admin API.
-    """
+    """Single push, kept for tasks queued before the batched dispatcher; new code goes through core/push.py."""
     if not fcm_token:
         return "No FCM Token found. Aborted."
-        
-    # Stub logic mimicking Firebase SDK Payload Dispatch
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.info(f"🔥 [FCM PUSH SECURELY DISPATCHED] To: {fcm_token} | Title: {title} | Body: {body}")
-    
-    return "FCM Push Dispatched successfully."
+    dispatch_fcm_batch.delay([{'user_id': None, 'token': fcm_token, 'title': title, 'body': body}])
+    return "FCM Push queued."
+
+@shared_task
+def dispatch_fcm_batch(messages, attempt=0):
+    """
+    Sends one batch (up to 500) of coalesced pushes over pooled FCM
+    connections; dead tokens are pruned and transient failures re-queued
+    with exponential backoff (core/push.py).
+    """
+    from .push import deliver
+    result = deliver(messages, attempt)
+    return f"FCM batch of {len(messages)} (attempt {attempt + 1}): {result['sent']} sent, {result['pruned']} pruned, {result['retrying']} retrying, {result['failed']} failed."
+
+@shared_task
+def flush_pending_pushes():
+    """Push outbox flush: scheduled by writers once per coalescing window, and every minute by Beat as a safety net."""
+    from .push import flush_pending_pushes as flush
+    rows, pushes = flush()
+    return f"Push outbox: {rows} notification(s) coalesced into {pushes} push(es)."
+
+@shared_task
+def notify_absences(attendance_ids):
+    """Inbox rows for a batch of absences (queued by core.notifications.absences_recorded); pushes follow via the outbox."""
+    from .notifications import build_absence_notifications
+    from .push import schedule_push_flush
+    created = build_absence_notifications(attendance_ids)
+    schedule_push_flush()
+    return f"Absence alerts for {len(attendance_ids)} record(s): {created} notification(s)."
+
+@shared_task
+def sync_lecture_lifecycle():
+    """
+    Timetable-Driven Session Manager:
+    Runs every minute via Celery Beat. Opens lectures for slots that have
+    started, closes lectures past their slot end + grace, sweeps orphaned
+    sessions and republishes every gateway's "active lecture" answer.
+    """
+    from django.conf import settings
+    from .lifecycle import open_due_lectures, close_expired_lectures
+    from .schedule import invalidate_teacher_schedule, refresh_room_states
+
+    now = timezone.localtime(timezone.now())
+    closed, teacher_ids = close_expired_lectures(now)
+    opened = open_due_lectures(now) if settings.LECTURE_AUTO_OPEN else []
+
+    # Set-based writes skip model signals, so refresh the derived views here
+    teacher_ids |= {lecture.teacher_id for lecture in opened}
+    invalidate_teacher_schedule(*teacher_ids)
+    rooms = refresh_room_states()
+
+    return f"Lecture lifecycle: opened {len(opened)}, closed {closed}, published {rooms} room states."
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def run_background_job(job_id):
+    """
+    Generic Job Worker:
+    Runs one BackgroundJob (imports, bulk generation, mailers) in committed
+    chunks. See core/jobs.py for the claim and checkpoint protocol.
+    """
+    from .jobs import execute_job
+    status = execute_job(job_id)
+    return f"Job {job_id}: {status or 'already claimed'}."
+
+@shared_task
+def resume_stalled_jobs():
+    """Runs every few minutes via Celery Beat; re-queues jobs whose worker died mid-run."""
+    from .jobs import resume_stalled_jobs as resume
+    return f"Re-queued {resume()} stalled job(s)."
+
+@shared_task
+def render_transcript(student_id):
+    """Renders one student's transcript into the cache after a view missed it."""
+    from .transcripts import cache_transcripts
+    cache_transcripts([student_id])
+    return f"Transcript rendered for student {student_id}."
+
+@shared_task
+def render_transcript_chunk(student_ids):
+    """Renders one chunk of a batch's transcripts into the cache."""
+    from .transcripts import cache_transcripts
+    return f"Rendered {cache_transcripts(student_ids)} transcript(s)."
+
+@shared_task
+def generate_batch_transcripts(batch_id):
+    """
+    Pre-renders a whole batch's transcripts (convocation season). A prefork
+    worker cannot start a process pool, so each chunk becomes its own task
+    and the worker pool renders them in parallel.
+    """
+    from .transcripts import batch_chunks
+    chunks = batch_chunks(batch_id)
+    for chunk in chunks:
+        render_transcript_chunk.delay(chunk)
+    return f"Queued {len(chunks)} transcript chunk(s) for batch {batch_id}."
+
+@shared_task
+def notify_payment_received(invoice_id):
+    """Payment receipt for the student, queued by the webhook after settlement commits."""
+    from .models import FeeInvoice, NotificationInbox
+    invoice = FeeInvoice.objects.select_related('student__user').get(id=invoice_id)
+    user = invoice.student.user
+    from .push import schedule_push_flush
+    NotificationInbox.objects.create(
+        user=user,
+        title="Payment Received",
+        message=f"₹{invoice.amount} received for {invoice.get_fee_type_display()} (Invoice #{invoice.id}).",
+    )
+    schedule_push_flush()
+    return f"Receipt sent for invoice {invoice_id}."
@@ -1,3 +1,508 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import date, time, timedelta
+from importlib import import_module
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import library
+from .dues import defaulters_page, dues_changed, recompute_dues
+from .grading import score, score_one
+from .imports import import_timetable
+from .inbox import inbox_page
+from .intervals import SlotIndex
+from .jobs import STALE_AFTER, execute_job, resume_stalled_jobs
+from .mailer import send_attendance_warnings
+from .models import (
+    Attendance, BackgroundJob, Batch, Classroom, Course, Department, FeeInvoice, LibraryAction, Lecture,
+    NotificationInbox, PaymentTransaction, Semester, StaffProfile, StudentProfile, TimeTable, User,
+)
+
+
+class WorkerLost(BaseException):
+    """Stands in for a worker process dying mid-job: not an Exception, so execute_job() cannot mark the job FAILED."""
+
+
+class CampusTestCase(TestCase):
+    """One department, semester and batch; students are added per test."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name="Computer Engineering", code="COMP")
+        cls.semester = Semester.objects.create(number=5, is_active=True)
+        cls.batch = Batch.objects.create(year=2024, department=cls.department)
+
+    def setUp(self):
+        cache.clear()  # Versions, counters and cached indexes would otherwise leak between tests
+
+    def make_student(self, roll_no, email='', **fields):
+        user = User.objects.create(username=roll_no, email=email, role=User.Role.STUDENT, first_name=roll_no)
+        return StudentProfile.objects.create(
+            user=user, roll_no=roll_no, department=self.department, batch=self.batch,
+            current_semester=self.semester, **fields,
+        )
+
+    def make_teacher(self, username):
+        user = User.objects.create(username=username, role=User.Role.TEACHER)
+        StaffProfile.objects.create(user=user, department=self.department, employee_id=username.upper())
+        return user
+
+    def api_client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+
+# =========================================
+# BACKGROUND JOBS (claim, checkpoint, resume)
+# =========================================
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class JobResumeTests(CampusTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def crash_on_call(self, target, call_number):
+        """Patches `target` so its `call_number`-th call kills the worker."""
+        module, name = target.rsplit('.', 1)
+        original = getattr(import_module(module), name)
+        calls = {'n': 0}
+
+        def side_effect(*args, **kwargs):
+            calls['n'] += 1
+            if calls['n'] == call_number:
+                raise WorkerLost
+            return original(*args, **kwargs)
+        return mock.patch(target, side_effect=side_effect)
+
+    def go_stale(self, job):
+        BackgroundJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - STALE_AFTER - timedelta(minutes=1))
+
+    def test_student_import_resumes_after_stale_heartbeat(self):
+        rows = "".join(f"S{i:03d},First,Last,COMP,2024,A\n" for i in range(5))
+        job = BackgroundJob(job_type='STUDENT_IMPORT', params={'chunk_size': 2})
+        job.input_file.save('students.csv', ContentFile("RollNo,FirstName,LastName,DeptCode,BatchYear,Division\n" + rows), save=False)
+        job.save()
+
+        with self.crash_on_call('core.imports._write_students', 2), self.assertRaises(WorkerLost):
+            execute_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.checkpoint, job.processed), ('RUNNING', 3, 2))
+        self.assertEqual(StudentProfile.objects.count(), 2)
+
+        self.assertEqual(resume_stalled_jobs(), 0)  # Heartbeat still fresh: the worker may be alive
+        self.go_stale(job)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(resume_stalled_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'COMPLETED')
+        self.assertEqual((job.total, job.processed), (5, 5))
+        self.assertEqual(job.result['created'], 5)
+        self.assertEqual(StudentProfile.objects.count(), 5)
+
+    def test_invoice_job_resume_does_not_count_the_interrupted_rule_twice(self):
+        students = [self.make_student(f"S{i:03d}") for i in range(4)]
+        rules = [{'fee_type': 'TUITION', 'amount': '1000.00', 'due_date': '2026-07-01', 'department_id': None, 'batch_year': None}]
+        job = BackgroundJob.objects.create(job_type='INVOICE_GENERATION', params={'rules': rules, 'chunk_size': 1})
+
+        with self.crash_on_call('core.invoicing.dues_changed', 3), self.assertRaises(WorkerLost):
+            execute_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.processed, job.result['created']), (2, 2))
+
+        self.go_stale(job)
+        with self.captureOnCommitCallbacks(execute=True):
+            resume_stalled_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'COMPLETED')
+        self.assertEqual((job.total, job.processed), (4, 4))
+        self.assertEqual((job.result['created'], job.result['skipped']), (4, 0))
+        self.assertEqual(FeeInvoice.objects.count(), 4)
+        for student in students:
+            student.refresh_from_db()
+            self.assertEqual((student.outstanding_dues, student.unpaid_invoices), (Decimal('1000.00'), 1))
+
+    def test_a_claimed_job_is_not_run_twice(self):
+        job = BackgroundJob.objects.create(job_type='INVOICE_GENERATION', params={'rules': []})
+        self.assertEqual(execute_job(job.id), 'COMPLETED')
+        self.assertIsNone(execute_job(job.id))
+
+
+# =========================================
+# DUES LEDGER
+# =========================================
+class DuesLedgerTests(CampusTestCase):
+
+    def assertLedger(self, student, amount, count):
+        student.refresh_from_db()
+        self.assertEqual((student.outstanding_dues, student.unpaid_invoices), (Decimal(amount), count))
+
+    def test_invoice_saves_move_the_ledger_by_deltas(self):
+        student = self.make_student("S001")
+        tuition = FeeInvoice.objects.create(student=student, fee_type='TUITION', amount=Decimal('100.00'), due_date=date(2026, 7, 1))
+        hostel = FeeInvoice.objects.create(student=student, fee_type='HOSTEL', amount=Decimal('50.00'), due_date=date(2026, 7, 1))
+        self.assertLedger(student, '150.00', 2)
+
+        tuition.is_paid = True
+        tuition.save()
+        self.assertLedger(student, '50.00', 1)
+
+        hostel.amount = Decimal('70.00')
+        hostel.save()
+        self.assertLedger(student, '70.00', 1)
+
+        hostel.delete()
+        tuition.delete()  # Paid invoices never counted
+        self.assertLedger(student, '0.00', 0)
+
+    def test_dues_changed_composes_with_concurrent_values(self):
+        a, b = self.make_student("S001"), self.make_student("S002")
+        StudentProfile.objects.filter(id=a.id).update(outstanding_dues=Decimal('40.00'), unpaid_invoices=1)
+        dues_changed({a.id: (Decimal('10.00'), 1), b.id: (Decimal('10.00'), 1)})
+        dues_changed({a.id: (Decimal('-40.00'), -1), b.id: (Decimal('0'), 0)})
+        self.assertLedger(a, '10.00', 1)
+        self.assertLedger(b, '10.00', 1)
+
+    def test_recompute_dues_repairs_drift_and_is_idempotent(self):
+        a, b, c = self.make_student("S001"), self.make_student("S002"), self.make_student("S003")
+        FeeInvoice.objects.bulk_create([  # bulk_create skips the ledger signal
+            FeeInvoice(student=a, fee_type='TUITION', amount=Decimal('300.00'), due_date=date(2026, 7, 1)),
+            FeeInvoice(student=a, fee_type='EXAM', amount=Decimal('25.50'), due_date=date(2026, 7, 1)),
+            FeeInvoice(student=b, fee_type='TUITION', amount=Decimal('300.00'), due_date=date(2026, 7, 1), is_paid=True),
+        ])
+        StudentProfile.objects.filter(id=b.id).update(outstanding_dues=Decimal('999.00'), unpaid_invoices=3)
+
+        self.assertEqual(recompute_dues(chunk_size=2), 2)
+        self.assertLedger(a, '325.50', 2)
+        self.assertLedger(b, '0.00', 0)
+        self.assertLedger(c, '0.00', 0)
+        self.assertEqual(recompute_dues(), 0)
+
+
+# =========================================
+# PAYMENT WEBHOOK
+# =========================================
+class PaymentWebhookTests(CampusTestCase):
+    URL = '/api/finance/webhook/success/'
+
+    def setUp(self):
+        super().setUp()
+        self.student = self.make_student("S001")
+        self.invoice = FeeInvoice.objects.create(student=self.student, fee_type='TUITION', amount=Decimal('500.00'), due_date=date(2026, 7, 1))
+        self.other = FeeInvoice.objects.create(student=self.student, fee_type='HOSTEL', amount=Decimal('200.00'), due_date=date(2026, 7, 1))
+        self.gateway = self.api_client(User.objects.create(username='gateway', role=User.Role.SUPER_ADMIN))
+
+    def deliver(self, invoice_id, transaction_id):
+        return self.gateway.post(self.URL, {'invoice_id': invoice_id, 'transaction_id': transaction_id}, format='json')
+
+    def test_retries_of_a_settled_transaction_are_acknowledged_once(self):
+        for _ in range(3):
+            self.assertEqual(self.deliver(self.invoice.id, 'txn_1').status_code, 200)
+
+        self.invoice.refresh_from_db()
+        self.student.refresh_from_db()
+        self.assertTrue(self.invoice.is_paid)
+        self.assertEqual(PaymentTransaction.objects.filter(invoice=self.invoice).count(), 1)
+        self.assertEqual((self.student.outstanding_dues, self.student.unpaid_invoices), (Decimal('200.00'), 1))
+
+    def test_transaction_id_reused_for_another_invoice_is_a_conflict(self):
+        self.deliver(self.invoice.id, 'txn_1')
+        response = self.deliver(self.other.id, 'txn_1')
+
+        self.assertEqual(response.status_code, 409)
+        self.other.refresh_from_db()
+        self.assertFalse(self.other.is_paid)
+        self.assertEqual(PaymentTransaction.objects.count(), 1)
+
+    def test_new_transaction_for_a_paid_invoice_records_nothing(self):
+        self.deliver(self.invoice.id, 'txn_1')
+        self.assertEqual(self.deliver(self.invoice.id, 'txn_2').status_code, 200)
+        self.assertFalse(PaymentTransaction.objects.filter(transaction_id='txn_2').exists())
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.outstanding_dues, Decimal('200.00'))
+
+    def test_unknown_invoice_and_malformed_payload(self):
+        self.assertEqual(self.deliver(999999, 'txn_1').status_code, 404)
+        self.assertEqual(self.deliver('abc', 'txn_1').status_code, 400)
+        self.assertEqual(self.deliver(self.invoice.id, '').status_code, 400)
+
+
+# =========================================
+# KEYSET CURSORS
+# =========================================
+class KeysetCursorTests(CampusTestCase):
+
+    def test_defaulter_pages_cover_ties_exactly_once(self):
+        amounts = ['500.00', '300.00', '300.00', '300.00', '120.50', '0.00']
+        students = [self.make_student(f"S{i:03d}") for i in range(len(amounts))]
+        for student, amount in zip(students, amounts):
+            StudentProfile.objects.filter(id=student.id).update(outstanding_dues=Decimal(amount))
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = defaulters_page(cursor, limit=2)
+            seen += [(s.outstanding_dues, s.id) for s in page]
+            if cursor is None:
+                break
+        expected = sorted(((Decimal(a), s.id) for s, a in zip(students, amounts) if Decimal(a) > 0), reverse=True)
+        self.assertEqual(seen, expected)
+
+    def test_malformed_defaulter_cursors_are_rejected(self):
+        for cursor in ('NaN_1', 'Infinity_1', '-Infinity_1', 'abc_1', '10.00_x', '10.00'):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                defaulters_page(cursor)
+
+    def test_defaulters_endpoint_answers_bad_input_with_400(self):
+        client = self.api_client(User.objects.create(username='clerk', role=User.Role.FINANCE_CLERK))
+        for query in ('after=NaN_1', 'after=Infinity_1', 'department=abc'):
+            with self.subTest(query=query):
+                self.assertEqual(client.get(f'/api/finance/defaulters/?{query}').status_code, 400)
+
+    def test_inbox_pages_cover_identical_timestamps_exactly_once(self):
+        user = User.objects.create(username='reader')
+        rows = [NotificationInbox.objects.create(user=user, title=f"n{i}", message="") for i in range(5)]
+        moment = timezone.now().replace(microsecond=123456)
+        NotificationInbox.objects.filter(id__in=[r.id for r in rows[1:4]]).update(created_at=moment)
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = inbox_page(user.id, cursor, limit=2)
+            seen += [n.id for n in page]
+            if cursor is None:
+                break
+        expected = list(NotificationInbox.objects.filter(user=user).order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_malformed_inbox_cursors_are_rejected(self):
+        for cursor in ('abc_1', '1_x', f"{10 ** 30}_1"):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                inbox_page(1, cursor)
+
+
+# =========================================
+# GRADING
+# =========================================
+class ScoreTests(TestCase):
+
+    def test_band_edges_are_exact(self):
+        cases = [  # (marks out of 50, percentage, grade point)
+            (44.99, 89.98, 9), (45, 90.0, 10), (50, 100.0, 10),
+            (40, 80.0, 9), (39.99, 79.98, 8),
+            (17.5, 35.0, 4), (17.49, 34.98, 0), (0, 0.0, 0),
+        ]
+        percentages, points = score([marks for marks, _, _ in cases], 50)
+        for (marks, pct, gp), got_pct, got_gp in zip(cases, percentages, points):
+            with self.subTest(marks=marks):
+                self.assertEqual((float(got_pct), int(got_gp)), (pct, gp))
+
+    def test_absent_scores_nothing(self):
+        self.assertEqual(score_one(None, 50), (None, 0))
+        self.assertEqual(score_one(Decimal('44.99'), 50), (Decimal('89.98'), 9))
+
+
+# =========================================
+# TIMETABLE CLASHES
+# =========================================
+class ClashDetectionTests(CampusTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.index = SlotIndex()
+        self.index.add(1, 0, time(9), time(10), 'R1', 'T1', 'D1')
+
+    def test_overlaps_clash_on_every_shared_resource(self):
+        self.assertEqual(self.index.check(0, time(9, 30), time(10, 30), 'R1', 'T2', 'D2'), ["Room is already booked (slot 1)."])
+        self.assertEqual(self.index.check(0, time(8, 30), time(9, 1), 'R2', 'T1', 'D2'), ["Teacher is already booked (slot 1)."])
+        self.assertEqual(len(self.index.check(0, time(9), time(10), 'R1', 'T1', 'D1')), 3)
+
+    def test_back_to_back_slots_and_other_days_are_free(self):
+        self.assertEqual(self.index.check(0, time(10), time(11), 'R1', 'T1', 'D1'), [])
+        self.assertEqual(self.index.check(0, time(8), time(9), 'R1', 'T1', 'D1'), [])
+        self.assertEqual(self.index.check(1, time(9), time(10), 'R1', 'T1', 'D1'), [])
+
+    def test_editing_a_slot_ignores_itself_and_rejects_empty_ranges(self):
+        self.assertEqual(self.index.check(0, time(9), time(10, 30), 'R1', 'T1', 'D1', ignore_id=1), [])
+        self.assertEqual(self.index.check(0, time(10), time(10), 'R2', 'T2', 'D2'), ["End time must be after start time."])
+
+    def test_validate_many_catches_clashes_within_the_batch(self):
+        slot = {'day': 2, 'start': time(11), 'end': time(12), 'classroom_id': 'R9', 'teacher_id': 'T9', 'division_key': 'D9'}
+        rejected = self.index.validate_many([slot, {**slot, 'teacher_id': 'T8', 'division_key': 'D8'}])
+        self.assertEqual(list(rejected), [1])
+
+    def test_timetable_import_rejects_clashing_rows(self):
+        course = Course.objects.create(name="Compilers", code="CS501", department=self.department, semester=self.semester)
+        Classroom.objects.create(room_number="A101")
+        teacher = self.make_teacher("emp1")
+        header = "Day,StartTime,EndTime,CourseCode,RoomNumber,TeacherEmpId,Division\n"
+        body = "Monday,09:00,10:00,CS501,A101,EMP1,A\nMonday,09:30,10:30,CS501,A101,EMP1,A\nMonday,10:00,11:00,CS501,A101,EMP1,A\n"
+
+        result = import_timetable(SimpleUploadedFile('timetable.csv', (header + body).encode()))
+        self.assertEqual((result['rows'], result['created']), (3, 2))
+        self.assertEqual([number for number, _ in result['errors']], [3])
+        self.assertEqual(TimeTable.objects.filter(course=course, teacher=teacher).count(), 2)
+
+        # replace is all-or-nothing: one clashing row leaves the stored timetable untouched
+        result = import_timetable(SimpleUploadedFile('timetable.csv', (header + body).encode()), replace=True)
+        self.assertEqual(result['created'], 0)
+        self.assertEqual(TimeTable.objects.count(), 2)
+
+
+# =========================================
+# LIBRARY RFID DESK
+# =========================================
+class LibraryDeskTests(CampusTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.student = self.make_student("S001")
+        self.other = self.make_student("S002")
+
+    def open_loans(self, uid):
+        return LibraryAction.objects.filter(book_uid=uid, returned_on__isnull=True)
+
+    def test_double_scan_in_one_stack_issues_once(self):
+        results = library.checkout_books([
+            {'student': 's001', 'book_uid': 'TAG1', 'book_title': "SICP"},
+            {'student': 'S001', 'book_uid': ' TAG1 ', 'book_title': "SICP"},
+            {'student': 'S404', 'book_uid': 'TAG2', 'book_title': "TAOCP"},
+            {'student': 'S001', 'book_uid': 'X' * (library.MAX_UID_LENGTH + 1), 'book_title': "Too long"},
+        ])
+        self.assertEqual([r['status'] for r in results],
+                         [library.ISSUED, library.DUPLICATE_SCAN, library.UNKNOWN_STUDENT, library.INVALID])
+        self.assertEqual(self.open_loans('TAG1').count(), 1)
+
+    def test_a_tag_on_loan_cannot_be_issued_again(self):
+        library.checkout_books([{'student': 'S001', 'book_uid': 'TAG1', 'book_title': "SICP"}])
+        results = library.checkout_books([{'student': 'S002', 'book_uid': 'TAG1'}])
+        self.assertEqual(results[0]['status'], library.ALREADY_ISSUED)
+
+    def test_checkout_race_lost_to_another_desk(self):
+        issue = library._issue
+
+        def other_desk_first(loans):
+            LibraryAction.objects.create(student=self.other, book_uid='TAG1', book_title="SICP", due_date=date(2026, 11, 1))
+            return issue(loans)
+
+        with mock.patch('core.library._issue', side_effect=other_desk_first):
+            results = library.checkout_books([{'student': 'S001', 'book_uid': 'TAG1', 'book_title': "SICP"}])
+        self.assertEqual(results[0]['status'], library.ALREADY_ISSUED)
+        self.assertNotIn('due_date', results[0])
+        self.assertEqual(list(self.open_loans('TAG1').values_list('student_id', flat=True)), [self.other.id])
+
+    def test_checkin_double_scan_and_unknown_tag(self):
+        library.checkout_books([{'student': 'S001', 'book_uid': 'TAG1', 'book_title': "SICP"}])
+        results = library.checkin_books(['TAG1', 'TAG1', 'TAG9'])
+        self.assertEqual([r['status'] for r in results], [library.RETURNED, library.DUPLICATE_SCAN, library.NOT_ISSUED])
+        self.assertFalse(self.open_loans('TAG1').exists())
+
+    def test_checkin_race_lost_to_another_desk(self):
+        library.checkout_books([{'student': 'S001', 'book_uid': 'TAG1', 'book_title': "SICP"}], due_date=date(2026, 1, 1))
+        earlier = timezone.now() - timedelta(minutes=5)
+        fine_for = library.fine_for
+
+        def returned_elsewhere(*args, **kwargs):
+            LibraryAction.objects.filter(book_uid='TAG1').update(returned_on=earlier)
+            return fine_for(*args, **kwargs)
+
+        with mock.patch('core.library.fine_for', side_effect=returned_elsewhere):
+            results = library.checkin_books(['TAG1'])
+        self.assertEqual(results[0]['status'], library.NOT_ISSUED)
+        self.assertEqual(LibraryAction.objects.get(book_uid='TAG1').returned_on, earlier)
+
+
+# =========================================
+# FCM DELIVERY (local stub server)
+# =========================================
+class FCMDeliveryTests(CampusTestCase):
+
+    def setUp(self):
+        super().setUp()
+        from .fcm_stub import running_stub
+        from .push import _client
+        stub = running_stub()
+        self.stub = stub.__enter__()
+        self.addCleanup(stub.__exit__, None, None, None)
+        settings = override_settings(FCM_PROJECT_ID='test', FCM_ENDPOINT=self.stub.url, FCM_CONCURRENCY=4)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(_client.cache_clear)
+
+    def message(self, user):
+        return {'user_id': user.id, 'token': user.fcm_device_token, 'title': "Attendance Alert", 'body': "test"}
+
+    def test_dead_tokens_are_pruned_and_transient_failures_retried(self):
+        from .push import deliver, get_client
+        client = get_client()
+        self.addCleanup(client.close)
+        live = User.objects.create(username='live', fcm_device_token='token-1')
+        dead = User.objects.create(username='dead', fcm_device_token='invalid-2')
+        flaky = User.objects.create(username='flaky', fcm_device_token='flaky-3')
+
+        with mock.patch('core.push.backoff', return_value=0):
+            result = deliver([self.message(u) for u in (live, dead, flaky)])
+
+        self.assertEqual(result, {'sent': 1, 'pruned': 1, 'retrying': 1, 'failed': 0})
+        self.assertEqual(self.stub.requests, 4)  # The eager retry delivered flaky-3 on its second attempt
+        dead.refresh_from_db()
+        flaky.refresh_from_db()
+        self.assertIsNone(dead.fcm_device_token)
+        self.assertEqual(flaky.fcm_device_token, 'flaky-3')
+
+    def test_keep_alive_connections_outlive_a_batch(self):
+        from .push import get_client
+        client = get_client()
+        self.addCleanup(client.close)
+        batch = [{'token': f"token-{i}", 'title': "t", 'body': "b"} for i in range(40)]
+        for _ in range(3):
+            self.assertEqual({code for code, _ in client.send_batch(batch)}, {'OK'})
+        self.assertEqual(self.stub.requests, 120)
+        self.assertLessEqual(self.stub.connections, 4)
+
+
+# =========================================
+# ATTENDANCE WARNING MAILER (locmem backend)
+# =========================================
+class AttendanceMailerTests(CampusTestCase):
+
+    def setUp(self):
+        super().setUp()
+        course = Course.objects.create(name="Compilers", code="CS501", department=self.department, semester=self.semester)
+        room = Classroom.objects.create(room_number="A101")
+        teacher = self.make_teacher("emp1")
+        lectures = [Lecture.objects.create(course=course, classroom=room, teacher=teacher, is_active=False) for _ in range(4)]
+        # Attended 4/4, 3/4, 1/4, 0/4 and 2/4 lectures
+        self.students = [self.make_student(f"S{i:03d}", email=f"s{i}@example.edu") for i in range(5)]
+        for student, attended in zip(self.students, (4, 3, 1, 0, 2)):
+            Attendance.objects.bulk_create(Attendance(student=student.user, lecture=lecture) for lecture in lectures[:attended])
+        self.make_student("S999")  # No email address: outside the mailer's scope
+
+    def test_each_defaulter_gets_one_message_in_batches(self):
+        batches = []
+        result = send_attendance_warnings(
+            self.department.id, batch_size=2, on_batch=lambda result, last_id: batches.append((dict(result), last_id)),
+        )
+
+        self.assertEqual(result, {'scanned': 5, 'defaulters': 3, 'sent': 3, 'failed': 0})
+        self.assertEqual([last_id for _, last_id in batches], [self.students[1].id, self.students[3].id, self.students[4].id])
+        self.assertEqual(sorted(message.to for message in mail.outbox), [["s2@example.edu"], ["s3@example.edu"], ["s4@example.edu"]])
+        self.assertIn("CS501 Compilers: 1/4 lectures (25.0%)", next(m.body for m in mail.outbox if m.to == ["s2@example.edu"]))
+
+    def test_resume_starts_after_the_checkpoint(self):
+        result = send_attendance_warnings(self.department.id, batch_size=2, start_after=self.students[3].id)
+        self.assertEqual(result, {'scanned': 1, 'defaulters': 1, 'sent': 1, 'failed': 0})
+        self.assertEqual([message.to for message in mail.outbox], [["s4@example.edu"]])
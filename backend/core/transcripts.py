@@ -0,0 +1,125 @@
+"""
+Transcript rendering and cache.
+
+A transcript only changes when the student's grades do, so the rendered HTML
+is cached under that student's grades stamp (core/grading.py) and the issue
+date, so a grade write retires only the affected students' pages.
+Views never render on the request path: a miss queues render_transcript and
+the page polls until the cache is warm. For convocation season a whole batch
+can be rendered ahead of time, in a process pool from the management command
+or as one Celery task per chunk from a worker.
+
+The financial hold is deliberately not part of the cached body; views check
+outstanding dues live on every request.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.cache import cache
+from django.db import connections
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import GradeRecord, StudentProfile
+from .grading import student_grades_stamps
+
+TRANSCRIPT_TTL = 24 * 60 * 60
+PENDING_TTL = 60  # seconds a queued render suppresses duplicate requests
+BATCH_CHUNK_SIZE = 50
+
+
+def transcript_keys(student_ids, issued_on=None):
+    """
+    {student_id: cache key}. Fetch keys before rendering: a grade write that
+    lands mid-render bumps the stamp, so the stale page is stored under a key
+    nobody reads.
+    """
+    issued_on = (issued_on or timezone.localdate()).isoformat()
+    return {
+        sid: f"transcript:{stamp}:{issued_on}:{sid}"
+        for sid, stamp in student_grades_stamps(student_ids).items()
+    }
+
+
+def render_transcripts(student_ids, issued_on=None):
+    """Renders transcripts for a list of students in two queries; returns {student_id: html}."""
+    issued_on = issued_on or timezone.localdate()
+    students = StudentProfile.objects.filter(id__in=student_ids).select_related('user', 'department', 'batch')
+    records = {}
+    for record in (
+        GradeRecord.objects.filter(student_id__in=student_ids)
+        .select_related('exam', 'course').order_by('-exam__date')
+    ):
+        records.setdefault(record.student_id, []).append(record)
+
+    return {
+        student.id: render_to_string('transcript.html', {
+            'student': student,
+            'records': records.get(student.id, []),
+            'cgpa': student.cgpa,
+            'issued_on': issued_on,
+        })
+        for student in students
+    }
+
+
+def cache_transcripts(student_ids):
+    issued_on = timezone.localdate()
+    keys = transcript_keys(student_ids, issued_on)
+    pages = render_transcripts(student_ids, issued_on)
+    cache.set_many({keys[sid]: html for sid, html in pages.items()}, TRANSCRIPT_TTL)
+    return len(pages)
+
+
+def cached_transcript(student_id):
+    """
+    Returns the cached HTML, or None after queueing a background render
+    (at most one per student per PENDING_TTL).
+    """
+    html = cache.get(transcript_keys([student_id])[student_id])
+    if html is None and cache.add(f"transcript:pending:{student_id}", 1, PENDING_TTL):
+        from .tasks import render_transcript
+        render_transcript.delay(student_id)
+        html = cache.get(transcript_keys([student_id])[student_id])  # Eager Celery (DEBUG) has already rendered it
+    return html
+
+
+# =========================================
+# BULK GENERATION (convocation season)
+# =========================================
+def _pool_workers(workers=None):
+    """Daemonic processes (e.g. Celery prefork children) cannot fork a pool."""
+    if multiprocessing.current_process().daemon:
+        return 1
+    return workers or os.cpu_count() or 1
+
+
+def batch_chunks(batch_id, chunk_size=BATCH_CHUNK_SIZE):
+    """The batch's student ids, in id order, split into render chunks."""
+    ids = list(StudentProfile.objects.filter(batch_id=batch_id).order_by('id').values_list('id', flat=True))
+    return [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+
+
+def generate_batch_transcripts(batch_id, workers=None, chunk_size=BATCH_CHUNK_SIZE):
+    """
+    Renders and caches every transcript in a batch. Chunks of students are
+    rendered in a process pool (template rendering is CPU-bound); the parent
+    stores the results so they land in the shared cache. Returns the count.
+    """
+    chunks = batch_chunks(batch_id, chunk_size)
+    workers = min(_pool_workers(workers), len(chunks) or 1)
+    if workers <= 1:
+        return sum(cache_transcripts(chunk) for chunk in chunks)
+
+    issued_on = timezone.localdate()
+    connections.close_all()  # Forked children must open their own database connections
+    rendered = 0
+    # Spawned children (Windows, macOS) start without Django; set it up before any task unpickles core.models
+    with ProcessPoolExecutor(workers, initializer=django.setup) as pool:
+        keys = transcript_keys([sid for chunk in chunks for sid in chunk], issued_on)
+        for pages in pool.map(render_transcripts, chunks, [issued_on] * len(chunks)):
+            cache.set_many({keys[sid]: html for sid, html in pages.items()}, TRANSCRIPT_TTL)
+            rendered += len(pages)
+    return rendered
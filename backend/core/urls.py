@@ -19,6 +19,8 @@ from .views import (
     bulk_upload_students,
     manage_timetable,
     add_schedule,
+    import_timetable_view,
+    job_status,
     profile,
     coming_soon,
     student_analytics,
@@ -70,6 +72,22 @@ from .views import (
     api_hod_stats,
     api_parent_children,
     api_fee_invoices,
+    api_finance_summary,
+    api_generate_invoices,
+    api_library_checkout,
+    api_library_checkin,
+    api_library_summary,
+    api_notifications,
+    api_notifications_unread,
+    api_notifications_mark_read,
+    api_finance_defaulters,
+    api_free_rooms,
+    api_teacher_free_slots,
+    api_import_timetable,
+    api_job_status,
+    api_import_marks,
+    api_merit_list,
+    api_exam_analytics,
 )
 
 urlpatterns = [
@@ -124,8 +142,10 @@ urlpatterns = [
     # ============================================
     path('registrar/students/', manage_students, name='manage_students'),
     path('registrar/upload/', bulk_upload_students, name='upload_students'),
+    path('registrar/jobs/<int:job_id>/', job_status, name='job_status'),
     path('registrar/schedule/', manage_timetable, name='manage_timetable'),
     path('registrar/schedule/add/', add_schedule, name='add_schedule'),
+    path('registrar/schedule/import/', import_timetable_view, name='import_timetable'),
 
     # ============================================
     # 📱 6. MOBILE APP APIs (Android / JSON)
@@ -184,12 +204,16 @@ urlpatterns = [
     path('dashboard/tg/reset-device/<int:student_id>/', reset_student_device, name='reset_student_device'),
     path('dashboard/security/', security_dashboard, name='security_dashboard'),
     path('dashboard/librarian/', librarian_dashboard, name='librarian_dashboard'),
+    path('dashboard/finance/', finance_dashboard, name='finance_dashboard'),
     path('dashboard/parent/', parent_dashboard, name='parent_dashboard'),
     
     # ============================================
     # 📄 11. ACADEMIC ENGINES (Transcripts)
     # ============================================
     path('student/<int:student_id>/transcript/', generate_transcript, name='generate_transcript'),
+    path('exams/<int:exam_id>/marks/', api_import_marks, name='api_import_marks'),
+    path('exams/<int:exam_id>/analytics/', api_exam_analytics, name='api_exam_analytics'),
+    path('merit/<str:scope>/<int:scope_id>/', api_merit_list, name='api_merit_list'),
     
     # ============================================
     # 💳 12. FINANCIAL GATEWAYS
@@ -208,6 +232,14 @@ urlpatterns = [
     path('teacher/lecture/end/', api_end_class, name='api_end_class'),
     path('teacher/lecture/<int:lecture_id>/live/', api_live_monitor, name='api_live_monitor'),
 
+    # ── Coordinator: Timetable Planning ────────
+    path('timetable/free-rooms/', api_free_rooms, name='api_free_rooms'),
+    path('timetable/teacher/<int:teacher_id>/free/', api_teacher_free_slots, name='api_teacher_free_slots'),
+    path('timetable/import/', api_import_timetable, name='api_import_timetable'),
+
+    # ── Background Jobs ────────────────────────
+    path('jobs/<int:job_id>/', api_job_status, name='api_job_status'),
+
     # ── Leave Management ───────────────────────
     path('leaves/', api_leave_requests, name='api_leave_requests'),
     path('leaves/<int:request_id>/action/', api_process_leave, name='api_process_leave'),
@@ -230,4 +262,17 @@ urlpatterns = [
 
     # ── Finance ────────────────────────────────
     path('finance/invoices/', api_fee_invoices, name='api_fee_invoices'),
+    path('finance/invoices/generate/', api_generate_invoices, name='api_generate_invoices'),
+    path('finance/summary/', api_finance_summary, name='api_finance_summary'),
+    path('finance/defaulters/', api_finance_defaulters, name='api_finance_defaulters'),
+
+    # ── Library (RFID desk) ────────────────────
+    path('library/checkout/', api_library_checkout, name='api_library_checkout'),
+    path('library/checkin/', api_library_checkin, name='api_library_checkin'),
+    path('library/summary/', api_library_summary, name='api_library_summary'),
+
+    # ── Notification inbox ─────────────────────
+    path('notifications/', api_notifications, name='api_notifications'),
+    path('notifications/unread/', api_notifications_unread, name='api_notifications_unread'),
+    path('notifications/mark-read/', api_notifications_mark_read, name='api_notifications_mark_read'),
 ]
\ No newline at end of file
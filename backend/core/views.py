@@ -1,7 +1,6 @@
 # =========================================
 # STANDARD LIBRARY IMPORTS
 # =========================================
-import io
 import csv
 import calendar
 from datetime import datetime, timedelta
@@ -11,19 +10,17 @@ from datetime import datetime, timedelta
 # =========================================
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 import json
 import csv
-import io
 from django.db.models import Count, Q
 from django.utils import timezone
 from django.contrib.auth import authenticate, update_session_auth_hash, logout
 from django.contrib.auth.views import PasswordChangeView
 from django.contrib import messages
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.db import transaction # ✅ ADDED for Database Integrity
 from django.core.signing import TimestampSigner, SignatureExpired, BadSignature # ✅ FIXED Missing Imports
-from django.core.mail import send_mail # ✅ ADDED for Email Warnings
 from django.conf import settings # ✅ ADDED for ESP32_SECRET_KEY access
 
 # =========================================
@@ -38,9 +35,23 @@ from rest_framework_simplejwt.tokens import RefreshToken
 # LOCAL MODEL IMPORTS
 # =========================================
 from .models import (
-    User, StudentProfile, StaffProfile, ParentProfile, Department, Batch, Semester,
-    Course, Classroom, Lecture, Attendance, TimeTable, LeaveRequest
+    User, StudentProfile, StaffProfile, ParentProfile, Department, Batch,
+    Course, Classroom, Lecture, Attendance, TimeTable, LeaveRequest, BackgroundJob, Exam, LibraryAction
 )
+from .schedule import teacher_schedule, resolve_room
+from .lifecycle import slot_end
+from .intervals import slot_index, find_free_rooms, find_teacher_free_windows
+from .imports import import_timetable, read_rows, error_report_lines, ImportFileError, TIMETABLE_COLUMNS
+from .grading import ingest_marks, MARKS_COLUMNS
+from .ranking import merit_list
+from .exam_analytics import exam_analytics
+from .transcripts import cached_transcript
+from .library import with_fines, library_summary, checkout_books, checkin_books, MAX_SCANS
+from .dues import has_financial_hold, finance_summary, defaulters_page, unpaid_invoices_page, page_size
+from .jobs import queue_job, serialize_job, can_view_job
+from .invoicing import parse_rules
+from .inbox import unread_count, mark_read, inbox_page
+from . import payments
 
 # =========================================
 # 1. AUTHENTICATION & ROUTING (Web Portal)
@@ -80,40 +91,27 @@ def teacher_dashboard(request):
         return redirect('student_dashboard')
     
     now = timezone.localtime(timezone.now())
-    today_weekday = now.weekday()
     today_date = now.date()
 
-    todays_timetable = TimeTable.objects.filter(
-        teacher=request.user, day_of_week=today_weekday
-    ).order_by('start_time')
-    
+    # ✅ Schedule index: today's slots + lecture states in 2 cached queries instead of 1 per slot
+    schedule = teacher_schedule(request.user.id, now)
+
     students_present_count = Attendance.objects.filter(
         lecture__teacher=request.user, timestamp__date=today_date, status='PRESENT'
     ).values('student').distinct().count()
 
-    active_lecture = Lecture.objects.filter(teacher=request.user, is_active=True).first()
+    active_lecture_id = schedule['active_lecture_id']
 
     todays_lectures = []
-    for slot in todays_timetable:
-        finished = Lecture.objects.filter(
-            teacher=request.user, course=slot.course, 
-            classroom=slot.classroom, start_time__date=today_date, is_active=False
-        ).exists()
-
-        status_flag = "UPCOMING"
-        if active_lecture and active_lecture.course == slot.course and active_lecture.classroom == slot.classroom:
-            status_flag = "ACTIVE"
-        elif finished:
-            status_flag = "FINISHED"
-
-        time_str = f"{slot.start_time.strftime('%I:%M %p')} - {slot.end_time.strftime('%I:%M %p')}"
+    for slot in schedule['slots']:
+        time_str = f"{slot['start_time'].strftime('%I:%M %p')} - {slot['end_time'].strftime('%I:%M %p')}"
         todays_lectures.append({
-            'id': slot.id,
+            'id': slot['id'],
             'time': time_str,
-            'subject': {'name': slot.course.name},
-            'batch': f"{slot.course.code}", 
-            'room': slot.classroom.room_number if slot.classroom else "TBD",
-            'status_flag': status_flag
+            'subject': {'name': slot['course_name']},
+            'batch': slot['course_code'],
+            'room': slot['room'],
+            'status_flag': slot['status']
         })
 
     # Analytics for Chart.js
@@ -134,7 +132,7 @@ def teacher_dashboard(request):
 
     context = {
         'stats': {
-            'today_lectures': todays_timetable.count(),
+            'today_lectures': len(schedule['slots']),
             'students_present': students_present_count,
             'pending_leaves': LeaveRequest.objects.filter(status='PENDING').count() 
         },
@@ -142,7 +140,7 @@ def teacher_dashboard(request):
         'username': request.user.username,
         'chart_labels': json.dumps(chart_labels),
         'chart_values': json.dumps(chart_values),
-        'has_active_lecture': bool(active_lecture),
+        'has_active_lecture': bool(active_lecture_id),
         'teacher_courses': Course.objects.filter(department=request.user.staff_profile.department) if hasattr(request.user, 'staff_profile') else Course.objects.none(),
         'classrooms': Classroom.objects.all(),
     }
@@ -182,30 +180,11 @@ def send_defaulter_warnings(request):
         messages.error(request, "Staff profile not configured.")
         return redirect('teacher_dashboard')
 
-    students = StudentProfile.objects.filter(department=dept).select_related('user')
-    defaulters = []
-
-    for sp in students:
-        total_lec = Lecture.objects.filter(course__department=dept, course__semester=sp.current_semester, is_active=False).count()
-        if total_lec == 0: continue
-        attended = Attendance.objects.filter(student=sp.user, status__in=['PRESENT', 'EXCUSED']).count()
-        pct = (attended / total_lec) * 100
-        if pct < 75.0 and sp.user.email:
-            defaulters.append(sp.user.email)
-
-    if defaulters:
-        send_mail(
-            subject="URGENT: Attendance Shortage Warning | AURA",
-            message="Dear Student,\n\nYour attendance has fallen below the mandatory 75% threshold. Please meet your department mentor immediately to resolve this discrepancy as it may affect your examination eligibility.\n\nRegards,\nDepartment of " + dept.name + "\nAURA Academic Automation",
-            from_email="warnings@auraerp.edu",
-            recipient_list=defaulters,
-            fail_silently=True,
-        )
-        messages.success(request, f"Warning emails silently dispatched to {len(defaulters)} defaulting students.")
-    else:
-        messages.info(request, "No students are below the 75% threshold in your department right now.")
-
-    return redirect('teacher_dashboard')
+    # ✅ Computed and mailed by a background job: one message per student, one SMTP connection (core/mailer.py)
+    job = BackgroundJob.objects.create(job_type='DEFAULTER_MAILER', created_by=request.user, params={'department_id': dept.id})
+    queue_job(job)
+    messages.success(request, f"Attendance warnings for {dept.name} are being sent in the background.")
+    return redirect('job_status', job_id=job.id)
 
 # =========================================
 # 3. STUDENT DASHBOARD (Web Portal)
@@ -234,10 +213,15 @@ def student_dashboard(request):
         if total_conducted > 0:
             attendance_percentage = round((total_attended / total_conducted) * 100, 1)
 
+    library_loans = []
+    if profile:
+        library_loans = with_fines(profile.library_books.filter(returned_on__isnull=True)).order_by('due_date')
+
     context = {
         'history': attendance_history,
         'username': request.user.username,
         'attendance_percentage': attendance_percentage,
+        'library_loans': library_loans,
     }
     return render(request, 'student_dashboard.html', context)
 
@@ -269,56 +253,35 @@ def bulk_upload_students(request):
         return redirect('student_dashboard')
 
     if request.method == "POST":
-        try:
-            csv_file = request.FILES['file']
-            if not csv_file.name.endswith('.csv'):
-                return HttpResponse("Error: Please upload a .csv file.")
-
-            # ✅ Memory Optimization: Read text wrapper, not entire file into RAM
-            file_wrapper = io.TextIOWrapper(csv_file.file, encoding='utf-8')
-            csv_reader = csv.reader(file_wrapper, delimiter=',', quotechar="|")
-            next(csv_reader, None) # Skip header
-            
-            errors = []
-            users_to_create = []
-            profiles_to_create = []
-
-            # Pre-fetch for faster validation
-            departments = {d.code: d for d in Department.objects.all()}
-            active_semester = Semester.objects.filter(is_active=True).first()
-
-            with transaction.atomic():
-                for index, row in enumerate(csv_reader):
-                    if not row or len(row) < 6: continue
-                    roll_no, first_name, last_name, dept_code, batch_year_str, division = [r.strip() for r in row[:6]]
-
-                    dept = departments.get(dept_code)
-                    if not dept:
-                        errors.append(f"Row {index+2}: Dept '{dept_code}' not found.")
-                        continue
-
-                    # Fallback validation
-                    if not User.objects.filter(username=roll_no).exists():
-                        # Still looping user creation for password hashing, but inside atomic transaction
-                        user = User.objects.create_user(username=roll_no, password=roll_no, first_name=first_name, last_name=last_name, role=User.Role.STUDENT)
-                        batch, _ = Batch.objects.get_or_create(year=int(batch_year_str), department=dept)
-                        
-                        profiles_to_create.append(StudentProfile(
-                            user=user, roll_no=roll_no, department=dept, batch=batch, 
-                            division=division, current_semester=active_semester
-                        ))
-                
-                # Bulk create profiles
-                if profiles_to_create:
-                    StudentProfile.objects.bulk_create(profiles_to_create)
-
-            if errors: print(errors)
-            return redirect('manage_students')
-        except Exception as e:
-            return HttpResponse(f"Critical Upload Error: {str(e)}")
+        upload = request.FILES.get('file')
+        if not upload or not upload.name.lower().endswith(('.csv', '.xlsx')):
+            messages.error(request, "Please upload a .csv or .xlsx file.")
+            return render(request, 'upload_students.html')
+
+        # ✅ Processed by a Celery worker in committed chunks; the page polls the job status
+        job = BackgroundJob.objects.create(job_type='STUDENT_IMPORT', created_by=request.user, input_file=upload)
+        queue_job(job)
+        return redirect('job_status', job_id=job.id)
 
     return render(request, 'upload_students.html')
 
+@login_required
+def job_status(request, job_id):
+    job = get_object_or_404(BackgroundJob, id=job_id)
+    if not can_view_job(request.user, job):
+        messages.error(request, "Unauthorized. You can only view jobs you started.")
+        return redirect('dashboard')
+    return render(request, 'job_status.html', {'job': job})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_job_status(request, job_id):
+    """Progress, counters and row errors of a background job (polled by job_status.html)."""
+    job = get_object_or_404(BackgroundJob, id=job_id)
+    if not can_view_job(request.user, job):
+        return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    return Response({'status': 'success', 'job': serialize_job(job)})
+
 # =========================================
 # 6. TIMETABLE (Web Portal)
 # =========================================
@@ -334,18 +297,118 @@ def manage_timetable(request):
 def add_schedule(request):
     if request.user.role == User.Role.STUDENT:
         return redirect('student_dashboard')
+    teachers = User.objects.filter(role__in=[User.Role.TEACHER, User.Role.HOD, User.Role.TEACHER_GUARDIAN]).order_by('first_name', 'username')
+    context = {'courses': Course.objects.all(), 'rooms': Classroom.objects.all(), 'teachers': teachers}
     if request.method == "POST":
+        try:
+            course = Course.objects.get(id=request.POST.get('course_id'))
+            classroom_id = int(request.POST.get('room_id'))
+            teacher_id = int(request.POST.get('teacher_id') or request.user.id)
+            day = int(request.POST.get('day'))
+            start = datetime.strptime(request.POST.get('start_time'), '%H:%M').time()
+            end = datetime.strptime(request.POST.get('end_time'), '%H:%M').time()
+        except (Course.DoesNotExist, TypeError, ValueError):
+            messages.error(request, "Invalid schedule details.")
+            return render(request, 'add_schedule.html', context)
+        # ✅ Only teaching staff from the form's list (or yourself) can be assigned, and only to a real room
+        if request.POST.get('teacher_id') and not teachers.filter(id=teacher_id).exists():
+            messages.error(request, "Select a teacher from the list.")
+            return render(request, 'add_schedule.html', context)
+        if not Classroom.objects.filter(id=classroom_id).exists():
+            messages.error(request, "Select a classroom from the list.")
+            return render(request, 'add_schedule.html', context)
+        division = (request.POST.get('division') or 'A').strip().upper()
+
+        # ✅ Room, teacher and division double-bookings are caught before the insert
+        errors = slot_index().check(day, start, end, classroom_id, teacher_id, (course.department_id, course.semester_id, division))
+        if errors:
+            for error in errors:
+                messages.error(request, error)
+            return render(request, 'add_schedule.html', context)
+
         TimeTable.objects.create(
-            day_of_week=request.POST.get('day'),
-            start_time=request.POST.get('start_time'),
-            end_time=request.POST.get('end_time'),
-            course_id=request.POST.get('course_id'),
-            classroom_id=request.POST.get('room_id'),
-            teacher=request.user
+            day_of_week=day, start_time=start, end_time=end, course=course,
+            classroom_id=classroom_id, teacher_id=teacher_id, division=division
         )
         return redirect('manage_timetable')
     
-    return render(request, 'add_schedule.html', {'courses': Course.objects.all(), 'rooms': Classroom.objects.all()})
+    return render(request, 'add_schedule.html', context)
+
+@login_required
+def import_timetable_view(request):
+    """CSV/XLSX timetable upload with an on-page per-row error report."""
+    if request.user.role not in [User.Role.ACADEMIC_COORDINATOR, User.Role.HOD, User.Role.SUPER_ADMIN, User.Role.ADMIN]:
+        return redirect('dashboard')
+    context = {'columns': TIMETABLE_COLUMNS}
+    if request.method == "POST" and request.FILES.get('file'):
+        try:
+            context['result'] = import_timetable(
+                request.FILES['file'], replace=bool(request.POST.get('replace')), dry_run=bool(request.POST.get('dry_run'))
+            )
+        except ImportFileError as e:
+            messages.error(request, str(e))
+    return render(request, 'import_timetable.html', context)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def api_import_timetable(request):
+    """Timetable import for scripts; ?report=csv streams the row errors as CSV instead of JSON."""
+    if request.user.role not in [User.Role.ACADEMIC_COORDINATOR, User.Role.HOD, User.Role.SUPER_ADMIN, User.Role.ADMIN]:
+        return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    upload = request.FILES.get('file')
+    if not upload:
+        return Response({'status': 'error', 'message': 'file required'}, status=400)
+    try:
+        result = import_timetable(
+            upload, replace=str(request.data.get('replace')).lower() == 'true', dry_run=str(request.data.get('dry_run')).lower() == 'true'
+        )
+    except ImportFileError as e:
+        return Response({'status': 'error', 'message': str(e)}, status=400)
+
+    if request.query_params.get('report') == 'csv':
+        response = StreamingHttpResponse(error_report_lines(result['errors']), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="timetable_import_errors.csv"'
+        return response
+    return Response({
+        'status': 'success', 'rows': result['rows'], 'created': result['created'],
+        'errors': [{'row': number, 'errors': problems} for number, problems in result['errors']],
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_free_rooms(request):
+    """Rooms free on ?day=1&start=10:00&end=11:30 (Coordinator/HOD)."""
+    if request.user.role not in [User.Role.ACADEMIC_COORDINATOR, User.Role.HOD, User.Role.SUPER_ADMIN]:
+        return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    try:
+        day = int(request.query_params.get('day'))
+        start = datetime.strptime(request.query_params.get('start'), '%H:%M').time()
+        end = datetime.strptime(request.query_params.get('end'), '%H:%M').time()
+    except (TypeError, ValueError):
+        return Response({'status': 'error', 'message': 'day, start (HH:MM) and end (HH:MM) required'}, status=400)
+    if end <= start:
+        return Response({'status': 'error', 'message': 'end must be after start'}, status=400)
+
+    rooms = find_free_rooms(day, start, end)
+    return Response({'status': 'success', 'day': day, 'start': start.strftime('%H:%M'), 'end': end.strftime('%H:%M'), 'rooms': rooms})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_teacher_free_slots(request, teacher_id):
+    """Free windows of a teacher on ?day= (whole week when omitted), optionally ?min_minutes=60."""
+    if request.user.role not in [User.Role.ACADEMIC_COORDINATOR, User.Role.HOD, User.Role.SUPER_ADMIN] and request.user.id != teacher_id:
+        return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    try:
+        days = [int(request.query_params['day'])] if 'day' in request.query_params else range(6)
+        min_minutes = int(request.query_params.get('min_minutes', 0))
+    except ValueError:
+        return Response({'status': 'error', 'message': 'day and min_minutes must be integers'}, status=400)
+
+    free = {
+        day: [{'start': a.strftime('%H:%M'), 'end': b.strftime('%H:%M')} for a, b in find_teacher_free_windows(teacher_id, day, min_minutes)]
+        for day in days
+    }
+    return Response({'status': 'success', 'teacher_id': teacher_id, 'free': free})
 
 # =========================================
 # 7. IOT HARDWARE API (Production Optimized)
@@ -375,40 +438,32 @@ def hardware_sync(request):
     if not detected_students:
         return Response({"status": "ignored", "message": "No students detected."}, status=200)
 
-    try:
-        classroom = Classroom.objects.get(esp_device_id__iexact=gateway_id)
-    except Classroom.DoesNotExist:
+    # ✅ Room state is pre-resolved in the cache (core.schedule): no Classroom/Lecture query per sweep
+    room = resolve_room(gateway_id)
+    if not room['classroom_id']:
         return Response({"status": "error", "message": "Gateway not registered"}, status=404)
 
-    now = timezone.localtime(timezone.now())
+    if not room['lecture_id']:
+        return Response({"status": "ignored", "message": "No active class found by teacher."}, status=200)
 
     # ✅ FIX: Atomic Transaction to prevent Race Conditions & DB Lockups
     with transaction.atomic():
-        active_lecture = Lecture.objects.filter(classroom=classroom, is_active=True).first()
-
-        if not active_lecture:
-            return Response({"status": "ignored", "message": "No active class found by teacher."}, status=200)
-
         # ✅ FIX: The O(N) Loop Server Meltdown is gone. 
         # Fetch all matching users in 1 query.
-        students = User.objects.filter(Q(username__in=detected_students) | Q(device_fingerprint__in=detected_students))
+        student_ids = User.objects.filter(Q(username__in=detected_students) | Q(device_fingerprint__in=detected_students)).values_list('id', flat=True)
 
-        attendance_records = []
-        for student in students:
-            attendance_records.append(Attendance(
-                student=student, 
-                lecture=active_lecture, 
-                status='PRESENT', 
-                device_id=gateway_id
-            ))
+        attendance_records = [
+            Attendance(student_id=student_id, lecture_id=room['lecture_id'], status='PRESENT', device_id=gateway_id)
+            for student_id in student_ids
+        ]
 
         # Bulk Insert in 1 query. Ignores if they already exist.
         if attendance_records:
             Attendance.objects.bulk_create(attendance_records, ignore_conflicts=True)
 
     return Response({
-        "status": "success", "room": classroom.room_number,
-        "class": active_lecture.course.code, "marked_new": len(attendance_records)
+        "status": "success", "room": room['room_number'],
+        "class": room['course_code'], "marked_new": len(attendance_records)
     })
 
 
@@ -666,12 +721,18 @@ class CustomPasswordChangeView(PasswordChangeView):
 @login_required
 def start_timetable_class(request, timetable_id):
     if request.user.role != User.Role.TEACHER: return redirect('dashboard')
-    if Lecture.objects.filter(teacher=request.user, is_active=True).exists():
+    active = Lecture.objects.filter(teacher=request.user, is_active=True).first()
+    if active and active.timetable_slot_id == timetable_id:
+        return redirect('live_monitor')  # Already opened by the lifecycle scheduler
+    if active:
         messages.warning(request, "You already have an active Live Session. End it before starting a new one.")
         return redirect('teacher_dashboard')
 
     tt_slot = get_object_or_404(TimeTable, id=timetable_id, teacher=request.user)
-    Lecture.objects.create(course=tt_slot.course, classroom=tt_slot.classroom, teacher=request.user, is_active=True)
+    Lecture.objects.create(
+        course=tt_slot.course, classroom=tt_slot.classroom, teacher=request.user, is_active=True,
+        timetable_slot=tt_slot, scheduled_end=slot_end(tt_slot.end_time, timezone.localtime(timezone.now()))
+    )
     messages.success(request, f"Class Started: {tt_slot.course.name}")
     return redirect('live_monitor')
 
@@ -887,7 +948,9 @@ def academic_coordinator_dashboard(request):
         'username': request.user.get_full_name() or request.user.username,
         'active_slots': TimeTable.objects.count(),
         'faculty_deployed': StaffProfile.objects.count(),
-        'faculty_list': StaffProfile.objects.select_related('user', 'department').all().order_by('department__name')
+        'faculty_list': StaffProfile.objects.select_related('user', 'department').all().order_by('department__name'),
+        # ✅ Served from the cached rank engine (core/ranking.py)
+        'merit_leaders': [merit_list('department', dept.id, top=3) for dept in Department.objects.order_by('name')],
     }
     return render(request, 'academic_coordinator_dashboard.html', context)
 
@@ -904,6 +967,7 @@ def hod_dashboard(request):
         'department': dept,
         'total_enrolled': StudentProfile.objects.filter(department=dept).count() if dept else 0,
         'total_faculty': StaffProfile.objects.filter(department=dept).count() if dept else 0,
+        'merit': merit_list('department', dept.id, top=10) if dept else None,
         'escalations': [
             {'student': 'Ravi Kumar (CS-102)', 'reason': 'Attendance fell below 60%', 'tg': 'Prof. Varma', 'color': 'danger'},
             {'student': 'Neha Singh (CS-044)', 'reason': 'Mass bunk detected in Lecture 4', 'tg': 'Prof. Gokhale', 'color': 'warning'}
@@ -964,13 +1028,23 @@ def security_dashboard(request):
 @login_required
 def librarian_dashboard(request):
     if request.user.role != User.Role.LIBRARIAN: return redirect('dashboard')
+    # ✅ Fines are computed in SQL from due dates (core/library.py), nothing is accrued nightly
+    # ✅ Counters come from one indexed aggregate over open loans, not per-book queries
+    today = timezone.localdate()
+    overdue = with_fines(LibraryAction.objects.filter(returned_on__isnull=True, due_date__lt=today), today).select_related('student').order_by('due_date')
+    summary = library_summary(today)
     context = {
         'username': request.user.get_full_name() or request.user.username,
-        'active_checkouts': 1204,
-        'overdue_defaults': 42,
+        'summary': summary,
+        'active_checkouts': summary['active_checkouts'],
+        'overdue_defaults': summary['overdue'],
         'overdue_books': [
-            {'roll': 'CS-2024-44', 'book': 'Modern Operating Systems (Tanenbaum)', 'date': '12 Oct 2023', 'days': 14, 'color': 'danger'},
-            {'roll': 'IT-2024-12', 'book': 'Intro to Algorithms (CLRS)', 'date': '01 Nov 2023', 'days': 2, 'color': 'warning'}
+            {
+                'roll': loan.student.roll_no, 'book': loan.book_title, 'date': loan.issued_on.strftime('%d %b %Y'),
+                'days': loan.days_overdue, 'fine': loan.current_fine,
+                'color': 'danger' if loan.days_overdue > 7 else 'warning',
+            }
+            for loan in overdue[:50]
         ]
     }
     return render(request, 'librarian_dashboard.html', context)
@@ -978,12 +1052,16 @@ def librarian_dashboard(request):
 @login_required
 def finance_dashboard(request):
     if request.user.role != User.Role.FINANCE_CLERK: return redirect('dashboard')
+    # ✅ Grouped aggregates + keyset-paged defaulters (core/dues.py)
+    try:
+        defaulters, next_cursor = defaulters_page(after=request.GET.get('after'))
+    except ValueError:
+        defaulters, next_cursor = defaulters_page()
     context = {
         'username': request.user.get_full_name() or request.user.username,
-        'defaulters': [
-            {'roll': 'COMP2024-112', 'name': 'Rahul Dravid', 'dept': 'Computer Engg', 'dues': '₹1,14,500', 'status': 'Locked', 'color': 'danger'},
-            {'roll': 'IT2024-044', 'name': 'Aditi Sharma', 'dept': 'Info Tech', 'dues': '₹24,000', 'status': 'Warned', 'color': 'warning'}
-        ]
+        'summary': finance_summary(),
+        'defaulters': defaulters,
+        'next_cursor': next_cursor,
     }
     return render(request, 'finance_dashboard.html', context)
 
@@ -1024,20 +1102,98 @@ def generate_transcript(request, student_id):
         from django.http import HttpResponseForbidden
         return HttpResponseForbidden("You do not have permission to view this transcript.")
         
-    # 🚨 DEFAULTER MIDDLEWARE LOGIC
-    total_dues = sum(inv.amount for inv in student.invoices.filter(is_paid=False))
-    if total_dues > 0 and request.user.role in [User.Role.STUDENT, User.Role.PARENT]:
+    # 🚨 DEFAULTER MIDDLEWARE LOGIC (ledger on the profile; never part of the cached page)
+    if request.user.role in [User.Role.STUDENT, User.Role.PARENT] and has_financial_hold(student):
         from django.http import HttpResponseForbidden
-        return HttpResponseForbidden(f"TRANSCRIPT BLOCKED: Financial Hold. Outstanding dues of ₹{total_dues} must be cleared prior to generating official transcripts.")
-        
-    records = student.grades.select_related('exam', 'course').order_by('-exam__date')
-    
-    context = {
-        'student': student,
-        'records': records,
-        'cgpa': student.cgpa
-    }
-    return render(request, 'transcript.html', context)
+        return HttpResponseForbidden(f"TRANSCRIPT BLOCKED: Financial Hold. Outstanding dues of ₹{student.outstanding_dues} must be cleared prior to generating official transcripts.")
+
+    # ✅ Rendered once per grades version by a background worker (core/transcripts.py)
+    html = cached_transcript(student.id)
+    if html is None:
+        return render(request, 'transcript_pending.html', {'student': student})
+    return HttpResponse(html)
+
+def taught_course_ids(teacher):
+    """Courses a teacher has a timetable slot or a lecture for; the scope of their marks uploads and analytics."""
+    course_ids = set(TimeTable.objects.filter(teacher=teacher).values_list('course_id', flat=True))
+    course_ids |= set(Lecture.objects.filter(teacher=teacher).values_list('course_id', flat=True))
+    return course_ids
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def api_import_marks(request, exam_id):
+    """
+    Bulk marks upsert for one exam. Accepts a CSV/XLSX `file` with columns
+    RollNo, CourseCode, Marks (AB = absent) or a JSON body
+    {"records": [{"roll_no", "course_code", "marks", "absent"}]}.
+    """
+    if request.user.role not in [User.Role.TEACHER, User.Role.HOD, User.Role.ACADEMIC_COORDINATOR, User.Role.SUPER_ADMIN]:
+        return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    exam = get_object_or_404(Exam, id=exam_id)
+
+    upload = request.FILES.get('file')
+    try:
+        if upload:
+            rows = (
+                (number, row['RollNo'], row['CourseCode'], row['Marks'], None)
+                for number, row in read_rows(upload, MARKS_COLUMNS)
+            )
+        else:
+            records = request.data.get('records')
+            if not isinstance(records, list):
+                return Response({'status': 'error', 'message': 'Upload a file or send a "records" list.'}, status=400)
+            rows = (
+                (i, r.get('roll_no', ''), r.get('course_code', ''), r.get('marks'), r.get('absent'))
+                for i, r in enumerate(records, start=1) if isinstance(r, dict)
+            )
+        course_ids = taught_course_ids(request.user) if request.user.role == User.Role.TEACHER else None
+        result = ingest_marks(exam, rows, course_ids=course_ids)
+    except ImportFileError as e:
+        return Response({'status': 'error', 'message': str(e)}, status=400)
+
+    return Response({
+        'status': 'success', 'exam': exam.name, 'rows': result['rows'],
+        'created': result['created'], 'updated': result['updated'],
+        'errors': [{'row': number, 'errors': problems} for number, problems in result['errors']],
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_merit_list(request, scope, scope_id):
+    """Dense ranks and percentiles for a batch/department (by CGPA) or exam (by mean %); ?top=N trims."""
+    if request.user.role not in [User.Role.HOD, User.Role.ACADEMIC_COORDINATOR, User.Role.SUPER_ADMIN, User.Role.TEACHER_GUARDIAN]:
+        return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    try:
+        top = int(request.query_params['top']) if 'top' in request.query_params else None
+        if top is not None and top < 1:
+            return Response({'status': 'error', 'message': 'top must be a positive integer'}, status=400)
+        ranked = merit_list(scope, scope_id, top=top)
+    except ValueError as e:
+        return Response({'status': 'error', 'message': str(e)}, status=400)
+    except (Batch.DoesNotExist, Department.DoesNotExist, Exam.DoesNotExist):
+        return Response({'status': 'error', 'message': f'{scope} {scope_id} not found'}, status=404)
+    return Response({'status': 'success', **ranked})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_exam_analytics(request, exam_id):
+    """
+    Mean, median, std, pass rate and histograms per course for one exam.
+    Teachers only see the courses they teach, without the exam-wide summary.
+    """
+    if request.user.role not in [User.Role.HOD, User.Role.ACADEMIC_COORDINATOR, User.Role.SUPER_ADMIN, User.Role.TEACHER]:
+        return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    try:
+        analytics = exam_analytics(exam_id)
+    except Exam.DoesNotExist:
+        return Response({'status': 'error', 'message': 'Exam not found'}, status=404)
+    if request.user.role == User.Role.TEACHER:
+        course_ids = taught_course_ids(request.user)
+        courses = [c for c in analytics['courses'] if c['course_id'] in course_ids]
+        if not courses:
+            return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
+        analytics = {**analytics, 'overall': None, 'courses': courses}
+    return Response({'status': 'success', **analytics})
 
 # =========================================
 # 18. WORKFLOW VERIFICATIONS
@@ -1119,30 +1275,21 @@ def initiate_payment(request, invoice_id):
 def webhook_payment_success(request):
     """
     Called asynchronously by Razorpay/Stripe to verify the transaction.
+    Safe under retries and concurrent deliveries (core/payments.py).
     """
-    from django.shortcuts import get_object_or_404
-    from .models import FeeInvoice, PaymentTransaction
-    
     transaction_id = request.data.get('transaction_id')
     invoice_id = request.data.get('invoice_id')
     
-    if not transaction_id or not invoice_id:
+    if not transaction_id or not str(invoice_id).isdigit():
         return Response({'success': False, 'message': 'Malformed webhook payload'}, status=400)
-        
-    invoice = get_object_or_404(FeeInvoice, id=invoice_id)
-    if invoice.is_paid:
+
+    outcome = payments.settle_invoice(int(invoice_id), str(transaction_id))
+    if outcome == payments.NOT_FOUND:
+        return Response({'success': False, 'message': 'Invoice not found.'}, status=404)
+    if outcome == payments.CONFLICT:
+        return Response({'success': False, 'message': 'Transaction ID already recorded against another invoice.'}, status=409)
+    if outcome in (payments.DUPLICATE, payments.ALREADY_PAID):
         return Response({'success': True, 'message': 'Invoice already securely settled.'})
-        
-    invoice.is_paid = True
-    invoice.save()
-    
-    PaymentTransaction.objects.create(
-        invoice=invoice,
-        transaction_id=transaction_id,
-        amount_paid=invoice.amount,
-        is_successful=True
-    )
-    
     return Response({'success': True, 'message': 'Payment logged and invoice settled across Aura ERP.'})
 
 @login_required
@@ -1213,45 +1360,25 @@ def api_teacher_timetable(request):
         return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
 
     now = timezone.localtime(timezone.now())
-    today_weekday = now.weekday()
-    today_date = now.date()
-
-    slots = TimeTable.objects.filter(
-        teacher=request.user, day_of_week=today_weekday
-    ).select_related('course', 'classroom').order_by('start_time')
-
-    active_lecture = Lecture.objects.filter(teacher=request.user, is_active=True).first()
-
-    result = []
-    for slot in slots:
-        finished = Lecture.objects.filter(
-            teacher=request.user, course=slot.course,
-            classroom=slot.classroom, start_time__date=today_date, is_active=False
-        ).exists()
-
-        if active_lecture and active_lecture.course == slot.course:
-            status_flag = 'ACTIVE'
-        elif finished:
-            status_flag = 'FINISHED'
-        else:
-            status_flag = 'UPCOMING'
-
-        result.append({
-            'timetable_id': slot.id,
-            'course_name': slot.course.name,
-            'course_code': slot.course.code,
-            'room': slot.classroom.room_number if slot.classroom else 'TBD',
-            'start_time': slot.start_time.strftime('%I:%M %p'),
-            'end_time': slot.end_time.strftime('%I:%M %p'),
-            'status': status_flag,
-            'active_lecture_id': active_lecture.id if active_lecture and status_flag == 'ACTIVE' else None,
-        })
+    schedule = teacher_schedule(request.user.id, now)
+    active_lecture_id = schedule['active_lecture_id']
+
+    result = [{
+        'timetable_id': slot['id'],
+        'course_name': slot['course_name'],
+        'course_code': slot['course_code'],
+        'room': slot['room'],
+        'start_time': slot['start_time'].strftime('%I:%M %p'),
+        'end_time': slot['end_time'].strftime('%I:%M %p'),
+        'status': slot['status'],
+        'active_lecture_id': active_lecture_id if slot['status'] == 'ACTIVE' else None,
+    } for slot in schedule['slots']]
 
     return Response({
         'status': 'success',
         'day': now.strftime('%A, %d %B %Y'),
-        'has_active_lecture': bool(active_lecture),
-        'active_lecture_id': active_lecture.id if active_lecture else None,
+        'has_active_lecture': bool(active_lecture_id),
+        'active_lecture_id': active_lecture_id,
         'timetable': result
     })
 
@@ -1263,13 +1390,17 @@ def api_start_class(request):
     if request.user.role not in [User.Role.TEACHER, User.Role.HOD, User.Role.ACADEMIC_COORDINATOR]:
         return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
 
-    if Lecture.objects.filter(teacher=request.user, is_active=True).exists():
-        return Response({'status': 'error', 'message': 'You already have an active session. End it first.'}, status=400)
-
     timetable_id = request.data.get('timetable_id')
     if not timetable_id:
         return Response({'status': 'error', 'message': 'timetable_id required'}, status=400)
 
+    active = Lecture.objects.filter(teacher=request.user, is_active=True).first()
+    if active:
+        # The lifecycle scheduler may already have opened this slot's lecture
+        if str(active.timetable_slot_id) == str(timetable_id):
+            return Response({'status': 'success', 'message': 'Class already running.', 'lecture_id': active.id})
+        return Response({'status': 'error', 'message': 'You already have an active session. End it first.'}, status=400)
+
     try:
         slot = TimeTable.objects.get(id=timetable_id, teacher=request.user)
     except TimeTable.DoesNotExist:
@@ -1277,7 +1408,8 @@ def api_start_class(request):
 
     lecture = Lecture.objects.create(
         course=slot.course, classroom=slot.classroom,
-        teacher=request.user, is_active=True
+        teacher=request.user, is_active=True,
+        timetable_slot=slot, scheduled_end=slot_end(slot.end_time, timezone.localtime(timezone.now()))
     )
     return Response({
         'status': 'success',
@@ -1634,37 +1766,192 @@ def api_parent_children(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def api_fee_invoices(request):
-    """Returns fee invoices for the student (or all unpaid if Finance Clerk)."""
+    """
+    Returns fee invoices for the student, or unpaid invoices for Finance
+    Clerks, paged with ?after=<next cursor>&limit=N.
+    """
     from .models import FeeInvoice
 
+    next_cursor = None
     if request.user.role == User.Role.STUDENT:
         if not hasattr(request.user, 'student_profile'):
             return Response({'status': 'error', 'message': 'Profile not found'}, status=404)
         invoices = FeeInvoice.objects.filter(student=request.user.student_profile).order_by('-due_date')
 
     elif request.user.role in [User.Role.FINANCE_CLERK, User.Role.SUPER_ADMIN]:
-        invoices = FeeInvoice.objects.filter(is_paid=False).select_related(
-            'student__user'
-        ).order_by('-due_date')[:50]
+        try:
+            invoices, next_cursor = unpaid_invoices_page(request.query_params.get('after'), page_size(request.query_params.get('limit')))
+        except ValueError as e:
+            return Response({'status': 'error', 'message': str(e)}, status=400)
 
     elif request.user.role == User.Role.PARENT:
         if not hasattr(request.user, 'parent_profile'):
             return Response({'status': 'success', 'invoices': []})
         student_ids = list(request.user.parent_profile.students.values_list('id', flat=True))
-        invoices = FeeInvoice.objects.filter(student_id__in=student_ids).order_by('-due_date')
+        invoices = FeeInvoice.objects.filter(student_id__in=student_ids).select_related('student__user').order_by('-due_date')
     else:
         return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
 
     data = [{
         'id': inv.id,
-        'title': getattr(inv, 'title', f'Invoice #{inv.id}'),
+        'title': f'Invoice #{inv.id}',
+        'fee_type': inv.fee_type,
         'amount': str(inv.amount),
-        'due_date': str(inv.due_date) if hasattr(inv, 'due_date') else '',
+        'due_date': str(inv.due_date),
         'is_paid': inv.is_paid,
         'student_name': inv.student.user.get_full_name() if request.user.role != User.Role.STUDENT else None,
     } for inv in invoices]
 
-    return Response({'status': 'success', 'invoices': data})
+    return Response({'status': 'success', 'invoices': data, 'next': next_cursor})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def api_generate_invoices(request):
+    """
+    Queues a semester billing run. Body: {"rules": [{"fee_type", "amount",
+    "due_date", "department"?, "batch"?}]}; see core/invoicing.py.
+    """
+    if request.user.role not in [User.Role.FINANCE_CLERK, User.Role.SUPER_ADMIN]:
+        return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    rules, errors = parse_rules(request.data.get('rules'))
+    if errors or not rules:
+        return Response({
+            'status': 'error', 'message': 'Send a non-empty "rules" list.' if not errors else 'Invalid fee rules.',
+            'errors': [{'rule': number, 'errors': problems} for number, problems in errors],
+        }, status=400)
+
+    job = BackgroundJob.objects.create(job_type='INVOICE_GENERATION', created_by=request.user, params={'rules': rules})
+    queue_job(job)
+    return Response({'status': 'success', 'job': serialize_job(job), 'status_url': reverse('job_status', args=[job.id])}, status=202)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def api_library_checkout(request):
+    """
+    RFID desk checkout. Body: {"scans": [{"student": roll_no, "book_uid",
+    "book_title"?}], "due_date"?}. Returns one result per scan, in order.
+    """
+    if request.user.role not in [User.Role.LIBRARIAN, User.Role.SUPER_ADMIN]:
+        return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    scans = request.data.get('scans')
+    if not isinstance(scans, list) or not scans or len(scans) > MAX_SCANS or not all(isinstance(scan, dict) for scan in scans):
+        return Response({'status': 'error', 'message': f'Send 1-{MAX_SCANS} scan objects in "scans".'}, status=400)
+    due_date = None
+    if request.data.get('due_date'):
+        try:
+            due_date = datetime.strptime(str(request.data['due_date']), '%Y-%m-%d').date()
+        except ValueError:
+            return Response({'status': 'error', 'message': 'due_date must be YYYY-MM-DD.'}, status=400)
+
+    results = checkout_books(scans, due_date)
+    return Response({'status': 'success', 'issued': sum(r['status'] == 'issued' for r in results), 'results': results})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def api_library_checkin(request):
+    """RFID desk return. Body: {"book_uids": [...]}. Returns one result per scan, in order."""
+    if request.user.role not in [User.Role.LIBRARIAN, User.Role.SUPER_ADMIN]:
+        return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    book_uids = request.data.get('book_uids')
+    if not isinstance(book_uids, list) or not book_uids or len(book_uids) > MAX_SCANS:
+        return Response({'status': 'error', 'message': f'Send 1-{MAX_SCANS} tags in "book_uids".'}, status=400)
+
+    results = checkin_books(book_uids)
+    return Response({'status': 'success', 'returned': sum(r['status'] == 'returned' for r in results), 'results': results})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_library_summary(request):
+    """Desk counters: active checkouts, overdue, due today, returns today, outstanding fines."""
+    if request.user.role not in [User.Role.LIBRARIAN, User.Role.SUPER_ADMIN]:
+        return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    return Response({'status': 'success', **library_summary()})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_finance_summary(request):
+    """Outstanding dues by department, fee type and ageing bucket."""
+    if request.user.role not in [User.Role.FINANCE_CLERK, User.Role.SUPER_ADMIN]:
+        return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    return Response({'status': 'success', **finance_summary()})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_finance_defaulters(request):
+    """Students with dues, largest first: ?after=<next cursor>&limit=N&department=<id>."""
+    if request.user.role not in [User.Role.FINANCE_CLERK, User.Role.SUPER_ADMIN]:
+        return Response({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    department = request.query_params.get('department')
+    if department and not department.isdigit():
+        return Response({'status': 'error', 'message': 'department must be a department id'}, status=400)
+    try:
+        students, next_cursor = defaulters_page(
+            request.query_params.get('after'), page_size(request.query_params.get('limit')), department and int(department),
+        )
+    except ValueError as e:
+        return Response({'status': 'error', 'message': str(e)}, status=400)
+    return Response({
+        'status': 'success',
+        'defaulters': [{
+            'student_id': s.id,
+            'roll_no': s.roll_no,
+            'name': s.user.get_full_name() or s.user.username,
+            'department': s.department.code,
+            'outstanding_dues': str(s.outstanding_dues),
+            'unpaid_invoices': s.unpaid_invoices,
+        } for s in students],
+        'next': next_cursor,
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_notifications(request):
+    """The user's inbox, newest first: ?after=<next cursor>&limit=N&unread=1."""
+    try:
+        notifications, next_cursor = inbox_page(
+            request.user.id, request.query_params.get('after'), page_size(request.query_params.get('limit')),
+            unread_only=request.query_params.get('unread') in ('1', 'true'),
+        )
+    except ValueError as e:
+        return Response({'status': 'error', 'message': str(e)}, status=400)
+    return Response({
+        'status': 'success',
+        'notifications': [{
+            'id': n.id,
+            'title': n.title,
+            'message': n.message,
+            'is_read': n.is_read,
+            'created_at': n.created_at.isoformat(),
+        } for n in notifications],
+        'next': next_cursor,
+        'unread': unread_count(request.user.id),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_notifications_unread(request):
+    """Badge count, served from the cache."""
+    return Response({'status': 'success', 'unread': unread_count(request.user.id)})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def api_notifications_mark_read(request):
+    """Body: {"ids": [...]} or {"all": true}. One UPDATE either way."""
+    ids = request.data.get('ids')
+    if request.data.get('all') is True:
+        ids = None
+    elif not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+        return Response({'status': 'error', 'message': 'Send "ids" (a list of notification ids) or "all": true.'}, status=400)
+    updated = mark_read(request.user.id, ids)
+    return Response({'status': 'success', 'updated': updated, 'unread': unread_count(request.user.id)})
 
 # =========================================
 # 20. OTA DISTRIBUTION